@@ -1,15 +1,33 @@
 import streamlit as st
 import pandas as pd
-import folium
-from streamlit_folium import st_folium
-import plotly.express as px
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_absolute_error, r2_score
 import numpy as np
 from datetime import datetime, timedelta
-from math import radians, sin, cos, sqrt, atan2
 from itertools import cycle
+from data import DATASETS, dataset_rows, dataset_version, load_dataset
+from deck_layers import (
+    BACKEND_LABELS, TO_TPA_RGB, default_backend, deck_map, hex_polygon_layer, path_layer, point_columns,
+    scatter_layer, show_deck, view_state,
+)
+from hexbin import HEX_SIZES_KM, default_hex_size, hex_geojson, hex_grid, hex_rings
+from map_layers import (
+    add_cell_layer, add_hex_layer, add_label_css, add_point_layer, cached_map, map_key, show_map, view_copy,
+)
+import store
+from rollup import empty_rollups, load_rollups, total_per_bulan, total_per_tps
+from routing import (
+    LOCAL_SEARCH_BUDGET, closest_tpa, default_workers, distance_tables, route_length, segment_lengths,
+    submatrix, tps_positions, update_route, warm_pool,
+)
+from distance import HaversineProvider, active_provider, segment_geometry
+from fleet import (
+    FLEET, TRUCK_PAYLOAD, load_split, plan_fleet, stop_assignments, truck_map, truck_summary, unplanned_stops,
+)
+from route_cache import memoize, route_key
+from planner import matching_plan, plan_meta
+from pickup import DAY_LABELS, load_pickup_index, plan_week, week_summary
+from tpa_index import refresh_nearest
+from viewport import VIEWPORT_MIN_POINTS, view_from_map, view_index, view_layer
+from zones import ZONE_METHOD, assign_zones, zone_summary
 
 st.set_page_config(page_title="Analisis Big Data - Rute TPS–TPA", layout="wide")
 
@@ -160,78 +178,43 @@ st.markdown(
 st.markdown("---")
 
 # data
-def safe_read_csv(path, parse_dates=None):
+# Dataset di-cache sekali per proses server (lihat data.py)
+def safe_read_csv(name, columns=None):
     try:
-        return pd.read_csv(path, parse_dates=parse_dates)
+        return load_dataset(name, columns=columns)
     except Exception as e:
-        st.warning(f"Gagal memuat {path}: {e}")
+        st.warning(f"Gagal memuat {DATASETS[name]}: {e}")
         return pd.DataFrame()
 
-tps_df = safe_read_csv("tps.csv")
-tpa_df = safe_read_csv("tpa.csv")
-histori_df = safe_read_csv("histori_rute.csv", parse_dates=["tanggal"])
-routes_df = safe_read_csv("routes.csv")
-vehicle_df = safe_read_csv("vehicle_routing_matrix.csv")
-
-if tps_df.empty:
-    st.info("Dataset TPS kosong / gagal dimuat. Beberapa fitur akan dinonaktifkan.")
-if tpa_df.empty:
-    st.info("Dataset TPA kosong / gagal dimuat. Beberapa fitur akan dinonaktifkan.")
-
-if "keterisian_%" in tps_df.columns and "keterisian_%" not in tps_df.columns:
-    tps_df = tps_df.rename(columns={"keterisian_%": "keterisian_%"})
-
-# Helper: tambahkan marker TPS
-def add_tps_marker(m, row, style="trash", popup_extra=None, tooltip=None):
-    lat = row.get("latitude")
-    lon = row.get("longitude")
-    if pd.isna(lat) or pd.isna(lon):
-        return
-    label = tooltip or f"TPS {row.get('id_tps','-')}"
-    keterisian = row.get("keterisian_%", 0) or 0
-    popup_html = (
-        f"<b>TPS {row.get('id_tps','-')}</b><br>"
-        f"Kapasitas: {row.get('kapasitas','N/A')}<br>"
-        f"Volume: {row.get('volume_saat_ini','N/A')}<br>"
-        f"Keterisian: {keterisian:.1f}%"
-    )
-    if popup_extra:
-        popup_html += f"<br>{popup_extra}"
-
+def safe_row_count(name):
     try:
-        if style == "trash":
-            folium.Marker(
-                [lat, lon],
-                popup=popup_html,
-                tooltip=label,
-                icon=folium.Icon(color="green", icon="trash", prefix="fa")
-            ).add_to(m)
-            folium.map.Marker(
-                [lat, lon],
-                icon=folium.DivIcon(
-                    html=f'<div style="font-size:10px; color:green; font-weight:bold;">{row.get("id_tps","-")}</div>'
-                ),
-            ).add_to(m)
-        else:
-            folium.CircleMarker(
-                location=[lat, lon],
-                radius=6,
-                color="green",
-                fill=True,
-                fill_color="green",
-                fill_opacity=0.8,
-                popup=popup_html,
-                tooltip=label
-            ).add_to(m)
-            folium.map.Marker(
-                [lat, lon],
-                icon=folium.DivIcon(
-                    html=f'<div style="font-size:10px; color:green;">{row.get("id_tps","-")}</div>'
-                ),
-            ).add_to(m)
+        return dataset_rows(name)
     except Exception:
-        pass
-    
+        return 0
+
+# Dataset TPS & TPA dimuat hanya oleh halaman yang memakainya
+def load_tps_tpa():
+    tps_df = safe_read_csv("tps")
+    tpa_df = safe_read_csv("tpa")
+
+    if tps_df.empty:
+        st.info("Dataset TPS kosong / gagal dimuat. Beberapa fitur akan dinonaktifkan.")
+    if tpa_df.empty:
+        st.info("Dataset TPA kosong / gagal dimuat. Beberapa fitur akan dinonaktifkan.")
+
+    if "keterisian_%" in tps_df.columns and "keterisian_%" not in tps_df.columns:
+        tps_df = tps_df.rename(columns={"keterisian_%": "keterisian_%"})
+
+    # TPA terdekat dihitung ulang dengan indeks spasial bila nilai di tps.csv basi
+    if not tps_df.empty and not tpa_df.empty:
+        versi = dataset_version("tps", "tpa")
+        tps_df, jumlah_basi = refresh_nearest(tps_df, tpa_df, versi)
+        # Pemberitahuan cukup sekali per versi data, bukan di setiap rerun
+        if jumlah_basi and st.session_state.get("info_nearest_basi") != versi:
+            st.session_state["info_nearest_basi"] = versi
+            st.info(f"{jumlah_basi} TPS memiliki nearest_tpa/nearest_dist_km yang basi dan sudah dihitung ulang.")
+    return tps_df, tpa_df
+
 #sidebar
 st.sidebar.markdown("<h1 style='text-align:center;'>📋 Navigasi</h1>", unsafe_allow_html=True)
 
@@ -306,11 +289,11 @@ st.sidebar.markdown("<h3 style='text-align:center;'>📂 Info Dataset</h3>", uns
 st.sidebar.markdown(f'''
 <div style="background-color:#fff; border-radius:10px; padding:12px; margin-top:12px;
 font-size:14px; color:#1b4d3e; box-shadow:0 2px 6px rgba(0,0,0,0.1);">
-<b>tps.csv</b> – {len(tps_df)} baris<br>
-<b>tpa.csv</b> – {len(tpa_df)} baris<br>
-<b>histori_rute.csv</b> – {len(histori_df)} baris<br>
-<b>routes.csv</b> – {len(routes_df)} baris<br>
-<b>vehicle_routing_matrix.csv</b> – {len(vehicle_df)} baris
+<b>tps.csv</b> – {safe_row_count("tps")} baris<br>
+<b>tpa.csv</b> – {safe_row_count("tpa")} baris<br>
+<b>histori_rute.csv</b> – {safe_row_count("histori")} baris<br>
+<b>routes.csv</b> – {safe_row_count("routes")} baris<br>
+<b>vehicle_routing_matrix.csv</b> – {safe_row_count("vehicle")} baris
 </div>
 ''', unsafe_allow_html=True)
 
@@ -323,12 +306,28 @@ Sistem ini menggunakan dataset internal untuk pemantauan & optimasi rute pengang
 
 # MODE: Dashboard Data 
 if mode == "Dashboard Data":
+    # Import berat hanya untuk halaman ini
+    import folium
+    import plotly.express as px
+
+    tps_df, tpa_df = load_tps_tpa()
+
+    # Filter/agregasi dijalankan di SQLite bila SAMPAH_QUERY_ENGINE=sqlite (lihat store.py)
+    use_store = store.enabled()
+
+    # Histori: cukup rollup bulanan yang diperbarui inkremental (lihat rollup.py)
+    histori_rollup = empty_rollups()
+    if not use_store:
+        try:
+            histori_rollup = load_rollups()
+        except Exception as e:
+            st.warning(f"Gagal memuat {DATASETS['histori']}: {e}")
 
     # METRIK UTAMA
     col1, col2, col3 = st.columns(3)
     col1.metric("Total TPS", len(tps_df))
     col2.metric("Total TPA", len(tpa_df))
-    col3.metric("Total Histori Rute", len(histori_df))
+    col3.metric("Total Histori Rute", safe_row_count("histori"))
     
     # FUNGSI UTILITAS
     def compute_keterisian(df):
@@ -343,8 +342,6 @@ if mode == "Dashboard Data":
         return df
 
     tps_df = compute_keterisian(tps_df)
-    histori_df["tanggal"] = pd.to_datetime(histori_df["tanggal"], errors="coerce")
-    histori_df["bulan"] = histori_df["tanggal"].dt.to_period("M").astype(str)
 
     st.markdown("---")
 
@@ -362,7 +359,9 @@ if mode == "Dashboard Data":
     if st.button("Reset Filter Peta", key="reset_peta"):
         selected_tps_map = []
 
-    if selected_tps_map:
+    if selected_tps_map and use_store:
+        filtered_tps_map = store.tps_rows(selected_tps_map)
+    elif selected_tps_map:
         filtered_tps_map = tps_df[tps_df["id_tps"].astype(str).isin(selected_tps_map)].copy()
     else:
         filtered_tps_map = tps_df.copy()
@@ -375,121 +374,6 @@ if mode == "Dashboard Data":
     filtered_tps_map = filtered_tps_map.dropna(subset=["latitude", "longitude"]).reset_index(drop=True)
     tpa_valid = tpa_df.dropna(subset=["latitude", "longitude"]).reset_index(drop=True)
     
-    # Tentukan pusat peta
-    if not pd.concat([filtered_tps_map, tpa_valid]).empty:
-        center_lat = pd.concat([filtered_tps_map, tpa_valid])["latitude"].mean()
-        center_lon = pd.concat([filtered_tps_map, tpa_valid])["longitude"].mean()
-    else:
-        center_lat, center_lon = -7.8, 110.4  
-    
-    # Buat peta utama
-    m = folium.Map(location=[center_lat, center_lon], zoom_start=6, control_scale=True)
-    
-    folium.TileLayer(
-        tiles="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png",
-        name="OpenStreetMap",
-        attr=" "  
-    ).add_to(m)
-    
-    folium.TileLayer(
-        tiles="https://stamen-tiles.a.ssl.fastly.net/terrain/{z}/{x}/{y}.png",
-        name="Stamen Terrain",
-        attr=" "
-    ).add_to(m)
-    
-    folium.TileLayer(
-        tiles="https://cartodb-basemaps-a.global.ssl.fastly.net/light_all/{z}/{x}/{y}.png",
-        name="CartoDB Positron",
-        attr=" "
-    ).add_to(m)
-    
-      # Marker TPA
-    for _, row in tpa_valid.iterrows():
-        lat, lon = row["latitude"], row["longitude"]
-    
-        popup_html = f"""
-        {row.get('nama', '-')}<br>
-        <b>Koordinat:</b> {lat:.5f}, {lon:.5f}
-        """
-    
-        # Marker utama
-        folium.Marker(
-            [lat, lon],
-            popup=popup_html,
-            tooltip=f"{row['nama']}",
-            icon=folium.Icon(color="red", icon="recycle", prefix="fa"),
-        ).add_to(m)
-    
-        # Label 
-        folium.map.Marker(
-            [lat, lon],
-            icon=folium.DivIcon(
-                html=f"""
-                <div style="
-                    font-size: 11px;
-                    color: red;
-                    font-weight: bold;
-                    text-shadow: 1px 1px 2px #fff;
-                    white-space: nowrap;
-                    transform: translate(15px, -10px);
-                ">
-                    {row['nama']}
-                </div>
-                """
-            )
-        ).add_to(m)
-    
-    
-    # Marker TPS
-    for _, row in filtered_tps_map.iterrows():
-        lat, lon = row["latitude"], row["longitude"]
-        keterisian = row.get("keterisian_%", 0)
-    
-        popup_html = f"""
-        {row.get('id_tps','-')}<br>
-        <b>Kapasitas:</b> {row.get('kapasitas','N/A')}<br>
-        <b>Volume:</b> {row.get('volume_saat_ini','N/A')}<br>
-        <b>Keterisian:</b> {keterisian:.1f}%
-        """
-    
-        # Marker utama
-        folium.Marker(
-            [lat, lon],
-            popup=popup_html,
-            tooltip=f"{row['id_tps']}",
-            icon=folium.Icon(color="green", icon="trash", prefix="fa"),
-        ).add_to(m)
-
-        folium.map.Marker(
-            [lat, lon],
-            icon=folium.DivIcon(
-                html=f"""
-                <div style="
-                    font-size: 11px;
-                    color: green;
-                    font-weight: bold; 
-                    text-shadow: 1px 1px 2px #fff;
-                    white-space: nowrap;
-                    transform: translate(15px, -10px);
-                ">
-                    {row['id_tps']}
-                </div>
-                """
-            )
-        ).add_to(m)
-
-    # Fit bounds semua titik
-    all_points = pd.concat([filtered_tps_map[["latitude", "longitude"]], tpa_valid[["latitude", "longitude"]]])
-    if not all_points.empty:
-        m.fit_bounds([
-            [all_points["latitude"].min(), all_points["longitude"].min()],
-            [all_points["latitude"].max(), all_points["longitude"].max()],
-        ])
-
-
-    # Layer control
-    folium.LayerControl().add_to(m)
-    
     hide_attr_css = """
     <style>
     .leaflet-control-attribution {
@@ -499,32 +383,153 @@ if mode == "Dashboard Data":
     """
     st.markdown(hide_attr_css, unsafe_allow_html=True)
     
-    legend_html = """
-    <div style="
-         position: absolute; 
-         bottom: 3px; left: 130px;  
-         z-index: 9999;
-         background-color: rgba(255, 255, 255, 0.95);
-         border: 1px solid #555;
-         border-radius: 10px;
-         padding: 10px 14px;
-         font-size: 14px;
-         line-height: 1.8;
-         box-shadow: 0 3px 8px rgba(0,0,0,0.25);
-         font-family: Arial, sans-serif;
-         color: #222;
-    ">
-    <i class="fa fa-trash" style="color:green;"></i>
-    <span style="font-weight:600; margin-left:6px;">TPS</span><br>
-    <i class="fa fa-recycle" style="color:red;"></i>
-    <span style="font-weight:600; margin-left:6px;">TPA</span>
-    </div>
-    """
-    m.get_root().html.add_child(folium.Element(legend_html))
+    popup_tps = {"kapasitas": "Kapasitas", "volume_saat_ini": "Volume", "keterisian_%": "Keterisian (%)"}
+    # Mesin peta per halaman: WebGL (pydeck) untuk titik sangat banyak
+    backend_peta = st.radio(
+        "Mesin peta:", list(BACKEND_LABELS), format_func=BACKEND_LABELS.get, horizontal=True,
+        index=list(BACKEND_LABELS).index(default_backend(len(filtered_tps_map))), key="backend_peta_sebaran",
+    )
+    # Peta panas heksagon keterisian; agregat semua resolusi di-cache per versi data (lihat hexbin.py)
+    pilihan_hex = [None, *HEX_SIZES_KM]
+    ukuran_hex = st.selectbox(
+        "Peta panas keterisian (heksagon):", pilihan_hex,
+        index=pilihan_hex.index(default_hex_size(len(filtered_tps_map))),
+        format_func=lambda s: "Tidak ditampilkan" if s is None else f"{s:g} km", key="ukuran_hex",
+    )
+    grid_hex = None
+    if ukuran_hex is not None and not filtered_tps_map.empty:
+        grid_hex = hex_grid(filtered_tps_map, ukuran_hex, None if selected_tps_map else dataset_version("tps"))
+    # TPS sangat banyak: peta hanya memuat TPS di area yang sedang dilihat
+    boleh_viewport = backend_peta == "folium" and not selected_tps_map and not filtered_tps_map.empty
+    mode_viewport = boleh_viewport and st.checkbox(
+        "Muat TPS sesuai area peta (viewport)", value=len(filtered_tps_map) >= VIEWPORT_MIN_POINTS,
+        key="peta_viewport",
+    )
 
-    
-    # Tampilkan peta
-    st_folium(m, width=1000, height=550)
+    # Peta dibangun sekali per versi data + pilihan TPS (lihat map_layers.cached_map)
+    # Mode viewport: TPS tidak ikut di peta dasar, tetapi dikirim per area peta (lihat viewport.py)
+    def bangun_peta_sebaran(dengan_tps=True):
+        # Tentukan pusat peta
+        if not pd.concat([filtered_tps_map, tpa_valid]).empty:
+            center_lat = pd.concat([filtered_tps_map, tpa_valid])["latitude"].mean()
+            center_lon = pd.concat([filtered_tps_map, tpa_valid])["longitude"].mean()
+        else:
+            center_lat, center_lon = -7.8, 110.4  
+
+        # Buat peta utama
+        m = folium.Map(location=[center_lat, center_lon], zoom_start=6, control_scale=True)
+
+        folium.TileLayer(
+            tiles="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png",
+            name="OpenStreetMap",
+            attr=" "  
+        ).add_to(m)
+
+        folium.TileLayer(
+            tiles="https://stamen-tiles.a.ssl.fastly.net/terrain/{z}/{x}/{y}.png",
+            name="Stamen Terrain",
+            attr=" "
+        ).add_to(m)
+
+        folium.TileLayer(
+            tiles="https://cartodb-basemaps-a.global.ssl.fastly.net/light_all/{z}/{x}/{y}.png",
+            name="CartoDB Positron",
+            attr=" "
+        ).add_to(m)
+
+        if grid_hex is not None:
+            add_hex_layer(m, hex_geojson(grid_hex))
+
+        # TPA & TPS masing-masing satu layer (GeoJSON / FastMarkerCluster, lihat map_layers.py)
+        add_point_layer(
+            m, tpa_valid, "nama", {"latitude": "Lat", "longitude": "Lon"},
+            color="red", icon="recycle", name="TPA", mode="geojson",
+        )
+        if dengan_tps:
+            add_point_layer(
+                m, filtered_tps_map, "id_tps", popup_tps,
+                color="green", icon="trash", name="TPS",
+            )
+        else:
+            add_label_css(m)
+
+        # Fit bounds semua titik
+        all_points = pd.concat([filtered_tps_map[["latitude", "longitude"]], tpa_valid[["latitude", "longitude"]]])
+        if not all_points.empty:
+            m.fit_bounds([
+                [all_points["latitude"].min(), all_points["longitude"].min()],
+                [all_points["latitude"].max(), all_points["longitude"].max()],
+            ])
+
+
+        # Layer control
+        folium.LayerControl().add_to(m)
+
+        legend_html = """
+        <div style="
+             position: absolute; 
+             bottom: 3px; left: 130px;  
+             z-index: 9999;
+             background-color: rgba(255, 255, 255, 0.95);
+             border: 1px solid #555;
+             border-radius: 10px;
+             padding: 10px 14px;
+             font-size: 14px;
+             line-height: 1.8;
+             box-shadow: 0 3px 8px rgba(0,0,0,0.25);
+             font-family: Arial, sans-serif;
+             color: #222;
+        ">
+        <i class="fa fa-trash" style="color:green;"></i>
+        <span style="font-weight:600; margin-left:6px;">TPS</span><br>
+        <i class="fa fa-recycle" style="color:red;"></i>
+        <span style="font-weight:600; margin-left:6px;">TPA</span>
+        </div>
+        """
+        m.get_root().html.add_child(folium.Element(legend_html))
+        return m
+
+    # Versi WebGL: TPS diwarnai menurut keterisian, TPA merah
+    def bangun_deck_sebaran():
+        titik = pd.concat([filtered_tps_map[["latitude", "longitude"]], tpa_valid[["latitude", "longitude"]]])
+        return deck_map(
+            [
+                hex_polygon_layer(hex_rings(grid_hex), grid_hex.cells) if grid_hex is not None else None,
+                scatter_layer(
+                    point_columns(filtered_tps_map, "id_tps", popup_tps, percent_column="keterisian_%"),
+                    layer_id="tps",
+                ),
+                scatter_layer(point_columns(tpa_valid, "nama"), radius=150, min_pixels=6, layer_id="tpa"),
+            ],
+            view_state(titik["latitude"], titik["longitude"]),
+        )
+
+    kunci_peta = map_key(
+        dataset_version("tps", "tpa"), selected_tps_map, peta="sebaran", sqlite=use_store, viewport=mode_viewport,
+        backend=backend_peta, hex=ukuran_hex,
+    )
+    if backend_peta == "deck":
+        show_deck(cached_map(kunci_peta, bangun_deck_sebaran))
+        st.caption("Warna TPS: hijau (kosong) → kuning → merah (penuh); TPA merah besar.")
+    elif mode_viewport:
+        # Peta dasar dipakai bersama semua sesi; grup TPS per tampilan dipasang di salinannya
+        m = view_copy(cached_map(kunci_peta, lambda: bangun_peta_sebaran(dengan_tps=False)))
+        # Batas & zoom terakhir yang dilaporkan peta; sebelum ada interaksi dipakai area semua TPS
+        indeks_view = view_index(filtered_tps_map, dataset_version("tps"))
+        tampilan = view_from_map(st.session_state.get("peta_sebaran_viewport")) or indeks_view.initial_view()
+        lapisan = view_layer(indeks_view, tampilan)
+        grup_tps = folium.FeatureGroup(name="TPS")
+        if lapisan.kind == "points":
+            add_point_layer(grup_tps, lapisan.frame, "id_tps", popup_tps, color="green", icon="trash", mode="geojson")
+        else:
+            add_cell_layer(grup_tps, lapisan.frame)
+        # Hanya batas & zoom yang dikirim balik: geser/zoom memuat tile baru, klik tidak memicu rerun
+        show_map(m, key="peta_sebaran_viewport", returned_objects=["bounds", "zoom"], feature_group_to_add=grup_tps)
+        satuan = "TPS" if lapisan.kind == "points" else "sel agregat"
+        st.caption(f"Mode viewport: {len(lapisan.frame)} {satuan} dari {lapisan.tiles} tile (zoom {tampilan.zoom}).")
+    else:
+        # Tampilkan peta; geser/zoom tidak memicu rerun skrip
+        show_map(cached_map(kunci_peta, bangun_peta_sebaran), key="peta_sebaran")
     st.markdown("---")
 
     # SCATTER: Kapasitas vs Volume
@@ -540,7 +545,9 @@ if mode == "Dashboard Data":
     if st.button("Reset Filter Scatter", key="reset_scatter"):
         selected_tps_scatter = []
     
-    if selected_tps_scatter:
+    if selected_tps_scatter and use_store:
+        tps_filtered_scatter = store.tps_rows(selected_tps_scatter)
+    elif selected_tps_scatter:
         tps_filtered_scatter = tps_df[tps_df["id_tps"].isin(selected_tps_scatter)]
     else:
         tps_filtered_scatter = tps_df.copy()
@@ -645,23 +652,20 @@ if mode == "Dashboard Data":
     st.markdown("#### Top 5 TPS Berdasarkan Volume dan Persentase Keterisian")
 
     # FILTER INPUT (TPS SAJA)
-    tps_options_top5 = sorted(histori_df["id_tps"].astype(str).unique().tolist())
+    if use_store:
+        tps_options_top5 = store.histori_tps_ids()
+    else:
+        tps_options_top5 = sorted(histori_rollup.tps["id_tps"].astype(str).tolist())
     selected_tps_top5 = st.multiselect("Pilih TPS:", tps_options_top5, key="filter_tps_top5")
 
     if st.button("Reset Filter Top 5", key="reset_top5"):
         selected_tps_top5 = []
 
-    # FILTER HISTORI BERDASARKAN TPS 
-    hist_filtered_top5 = histori_df.copy()
-
-    if selected_tps_top5:
-        hist_filtered_top5 = hist_filtered_top5[hist_filtered_top5["id_tps"].astype(str).isin(selected_tps_top5)]
-
-    # AGREGASI HISTORI DAN GABUNG DENGAN DATA TPS
-    if not hist_filtered_top5.empty:
-        hist_grouped = (
-            hist_filtered_top5.groupby("id_tps", as_index=False)["Volume_kg"].sum()
-        )
+    # AGREGASI HISTORI (PER TPS) DAN GABUNG DENGAN DATA TPS
+    hist_grouped = total_per_tps(histori_rollup, selected_tps_top5)
+    if use_store:
+        merged_top5 = None  # agregasi + top-k dijalankan di SQLite setelah kriteria dipilih
+    elif not hist_grouped.empty:
         merged_top5 = pd.merge(tps_df, hist_grouped, on="id_tps", how="right")
         merged_top5 = compute_keterisian(merged_top5)
     else:
@@ -686,8 +690,14 @@ if mode == "Dashboard Data":
         judul_grafik = "TPS dengan Persentase Keterisian Tertinggi"
 
     # TAMPILKAN TOP 5 
-    if not merged_top5.empty and kolom_sort in merged_top5.columns:
+    if use_store:
+        top5 = store.top_tps(selected_tps_top5, kolom_sort, k=5)
+    elif not merged_top5.empty and kolom_sort in merged_top5.columns:
         top5 = merged_top5.sort_values(kolom_sort, ascending=False).head(5)
+    else:
+        top5 = pd.DataFrame()
+
+    if not top5.empty:
         fig_top5 = px.bar(
             top5, x="id_tps", y=kolom_sort, text=kolom_sort,
             color=kolom_sort, color_continuous_scale="Blues", title=judul_grafik
@@ -706,24 +716,22 @@ if mode == "Dashboard Data":
     st.markdown("#### Tren Volume Sampah Bulanan")
     
     # Pilihan filter
-    tps_options_tren = sorted(histori_df["id_tps"].unique().tolist())
+    if use_store:
+        tps_options_tren = store.histori_tps_ids()
+    else:
+        tps_options_tren = sorted(histori_rollup.tps["id_tps"].tolist())
     selected_tps_tren = st.multiselect("Pilih TPS:", tps_options_tren, key="filter_tps_tren")
     
     if st.button("Reset Filter Tren", key="reset_tren"):
         selected_tps_tren = []
     
-    # Filter data
-    hist_filtered_tren = histori_df.copy()
-    if selected_tps_tren:
-        hist_filtered_tren = hist_filtered_tren[hist_filtered_tren["id_tps"].isin(selected_tps_tren)]
-
-    if not hist_filtered_tren.empty and "bulan" in hist_filtered_tren.columns:
-        # Agregasi berdasarkan bulan
-        monthly_trend = (
-            hist_filtered_tren.groupby("bulan")["Volume_kg"].sum()
-            .reset_index()
-            .sort_values("bulan")
-        )
+    # Agregasi berdasarkan bulan (dari agregat TPS x bulan / SQLite)
+    if use_store:
+        monthly_trend = store.monthly_totals(selected_tps_tren)
+    else:
+        monthly_trend = total_per_bulan(histori_rollup, selected_tps_tren)
+
+    if not monthly_trend.empty:
     
         # Plot tren bulanan
         fig_trend = px.line(
@@ -761,15 +769,9 @@ if mode == "Dashboard Data":
 
 # MODE: Rute & jadwal
 elif mode == "Jadwal & Rute":
+    import folium
 
-    # Fungsi Haversine
-    def haversine(lat1, lon1, lat2, lon2):
-        R = 6371.0
-        lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-        dlon, dlat = lon2 - lon1, lat2 - lat1
-        a = sin(dlat / 2)**2 + cos(lat1) * cos(lat2) * sin(dlon / 2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1 - a))
-        return R * c
+    tps_df, tpa_df = load_tps_tpa()
 
     # Validasi Dataset
     if tps_df.empty or "nearest_tpa" not in tps_df.columns or "volume_saat_ini" not in tps_df.columns:
@@ -778,39 +780,75 @@ elif mode == "Jadwal & Rute":
     if "keterisian_%" not in tps_df.columns:
         tps_df["keterisian_%"] = (tps_df["volume_saat_ini"] / tps_df["kapasitas"]) * 100
 
-    # Daftar Truk & Wilayah
-    tpa_list = sorted(tpa_df["nama"].unique())
-    all_trucks = [f"TR{str(i).zfill(2)}" for i in range(1, 11)]
-    tpa_truck_map = {}
-    split = [3, 3, 4]
-    idx = 0
-    for tpa, count in zip(tpa_list, split):
-        tpa_truck_map[tpa] = all_trucks[idx:idx + count]
-        idx += count
+    # Daftar Truk & Wilayah: truk dibagi ke TPA sebanding muatannya, lalu TPS
+    # tiap TPA dibagi ke zona kerja truk yang ringkas dan seimbang muatannya
+    all_trucks = FLEET
+    versi_data = dataset_version("tps", "tpa")
+    muatan_wilayah = tps_df.groupby("nearest_tpa")["volume_saat_ini"].sum().to_dict()
+    tpa_truck_map = truck_map(tpa_df["nama"], split=load_split(tpa_df["nama"], muatan_wilayah))
+    kunci_zona = route_key(
+        versi_data, tps_df["id_tps"], solver="assign_zones", trucks=tpa_truck_map, metode=ZONE_METHOD
+    )
+    zona_truk, _ = memoize(kunci_zona, lambda: assign_zones(tps_df, tpa_df, tpa_truck_map))
+    tps_df = tps_df.assign(zona=zona_truk)
 
     st.markdown("#### Daftar Truk & Pembagian Wilayah")
-    daftar_truk = []
-    for tpa, trucks in tpa_truck_map.items():
-        for truk in trucks:
-            daftar_truk.append({"Truk": truk, "Wilayah (TPA)": tpa})
-    st.dataframe(pd.DataFrame(daftar_truk), use_container_width=True)
+    st.dataframe(zone_summary(tps_df, tps_df["zona"], tpa_truck_map), use_container_width=True)
 
     # Jadwal TPS
     tps_df = tps_df.copy()
     tps_df["prioritas_rank"] = tps_df.groupby("nearest_tpa")["keterisian_%"].rank(method="first", ascending=False)
     tps_df = tps_df.sort_values(["nearest_tpa", "prioritas_rank"])
 
-    assigned_list = []
-    for tpa in tps_df["nearest_tpa"].unique():
-        subset = tps_df[tps_df["nearest_tpa"] == tpa].copy()
-        trucks = tpa_truck_map.get(tpa, ["Cadangan"])
-        subset["Truk"] = [trucks[i % len(trucks)] for i in range(len(subset))]
-        assigned_list.append(subset)
-    jadwal_final = pd.concat(assigned_list)
+    # Rencana armada (CVRP): ritase tiap truk per TPA dengan batas kapasitas angkut
+    kapasitas_truk = st.number_input(
+        "Kapasitas angkut per truk (m³)", min_value=100.0, max_value=10000.0,
+        value=TRUCK_PAYLOAD, step=100.0, key="kapasitas_truk"
+    )
+    # Penyedia jarak (SAMPAH_DISTANCE); kembali ke haversine bila file jarak tidak bisa dipakai
+    try:
+        penyedia_jarak = active_provider()
+        tables = distance_tables(tps_df, tpa_df, versi_data, penyedia_jarak)
+    except (OSError, ValueError, KeyError) as e:
+        st.warning(f"Penyedia jarak tidak dapat dipakai, memakai haversine: {e}")
+        penyedia_jarak = HaversineProvider()
+        tables = distance_tables(tps_df, tpa_df, versi_data, penyedia_jarak)
+    st.caption(f"Sumber jarak: {penyedia_jarak.label}")
+    tanpa_wilayah = unplanned_stops(tables, tps_df)
+    if tanpa_wilayah:
+        st.warning(
+            f"{len(tanpa_wilayah)} TPS tidak masuk rencana karena nearest_tpa tidak dikenal: "
+            + ", ".join(tanpa_wilayah[:20]) + (" ..." if len(tanpa_wilayah) > 20 else "")
+        )
+    kunci_armada = route_key(
+        versi_data, tps_df["id_tps"], solver="plan_fleet", payload=kapasitas_truk, trucks=tpa_truck_map,
+        distance=penyedia_jarak.key, zona=ZONE_METHOD,
+    )
+    # Rencana dari planner.py (batch malam) dipakai bila masih cocok dengan data & pengaturan
+    rencana_batch = matching_plan(plan_meta(versi_data, penyedia_jarak, kapasitas_truk, tpa_truck_map))
+    if rencana_batch is not None:
+        st.caption(
+            f"Memakai rencana batch tanggal {rencana_batch.meta.get('tanggal')} "
+            f"(dibuat {rencana_batch.meta.get('dibuat')})"
+        )
+        penugasan = rencana_batch.jadwal[["id_tps", "Truk", "Ritase", "Urutan"]]
+        ringkasan_truk = rencana_batch.ringkasan
+    else:
+        rencana_armada, _ = memoize(kunci_armada, lambda: plan_fleet(
+            tables, tps_df, tpa_truck_map, payload=kapasitas_truk, zone_column="zona"
+        ))
+        penugasan = stop_assignments(rencana_armada, tables)
+        ringkasan_truk = truck_summary(rencana_armada, tables)
+    jadwal_final = tps_df.merge(penugasan, on="id_tps", how="left").sort_values(
+        ["nearest_tpa", "Truk", "Ritase", "Urutan"]
+    )
+
+    st.markdown("#### Rencana Rute per Truk")
+    st.dataframe(ringkasan_truk, use_container_width=True)
 
     jadwal_df = jadwal_final[[
         "id_tps", "nama", "nearest_tpa", "keterisian_%", "kapasitas",
-        "volume_saat_ini", "Truk"
+        "volume_saat_ini", "Truk", "Ritase", "Urutan"
     ]].rename(columns={
         "id_tps": "ID TPS",
         "nama": "Nama TPS",
@@ -845,211 +883,227 @@ elif mode == "Jadwal & Rute":
     
     tps_options = tps_df["id_tps"].astype(str).unique().tolist()
     selected_tps = st.multiselect("Pilih TPS", tps_options)
+    batas_waktu = st.number_input(
+        "Batas waktu optimasi (detik)", min_value=0.1, max_value=30.0,
+        value=LOCAL_SEARCH_BUDGET, step=0.5, key="batas_waktu_rute"
+    )
+    inkremental = st.checkbox(
+        "Perbaiki rute sebelumnya saat TPS ditambah/dihapus (inkremental)", value=True, key="rute_inkremental"
+    )
+    multi_start = st.checkbox(
+        f"Multi-start paralel ({default_workers()} core) untuk rute besar", value=False, key="rute_multi_start"
+    )
+    jumlah_proses = default_workers() if multi_start else None
+    if multi_start:
+        # Pool proses disiapkan sekarang agar start-up worker tidak memakan anggaran optimasi
+        warm_pool(jumlah_proses)
     
     # Titik tengah peta
     center_lat = float(tps_df["latitude"].mean())
     center_lon = float(tps_df["longitude"].mean())
-    m = folium.Map(location=[center_lat, center_lon], zoom_start=12)
     
+    backend_rute = st.radio(
+        "Mesin peta:", list(BACKEND_LABELS), format_func=BACKEND_LABELS.get, horizontal=True,
+        index=list(BACKEND_LABELS).index(default_backend(len(tps_df))), key="backend_peta_rute",
+    )
+
     # SEBELUM RUTE DICARI 
-    if not selected_tps:
-        # TPS icon 
-        for _, row in tps_df.iterrows():
-            folium.Marker(
-                location=[row["latitude"], row["longitude"]],
-                popup=f"{row['id_tps']}",
-                icon=folium.Icon(color="green", icon="trash", prefix="fa")
-            ).add_to(m)
-            folium.map.Marker(
-                [row["latitude"], row["longitude"]],
-                icon=folium.DivIcon(html=f"<div style='font-size:12px; font-weight:bold; color:green; text-shadow:1px 1px 2px #fff;'>{row['id_tps']}</div>")
-            ).add_to(m)
-    
-        # TPA icon 
-        for _, row in tpa_df.iterrows():
-            folium.Marker(
-                location=[row["latitude"], row["longitude"]],
-                popup=f"{row['nama']}",
-                icon=folium.Icon(color="red", icon="recycle", prefix="fa")
-            ).add_to(m)
-            folium.map.Marker(
-                [row["latitude"], row["longitude"]],
-                icon=folium.DivIcon(html=f"<div style='font-size:12px; font-weight:bold; color:red; text-shadow:1px 1px 2px #fff;'>{row['nama']}</div>")
-            ).add_to(m)
-    
-        # Legenda 
-        legend_html = """
-        <div style="
-            position: fixed; 
-            bottom: 40px; left: 40px; 
-            width: 160px; 
-            background-color: rgba(255,255,255,0.9); 
-            border: 2px solid grey; 
-            z-index: 9999; 
-            font-size: 14px; 
-            box-shadow: 2px 2px 6px rgba(0,0,0,0.3); 
-            border-radius: 8px; 
-            padding: 10px; 
-            color: black;">
-            <div style="margin-bottom:4px;"><i class="fa fa-trash" style="color:green"></i> TPS</div>
-            <div><i class="fa fa-recycle" style="color:red"></i> TPA</div>
-        </div>
-        """
-        m.get_root().html.add_child(folium.Element(legend_html))
-        st_folium(m, width=1000, height=550)
+    if not selected_tps and backend_rute == "deck":
+        def bangun_deck_tps():
+            return deck_map(
+                [
+                    scatter_layer(
+                        point_columns(tps_df, "id_tps", {"nama": "Nama", "keterisian_%": "Keterisian (%)"},
+                                      percent_column="keterisian_%"),
+                        layer_id="tps",
+                    ),
+                    scatter_layer(point_columns(tpa_df, "nama"), radius=150, min_pixels=6, layer_id="tpa"),
+                ],
+                view_state(tps_df["latitude"], tps_df["longitude"]),
+            )
+
+        show_deck(cached_map(map_key(versi_data, tps_df["id_tps"], peta="tps_tpa", backend="deck"), bangun_deck_tps))
+
+    elif not selected_tps:
+        # Peta semua TPS & TPA, di-cache per versi data
+        def bangun_peta_tps():
+            m = folium.Map(location=[center_lat, center_lon], zoom_start=12)
+            # TPS & TPA sebagai satu layer per jenis titik
+            add_point_layer(
+                m, tps_df, "id_tps", {"nama": "Nama", "keterisian_%": "Keterisian (%)"},
+                color="green", icon="trash", name="TPS",
+            )
+            add_point_layer(m, tpa_df, "nama", {}, color="red", icon="recycle", name="TPA", mode="geojson")
+
+            # Legenda 
+            legend_html = """
+            <div style="
+                position: fixed; 
+                bottom: 40px; left: 40px; 
+                width: 160px; 
+                background-color: rgba(255,255,255,0.9); 
+                border: 2px solid grey; 
+                z-index: 9999; 
+                font-size: 14px; 
+                box-shadow: 2px 2px 6px rgba(0,0,0,0.3); 
+                border-radius: 8px; 
+                padding: 10px; 
+                color: black;">
+                <div style="margin-bottom:4px;"><i class="fa fa-trash" style="color:green"></i> TPS</div>
+                <div><i class="fa fa-recycle" style="color:red"></i> TPA</div>
+            </div>
+            """
+            m.get_root().html.add_child(folium.Element(legend_html))
+            return m
+
+        m = cached_map(map_key(versi_data, tps_df["id_tps"], peta="tps_tpa", backend="folium"), bangun_peta_tps)
+        show_map(m, key="peta_rute")
     
     else:
         selected_tps_df = tps_df[tps_df["id_tps"].astype(str).isin(selected_tps)].copy()
-        remaining = selected_tps_df.reset_index(drop=True).copy()
-        current = remaining.iloc[0]
-        route_order = [current]
-        remaining = remaining.drop(index=0).reset_index(drop=True)
-    
-        # Greedy 
-        while not remaining.empty:
-            remaining["jarak"] = remaining.apply(
-                lambda row: haversine(current["latitude"], current["longitude"],
-                                      row["latitude"], row["longitude"]), axis=1)
-            nearest_idx = remaining["jarak"].idxmin()
-            nearest = remaining.loc[nearest_idx]
-            route_order.append(nearest)
-            current = nearest
-            remaining = remaining.drop(nearest_idx).reset_index(drop=True)
-    
-        route = pd.DataFrame(route_order).reset_index(drop=True)
-    
-        #  hitung total jarak 
-        def total_route_distance(route_df):
-            total = 0
-            for i in range(len(route_df) - 1):
-                total += haversine(route_df.iloc[i]["latitude"], route_df.iloc[i]["longitude"],
-                                   route_df.iloc[i+1]["latitude"], route_df.iloc[i+1]["longitude"])
-            return total
-    
-        #  Algoritma 2-Opt Improvement 
-        def two_opt(route_df):
-            best = route_df.copy()
-            improved = True
-            while improved:
-                improved = False
-                best_distance = total_route_distance(best)
-                for i in range(1, len(best) - 2):
-                    for j in range(i + 1, len(best)):
-                        if j - i == 1:
-                            continue
-                        new_route = best.copy()
-                        new_route.iloc[i:j] = best.iloc[i:j].iloc[::-1].values
-                        new_distance = total_route_distance(new_route)
-                        if new_distance < best_distance:
-                            best = new_route.copy()
-                            improved = True
-                            break
-                    if improved:
-                        break
-            return best
-    
-        # Terapkan 2-Opt pada hasil Greedy
-        route = two_opt(route)
-    
+        selected_tps_df = selected_tps_df.reset_index(drop=True)
+
+        # Matriks jarak TPS x TPS dan TPS x TPA (tervektorisasi, di-cache per versi dataset)
+        positions = tps_positions(tables, selected_tps_df["id_tps"])
+        dist = submatrix(tables, positions)
+
+        # Held-Karp untuk rute kecil, greedy + local search untuk sisanya (termasuk jarak ke TPA terdekat)
+        end_cost = tables.tps_tpa[positions].min(axis=1)
+        # Hasil optimasi di-cache per himpunan TPS + versi data + pengaturan solver
+        kunci_rute = route_key(
+            versi_data, selected_tps_df["id_tps"], solver="update_route",
+            start=selected_tps_df["id_tps"].iloc[0], time_budget=batas_waktu, inkremental=inkremental,
+            workers=jumlah_proses, distance=penyedia_jarak.key,
+        )
+        # Mode inkremental: rute sebelumnya (di session state) diperbaiki, bukan dioptimasi ulang
+        rute_sebelumnya = st.session_state.get("rute_sebelumnya")
+        previous = None
+        if inkremental and rute_sebelumnya and rute_sebelumnya["versi"] == (versi_data, penyedia_jarak.key):
+            indeks_tps = {tps_id: i for i, tps_id in enumerate(selected_tps_df["id_tps"].astype(str))}
+            previous = [indeks_tps.get(tps_id, -1) for tps_id in rute_sebelumnya["urutan"]]
+        # BallTree haversine untuk greedy hanya cocok bila jaraknya memang haversine
+        koordinat = (
+            dict(lat=selected_tps_df["latitude"].to_numpy(), lon=selected_tps_df["longitude"].to_numpy())
+            if penyedia_jarak.geometric else {}
+        )
+        hasil_rute, rute_dari_cache = memoize(kunci_rute, lambda: update_route(
+            previous, dist, end_cost, start=0, time_budget=batas_waktu, workers=jumlah_proses, **koordinat,
+        ))
+        order = hasil_rute.order
+        route = selected_tps_df.iloc[order].reset_index(drop=True)
+        st.session_state["rute_sebelumnya"] = {
+            "versi": (versi_data, penyedia_jarak.key), "urutan": route["id_tps"].astype(str).tolist()
+        }
+
         #  Cari TPA terdekat dari titik terakhir 
         last = route.iloc[-1]
-        nearest_tpa_df = tpa_df.copy()
-        nearest_tpa_df["jarak_km"] = nearest_tpa_df.apply(
-            lambda row: haversine(last["latitude"], last["longitude"],
-                                  row["latitude"], row["longitude"]), axis=1)
-        nearest_tpa = nearest_tpa_df.sort_values("jarak_km").iloc[0]
-        truk_ditangani = tpa_truck_map.get(nearest_tpa["nama"], ["Tidak Diketahui"])[0]
-    
-        #  VISUALISASI RUTE 
-        for i, point in enumerate(route.itertuples()):
-            color = "green" if i == 0 else "blue"
-            icon_type = "truck" if i == 0 else "trash"
-            folium.Marker(
-                [point.latitude, point.longitude],
-                popup=f"{i+1}. {point.id_tps}",
-                icon=folium.Icon(color=color, icon=icon_type, prefix="fa")
-            ).add_to(m)
-    
-            # Label ID TPS
-            folium.map.Marker(
-                [point.latitude, point.longitude],
-                icon=folium.DivIcon(html=f"""
-                    <div style='font-size:11px; font-weight:bold; color:green;
-                    text-shadow:1px 1px 2px #fff; transform: translate(-50%, 14px);'>
-                        {point.id_tps}
-                    </div>
-                """)
+        tpa_idx, dist_to_tpa = closest_tpa(tables, positions[order[-1]])
+        nearest_tpa = tpa_df.iloc[tpa_idx]
+        # Truk pemilik zona TPS yang dilalui rute
+        truk_ditangani = ", ".join(pd.unique(route["zona"].astype(str))) or "Tidak Diketahui"
+    
+        # Peta rute di-cache per versi data + urutan rute + sumber jarak
+        # Seluruh tur (TPS pertama -> TPS terakhir) sebagai satu garis, mengikuti
+        # jalan bila sumber jarak berupa jaringan jalan
+        def garis_tur():
+            tur = []
+            for (lat1, lon1), (lat2, lon2) in zip(
+                route[["latitude", "longitude"]].to_numpy()[:-1], route[["latitude", "longitude"]].to_numpy()[1:]
+            ):
+                ruas = segment_geometry(penyedia_jarak, lat1, lon1, lat2, lon2)
+                tur.extend(ruas if not tur else ruas[1:])
+            return tur
+
+        # Titik berhenti satu layer GeoJSON/cluster, tur satu PolyLine (bukan marker dan garis per TPS)
+        def bangun_peta_rute():
+            m = folium.Map(location=[center_lat, center_lon], zoom_start=12)
+            #  VISUALISASI RUTE 
+            tur = garis_tur()
+            if len(tur) > 1:
+                folium.PolyLine(tur, color="blue", weight=4, opacity=0.8).add_to(m)
+
+            # Garis dari TPS terakhir ke TPA
+            folium.PolyLine(
+                segment_geometry(
+                    penyedia_jarak, last["latitude"], last["longitude"],
+                    nearest_tpa["latitude"], nearest_tpa["longitude"],
+                ),
+                color="red", weight=5,
+                tooltip=f"TPS terakhir ➜ {nearest_tpa['nama']}"
             ).add_to(m)
-    
-            # Garis antar titik
-            if i < len(route) - 1:
-                next_point = route.iloc[i + 1]
-                folium.PolyLine(
-                    [[point.latitude, point.longitude],
-                     [next_point["latitude"], next_point["longitude"]]],
-                    color="blue", weight=4, opacity=0.8
-                ).add_to(m)
-    
-        # Garis dari TPS terakhir ke TPA
-        folium.PolyLine(
-            [[last["latitude"], last["longitude"]],
-             [nearest_tpa["latitude"], nearest_tpa["longitude"]]],
-            color="red", weight=5,
-            tooltip=f"TPS terakhir ➜ {nearest_tpa['nama']}"
-        ).add_to(m)
-    
-        # Marker TPA Tujuan
-        folium.Marker(
-            [nearest_tpa["latitude"], nearest_tpa["longitude"]],
-            popup=f"{nearest_tpa['nama']}",
-            icon=folium.Icon(color="red", icon="flag", prefix="fa")
-        ).add_to(m)
-    
-        # Label TPA
-        folium.map.Marker(
-            [nearest_tpa["latitude"], nearest_tpa["longitude"]],
-            icon=folium.DivIcon(html=f"""
-                <div style='font-size:11px; font-weight:bold; color:red;
-                text-shadow:1px 1px 2px #fff; transform: translate(-50%, 14px);'>
-                    {nearest_tpa['nama']}
-                </div>
-            """)
-        ).add_to(m)
-    
-        # --- LEGEND ---
-        legend_html = """
-        <div style="
-            position: fixed; 
-            bottom: 40px; left: 40px; 
-            width: 180px; 
-            background-color: rgba(255,255,255,0.9); 
-            border: 2px solid grey; 
-            z-index: 9999; 
-            font-size: 14px; 
-            box-shadow: 2px 2px 6px rgba(0,0,0,0.3); 
-            border-radius: 8px; 
-            padding: 10px; 
-            color: black;">
-            <div style="margin-bottom:4px;"><i class="fa fa-truck" style="color:green"></i> Start TPS</div>
-            <div><i class="fa fa-flag" style="color:red"></i> Finish TPA</div>
-        </div>
-        """
-        m.get_root().html.add_child(folium.Element(legend_html))
-        st_folium(m, width=1000, height=550)
+
+            titik = route.assign(urutan=np.arange(1, len(route) + 1))
+            add_point_layer(m, titik.iloc[:1], "id_tps", {"urutan": "Urutan"}, color="green", icon="truck",
+                            name="Start TPS")
+            add_point_layer(m, titik.iloc[1:], "id_tps", {"urutan": "Urutan"}, color="blue", icon="trash",
+                            name="TPS")
+            # Marker + label TPA Tujuan
+            add_point_layer(m, nearest_tpa.to_frame().T, "nama", {}, color="red", icon="flag", name="TPA")
+
+            # --- LEGEND ---
+            legend_html = """
+            <div style="
+                position: fixed; 
+                bottom: 40px; left: 40px; 
+                width: 180px; 
+                background-color: rgba(255,255,255,0.9); 
+                border: 2px solid grey; 
+                z-index: 9999; 
+                font-size: 14px; 
+                box-shadow: 2px 2px 6px rgba(0,0,0,0.3); 
+                border-radius: 8px; 
+                padding: 10px; 
+                color: black;">
+                <div style="margin-bottom:4px;"><i class="fa fa-truck" style="color:green"></i> Start TPS</div>
+                <div><i class="fa fa-flag" style="color:red"></i> Finish TPA</div>
+            </div>
+            """
+            m.get_root().html.add_child(folium.Element(legend_html))
+            return m
+
+        # Versi WebGL: satu PathLayer untuk seluruh tur, satu untuk ruas ke TPA
+        def bangun_deck_rute():
+            tur = garis_tur()
+            ke_tpa = segment_geometry(
+                penyedia_jarak, last["latitude"], last["longitude"], nearest_tpa["latitude"], nearest_tpa["longitude"]
+            )
+            return deck_map(
+                [
+                    path_layer([tur], layer_id="rute") if len(tur) > 1 else None,
+                    path_layer([ke_tpa], rgb=TO_TPA_RGB, width=5, layer_id="ke_tpa",
+                               names=[f"TPS terakhir ➜ {nearest_tpa['nama']}"]),
+                    scatter_layer(
+                        point_columns(
+                            route, "id_tps", {"keterisian_%": "Keterisian (%)"}, percent_column="keterisian_%"
+                        ),
+                        radius=30, min_pixels=5, layer_id="tps",
+                    ),
+                    scatter_layer(point_columns(route.iloc[:1], "id_tps", rgb=(30, 30, 30)), radius=60, min_pixels=8,
+                                  layer_id="start"),
+                    scatter_layer(point_columns(nearest_tpa.to_frame().T, "nama"), radius=150, min_pixels=8,
+                                  layer_id="tpa"),
+                ],
+                view_state(
+                    np.r_[route["latitude"].to_numpy(float), float(nearest_tpa["latitude"])],
+                    np.r_[route["longitude"].to_numpy(float), float(nearest_tpa["longitude"])],
+                ),
+            )
+
+        kunci_peta = map_key(
+            versi_data, route["id_tps"], peta="rute", urutan=route["id_tps"].astype(str).tolist(),
+            tpa=nearest_tpa["nama"], distance=penyedia_jarak.key, backend=backend_rute,
+        )
+        if backend_rute == "deck":
+            show_deck(cached_map(kunci_peta, bangun_deck_rute))
+            st.caption("Titik hitam: TPS awal; warna TPS menurut keterisian; garis merah menuju TPA.")
+        else:
+            show_map(cached_map(kunci_peta, bangun_peta_rute), key="peta_rute")
     
         #  INSIGHT RUTE 
-        segmen_jarak = []
-        for i in range(len(route) - 1):
-            dist = haversine(route.iloc[i]["latitude"], route.iloc[i]["longitude"],
-                             route.iloc[i+1]["latitude"], route.iloc[i+1]["longitude"])
-            segmen_jarak.append({
-                "Dari": route.iloc[i]["id_tps"],
-                "Ke": route.iloc[i+1]["id_tps"],
-                "Jarak (km)": round(dist, 2)
-            })
-    
-        dist_to_tpa = haversine(route.iloc[-1]["latitude"], route.iloc[-1]["longitude"],
-                                nearest_tpa["latitude"], nearest_tpa["longitude"])
+        segmen_jarak = [
+            {"Dari": dari, "Ke": ke, "Jarak (km)": round(float(d), 2)}
+            for dari, ke, d in zip(route["id_tps"][:-1], route["id_tps"][1:], segment_lengths(order, dist))
+        ]
         segmen_jarak.append({
             "Dari": route.iloc[-1]["id_tps"],
             "Ke": nearest_tpa["nama"],
@@ -1061,16 +1115,9 @@ elif mode == "Jadwal & Rute":
         urutan_tps = " ➜ ".join(route["id_tps"].astype(str))
     
         # Hitung jarak sebelum optimasi (urutan asli user)
-        original_order = selected_tps_df.reset_index(drop=True)
-        segmen_awal = []
-        for i in range(len(original_order) - 1):
-            dist_awal = haversine(original_order.iloc[i]["latitude"], original_order.iloc[i]["longitude"],
-                                  original_order.iloc[i+1]["latitude"], original_order.iloc[i+1]["longitude"])
-            segmen_awal.append(dist_awal)
-        dist_awal_tpa = haversine(original_order.iloc[-1]["latitude"], original_order.iloc[-1]["longitude"],
-                                  nearest_tpa["latitude"], nearest_tpa["longitude"])
-        segmen_awal.append(dist_awal_tpa)
-        total_awal = sum(segmen_awal)
+        original_order = np.arange(len(selected_tps_df))
+        _, dist_awal_tpa = closest_tpa(tables, positions[-1])
+        total_awal = route_length(original_order, dist) + dist_awal_tpa
     
         # Penghematan jarak (%)
         if total_awal > 0:
@@ -1098,15 +1145,70 @@ elif mode == "Jadwal & Rute":
             st.write(f"- **Penghematan jarak:** {penghematan:.2f}%")
             st.write(f"- **Rata-rata jarak antar segmen:** {avg_distance:.2f} km")
             st.write(f"- **TPA tujuan akhir:** {nearest_tpa['nama']} ({dist_to_tpa:.2f} km dari TPS terakhir)")
+            sumber_rute = "dari cache" if rute_dari_cache else f"{hasil_rute.seconds * 1000:.0f} ms"
+            st.write(f"- **Mesin optimasi:** {hasil_rute.engine} ({sumber_rute})")
             
             st.markdown("#### Jarak Antar Segmen Rute")
             st.dataframe(pd.DataFrame(segmen_jarak).style.format({"Jarak (km)": "{:.2f}"}))        
-                
-        
+
+    st.markdown("---")
+
+    # Rute pickup mingguan dari routes.csv (titik pickup_sampah == "Yes" per hari)
+    st.markdown("#### Rute Pickup Mingguan")
+    try:
+        indeks_pickup = load_pickup_index()
+    except (OSError, ValueError, KeyError) as e:
+        st.warning(f"Gagal memuat {DATASETS['routes']}: {e}")
+        indeks_pickup = None
+    if indeks_pickup is not None and indeks_pickup.days():
+        if indeks_pickup.swapped:
+            st.caption("Kolom latitude/longitude di routes.csv tertukar; koordinat sudah diperbaiki saat dimuat.")
+        # Tiap hari di-cache sendiri; hari yang belum ada dihitung paralel bila multi-start aktif
+        rute_mingguan = plan_week(indeks_pickup, time_budget=batas_waktu, workers=jumlah_proses)
+        st.dataframe(week_summary(rute_mingguan), use_container_width=True)
+
+        hari_pickup = st.selectbox(
+            "Pilih hari:", indeks_pickup.days(), format_func=DAY_LABELS.get, key="hari_pickup"
+        )
+        rute_hari = rute_mingguan[hari_pickup]
+
+        def bangun_peta_pickup():
+            tur = list(zip(rute_hari.lat, rute_hari.lon))
+            peta_pickup = folium.Map(
+                location=[float(np.mean(rute_hari.lat)), float(np.mean(rute_hari.lon))], zoom_start=12
+            )
+            folium.PolyLine(tur + tur[:1], color="blue", weight=3, opacity=0.8).add_to(peta_pickup)
+            titik = pd.DataFrame({
+                "id_titik": rute_hari.ids, "latitude": rute_hari.lat, "longitude": rute_hari.lon,
+                "urutan": np.arange(1, len(rute_hari.ids) + 1),
+            })
+            add_point_layer(peta_pickup, titik.iloc[:1], "id_titik", {"urutan": "Urutan"}, color="green",
+                            icon="truck", name="Titik awal")
+            add_point_layer(peta_pickup, titik.iloc[1:], "id_titik", {"urutan": "Urutan"}, color="blue",
+                            icon="trash", name="Titik pickup")
+            return peta_pickup
+
+        kunci_pickup = map_key(
+            dataset_version("routes"), rute_hari.ids, peta="pickup", hari=hari_pickup,
+            urutan=[str(i) for i in rute_hari.ids],
+        )
+        peta_pickup = cached_map(kunci_pickup, bangun_peta_pickup)
+        show_map(peta_pickup, key="peta_pickup", height=450)
+        st.caption(
+            f"{DAY_LABELS[hari_pickup]}: {len(rute_hari.ids)} titik, tur {rute_hari.distance:.2f} km "
+            f"(mulai dan kembali ke titik hijau)"
+        )
+
+
 # MODE: Prediksi Volume Sampah
 elif mode == "Prediksi Volume Sampah":
+    import plotly.express as px
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.metrics import mean_absolute_error, r2_score
+
     st.markdown("#### Prediksi Volume Sampah per TPS")
 
+    histori_df = safe_read_csv("histori")
     df = histori_df.copy()
     required_cols = {"tanggal", "id_tps", "latitude", "longitude", "Volume_kg", "kapasitas", "keterisian_%"}
     if df.empty:
@@ -1117,6 +1219,7 @@ elif mode == "Prediksi Volume Sampah":
         # Format tanggal dan sort
         df["tanggal"] = pd.to_datetime(df["tanggal"], errors="coerce")
         df = df.dropna(subset=["tanggal", "Volume_kg", "id_tps"]).sort_values("tanggal").reset_index(drop=True)
+        df["id_tps"] = df["id_tps"].astype(str)
 
         # Fitur waktu 
         df["tahun"] = df["tanggal"].dt.year
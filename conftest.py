@@ -0,0 +1 @@
+# Modul aplikasi berada di root repo; file ini membuat pytest menambahkan root ke sys.path
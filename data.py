@@ -0,0 +1,248 @@
+"""Lapisan data bersama untuk dataset aplikasi.
+
+Setiap dataset dimuat sekali per proses server dan disimpan di cache yang
+dikunci pada path file beserta mtime/size-nya, jadi rerun Streamlit tidak
+mem-parsing ulang file dari disk. Frame yang diberikan ke sesi adalah salinan
+dangkal (copy-on-write) dari frame di cache, sehingga perubahan di satu sesi
+tidak pernah bocor ke sesi lain.
+
+Penyimpanan bisa CSV (default) atau Parquet. Mode diatur lewat variabel
+lingkungan ``SAMPAH_STORAGE``:
+
+- ``auto``    : pakai ``<nama>.parquet`` bila ada dan lebih baru dari CSV-nya
+- ``csv``     : selalu baca CSV
+- ``parquet`` : selalu baca Parquet
+
+File Parquet dibuat dengan ``python data.py convert``.
+"""
+import argparse
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+# Copy-on-write harus aktif untuk seluruh proses, bukan hanya di dalam loader:
+# frame dari load_dataset berbagi array dengan cache dan baru diubah oleh
+# pemanggil setelah loader selesai, jadi pd.option_context di loader tidak
+# melindungi cache. Semua modul aplikasi memuat data lewat modul ini, dan
+# perilaku ini menjadi default di pandas 3.
+pd.set_option("mode.copy_on_write", True)
+
+DATA_DIR = Path(__file__).resolve().parent
+
+DATASETS = {
+    "tps": "tps.csv",
+    "tpa": "tpa.csv",
+    "histori": "histori_rute.csv",
+    "routes": "routes.csv",
+    "vehicle": "vehicle_routing_matrix.csv",
+}
+
+# Tipe kolom eksplisit; kolom yang tidak disebut dibiarkan ke inferensi pandas
+SCHEMAS = {
+    "tps": {
+        "latitude": "float64",
+        "longitude": "float64",
+        "kapasitas": "float64",
+        "volume_saat_ini": "float64",
+        "nearest_dist_km": "float64",
+    },
+    "tpa": {
+        "latitude": "float64",
+        "longitude": "float64",
+    },
+    "histori": {
+        "id_tps": "category",
+        "kapasitas": "float32",
+        "Volume_kg": "float32",
+        "keterisian_%": "float32",
+        "latitude": "float64",
+        "longitude": "float64",
+    },
+    "routes": {
+        "hari": "category",
+        "pickup_sampah": "category",
+        "longitude": "float64",
+        "latitude": "float64",
+    },
+}
+
+PARSE_DATES = {
+    "histori": ["tanggal"],
+}
+
+STORAGE_MODES = ("auto", "csv", "parquet")
+
+_cache = {}
+_row_counts = {}
+_lock = threading.Lock()
+
+
+def storage_mode():
+    mode = os.environ.get("SAMPAH_STORAGE", "auto").lower()
+    return mode if mode in STORAGE_MODES else "auto"
+
+
+def csv_path(name):
+    return DATA_DIR / DATASETS[name]
+
+
+def parquet_path(name):
+    return csv_path(name).with_suffix(".parquet")
+
+
+# File yang benar-benar dibaca sesuai mode penyimpanan
+def dataset_path(name):
+    mode = storage_mode()
+    if mode == "csv":
+        return csv_path(name)
+    if mode == "parquet":
+        return parquet_path(name)
+    pq_file, csv_file = parquet_path(name), csv_path(name)
+    if pq_file.exists() and (not csv_file.exists() or pq_file.stat().st_mtime_ns >= csv_file.stat().st_mtime_ns):
+        return pq_file
+    return csv_file
+
+
+# Tanda tangan file: berubah setiap kali isi file diganti
+def file_signature(path):
+    stat = os.stat(path)
+    return (str(path), stat.st_mtime_ns, stat.st_size)
+
+
+def dataset_signature(name):
+    return file_signature(dataset_path(name))
+
+
+# Versi gabungan beberapa dataset, dipakai sebagai kunci cache turunan (matriks jarak, rute, peta)
+def dataset_version(*names):
+    parts = [repr(dataset_signature(n)) for n in names]
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:16]
+
+
+def _read_columns(path):
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+        return list(pq.read_schema(path).names)
+    return pd.read_csv(path, nrows=0).columns.tolist()
+
+
+def _read(name, path, columns):
+    if path.suffix == ".parquet":
+        return pd.read_parquet(path, columns=columns)
+    schema = SCHEMAS.get(name, {})
+    dates = [c for c in PARSE_DATES.get(name, []) if c in columns]
+    return pd.read_csv(
+        path,
+        usecols=columns,
+        dtype={c: t for c, t in schema.items() if c in columns},
+        parse_dates=dates or None,
+    )[columns]
+
+
+# Entri cache per dataset: kolom dibaca sesuai kebutuhan (proyeksi kolom) lalu
+# disimpan per kolom, jadi halaman lain yang butuh kolom sama tidak membaca ulang
+def load_dataset(name, columns=None):
+    path = dataset_path(name)
+    key = file_signature(path)
+    with _lock:
+        entry = _cache.get(name)
+        if entry is None or entry["key"] != key:
+            entry = {"key": key, "columns": _read_columns(path), "data": {}}
+            _cache[name] = entry
+        wanted = entry["columns"] if columns is None else list(columns)
+        missing = [c for c in wanted if c not in entry["data"]]
+        if missing:
+            frame = _read(name, path, missing)
+            entry["data"].update({c: frame[c] for c in missing})
+        return pd.DataFrame({c: entry["data"][c] for c in wanted}, copy=False)
+
+
+def dataset_columns(name):
+    path = dataset_path(name)
+    with _lock:
+        entry = _cache.get(name)
+        if entry is not None and entry["key"] == file_signature(path):
+            return list(entry["columns"])
+    return _read_columns(path)
+
+
+# Jumlah baris tanpa menyimpan isi dataset (metadata Parquet / hitung per potongan)
+def dataset_rows(name):
+    path = dataset_path(name)
+    key = file_signature(path)
+    with _lock:
+        cached = _row_counts.get(name)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+        rows = pq.ParquetFile(path).metadata.num_rows
+    else:
+        rows = sum(len(c) for c in iter_dataset_chunks(name, columns=dataset_columns(name)[:1]))
+    with _lock:
+        _row_counts[name] = (key, rows)
+    return rows
+
+
+# Baca dataset per potongan tanpa memuat seluruh file ke memori
+def iter_dataset_chunks(name, columns=None, chunksize=100_000):
+    path = dataset_path(name)
+    columns = list(columns) if columns is not None else _read_columns(path)
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+        return
+    schema = SCHEMAS.get(name, {})
+    dates = [c for c in PARSE_DATES.get(name, []) if c in columns]
+    reader = pd.read_csv(
+        path,
+        usecols=columns,
+        dtype={c: t for c, t in schema.items() if c in columns},
+        parse_dates=dates or None,
+        chunksize=chunksize,
+    )
+    with reader:
+        for chunk in reader:
+            yield chunk[columns]
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
+        _row_counts.clear()
+
+
+# Konversi CSV -> Parquet dengan skema bertipe
+def convert_to_parquet(names=None):
+    written = []
+    for name in names or DATASETS:
+        src = csv_path(name)
+        columns = _read_columns(src)
+        frame = _read(name, src, columns)
+        frame.to_parquet(parquet_path(name), index=False, engine="pyarrow")
+        written.append(parquet_path(name))
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Utilitas dataset rute pengumpulan sampah")
+    sub = parser.add_subparsers(dest="command", required=True)
+    convert = sub.add_parser("convert", help="Konversi dataset CSV ke Parquet bertipe")
+    convert.add_argument("datasets", nargs="*", help=f"Nama dataset: {', '.join(DATASETS)} (default: semua)")
+    args = parser.parse_args(argv)
+
+    unknown = [n for n in args.datasets if n not in DATASETS]
+    if unknown:
+        parser.error(f"Dataset tidak dikenal: {', '.join(unknown)}")
+
+    if args.command == "convert":
+        for path in convert_to_parquet(args.datasets or None):
+            print(f"Ditulis: {path.name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Backend peta WebGL (pydeck) untuk titik dan rute berjumlah sangat besar.
+
+Folium membuat satu elemen DOM per marker dan mulai tersendat di beberapa
+ribu titik. Di backend ini TPS, TPA dan garis rute digambar GPU lewat
+``ScatterplotLayer``/``PathLayer`` deck.gl. Data dikirim sebagai kolom
+numerik ringkas (lon, lat, r, g, b dan kolom tooltip), bukan HTML per titik,
+dan warna TPS dihitung tervektorisasi dari ``keterisian_%``.
+
+Backend dipilih per halaman di aplikasi; nilai awalnya dari
+``SAMPAH_MAP_BACKEND``: ``auto`` (default; pydeck mulai ``DECK_MIN_POINTS``
+titik), ``folium`` atau ``deck``.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+BACKENDS = ("auto", "folium", "deck")
+BACKEND_LABELS = {"folium": "Folium", "deck": "WebGL (pydeck)"}
+DECK_MIN_POINTS = 20000
+MAP_STYLE = "light"
+
+# Gradasi warna keterisian: 0% hijau, 50% kuning, 100% merah
+FILL_STOPS = np.array([0.0, 50.0, 100.0])
+FILL_RGB = np.array([[46, 160, 67], [240, 200, 40], [215, 48, 39]], dtype=np.float64)
+TPA_RGB = (200, 30, 30)
+ROUTE_RGB = (30, 90, 220)
+TO_TPA_RGB = (215, 48, 39)
+
+
+def default_backend(count=0):
+    backend = os.environ.get("SAMPAH_MAP_BACKEND", "auto").lower()
+    if backend not in BACKENDS:
+        backend = "auto"
+    if backend == "auto":
+        return "deck" if count >= DECK_MIN_POINTS else "folium"
+    return backend
+
+
+# Warna RGB (n x 3, uint8) dari persentase keterisian; NaN dianggap 0
+def fill_rgb(percent):
+    percent = np.nan_to_num(np.asarray(percent, dtype=np.float64), nan=0.0)
+    percent = np.clip(percent, FILL_STOPS[0], FILL_STOPS[-1])
+    channels = [np.interp(percent, FILL_STOPS, FILL_RGB[:, c]) for c in range(3)]
+    return np.column_stack(channels).round().astype(np.uint8)
+
+
+# Kolom yang dikirim ke deck.gl: posisi, warna, label dan teks tooltip.
+# `fields` adalah {kolom: label} untuk baris tooltip; warna dari `percent_column` bila ada.
+def point_columns(frame, label_column, fields=None, rgb=TPA_RGB, percent_column=None):
+    lat = pd.to_numeric(frame["latitude"], errors="coerce")
+    lon = pd.to_numeric(frame["longitude"], errors="coerce")
+    keep = (lat.notna() & lon.notna()).to_numpy()
+    frame = frame[keep]
+    data = pd.DataFrame({
+        "lon": lon.to_numpy(np.float64)[keep].round(6),
+        "lat": lat.to_numpy(np.float64)[keep].round(6),
+    })
+    if percent_column is not None and percent_column in frame.columns:
+        colors = fill_rgb(pd.to_numeric(frame[percent_column], errors="coerce").to_numpy())
+    else:
+        colors = np.tile(np.asarray(rgb, dtype=np.uint8), (len(data), 1))
+    data["r"], data["g"], data["b"] = colors[:, 0], colors[:, 1], colors[:, 2]
+    data["label"] = frame[label_column].astype(str).to_numpy()
+    info = pd.Series("", index=frame.index)
+    for column, alias in (fields or {}).items():
+        if column not in frame.columns:
+            continue
+        values = frame[column]
+        if pd.api.types.is_numeric_dtype(values):
+            values = values.astype(float).round(1)
+        info = info + f"<br><b>{alias}:</b> " + values.astype(str)
+    data["info"] = info.to_numpy()
+    return data
+
+
+def scatter_layer(data, radius=40, min_pixels=3, layer_id=None):
+    import pydeck as pdk
+
+    return pdk.Layer(
+        "ScatterplotLayer",
+        data=data,
+        id=layer_id,
+        get_position="[lon, lat]",
+        get_fill_color="[r, g, b, 210]",
+        get_radius=radius,
+        radius_min_pixels=min_pixels,
+        radius_max_pixels=30,
+        pickable=True,
+    )
+
+
+# `paths`: daftar polyline berupa [[lat, lon], ...] (format segment_geometry)
+def path_layer(paths, rgb=ROUTE_RGB, width=4, layer_id=None, names=None):
+    import pydeck as pdk
+
+    data = pd.DataFrame({
+        "path": [[[round(float(lon), 6), round(float(lat), 6)] for lat, lon in p] for p in paths],
+        "label": list(names) if names is not None else [""] * len(paths),
+        "info": [""] * len(paths),
+    })
+    return pdk.Layer(
+        "PathLayer",
+        data=data,
+        id=layer_id,
+        get_path="path",
+        get_color=list(rgb),
+        width_min_pixels=width,
+        pickable=names is not None,
+    )
+
+
+# Heksagon peta panas: `rings` dari hexbin.hex_rings, `cells` berisi kolom agregat yang sejajar
+def hex_polygon_layer(rings, cells, layer_id="hex"):
+    import pydeck as pdk
+
+    colors = fill_rgb(cells["keterisian_rata"].to_numpy())
+    data = pd.DataFrame({
+        "polygon": rings,
+        "r": colors[:, 0], "g": colors[:, 1], "b": colors[:, 2],
+        "label": cells["jumlah"].astype(int).astype(str).to_numpy() + " TPS",
+        "info": (
+            "<br><b>Rata-rata keterisian (%):</b> " + cells["keterisian_rata"].round(1).astype(str)
+            + "<br><b>Keterisian maks (%):</b> " + cells["keterisian_maks"].round(1).astype(str)
+            + "<br><b>Volume:</b> " + cells["volume"].round(1).astype(str)
+        ).to_numpy(),
+    })
+    return pdk.Layer(
+        "PolygonLayer",
+        data=data,
+        id=layer_id,
+        get_polygon="polygon",
+        get_fill_color="[r, g, b, 110]",
+        get_line_color="[r, g, b, 200]",
+        line_width_min_pixels=1,
+        pickable=True,
+    )
+
+
+# Zoom awal yang memuat semua titik, dari rentang koordinat
+def view_state(lat, lon, width=1000, height=550):
+    import pydeck as pdk
+
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    if lat.size == 0:
+        return pdk.ViewState(latitude=0.0, longitude=0.0, zoom=1)
+    span = max(float(np.ptp(lon)) / width, float(np.ptp(lat)) / height, 1e-6) * 256 / 360
+    zoom = float(np.clip(np.log2(1.0 / span) - 0.5, 1, 16))
+    return pdk.ViewState(latitude=float(lat.mean()), longitude=float(lon.mean()), zoom=zoom)
+
+
+# Deck siap tampil; semua layer memakai kolom label/info yang sama untuk tooltip
+def deck_map(layers, view):
+    import pydeck as pdk
+
+    return pdk.Deck(
+        layers=[layer for layer in layers if layer is not None],
+        initial_view_state=view,
+        map_style=MAP_STYLE,
+        tooltip={"html": "<b>{label}</b>{info}"},
+    )
+
+
+def show_deck(deck, height=550):
+    import streamlit as st
+
+    return st.pydeck_chart(deck, use_container_width=True, height=height)
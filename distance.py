@@ -0,0 +1,295 @@
+"""Penyedia jarak (distance provider) untuk perhitungan rute.
+
+Semua modul rute meminta jarak lewat satu antarmuka: ``provider.matrix(asal,
+tujuan)`` yang menghitung jarak banyak-ke-banyak sekaligus (km). Backend:
+
+- ``haversine`` : jarak garis lurus great-circle (default)
+- ``matrix``    : matriks jarak dari file, format ``jarak_*`` seperti
+  ``vehicle_routing_matrix.csv`` atau format biner ringkas ``.npz``
+- ``road``      : graf jalan lokal, berupa daftar ruas jalan (CSV, jarak
+  terpendek dengan Dijkstra dari semua titik asal sekaligus) atau ekstrak
+  jaringan jalan GraphML (contraction hierarchies, lihat ``roadnet.py``)
+
+Backend dipilih lewat ``SAMPAH_DISTANCE`` dan file-nya lewat
+``SAMPAH_DISTANCE_FILE``. Provider di-cache per tanda tangan file, dan
+``provider.key`` ikut masuk kunci cache matriks di ``routing.distance_tables``.
+
+Label matriks ``jarak_*`` adalah huruf (A, B, ...) dan "TPS", bukan
+``id_tps``. ``SAMPAH_DISTANCE_IDS`` menunjuk CSV pemetaan berkolom ``label``
+(label di matriks) dan ``id`` (``id_tps`` atau nama TPA).
+
+    python distance.py convert vehicle_routing_matrix.csv -o matriks.npz
+"""
+import argparse
+import os
+import string
+import threading
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data import file_signature
+
+EARTH_RADIUS_KM = 6371.0
+PROVIDERS = ("haversine", "matrix", "road")
+
+# Titik yang dimintakan jaraknya; `ids` dipakai backend matriks, lat/lon oleh yang lain
+Points = namedtuple("Points", ["ids", "lat", "lon"])
+
+_providers = {}
+_lock = threading.Lock()
+
+
+def points(ids, lat, lon):
+    return Points(
+        ids=np.asarray(ids).astype(str),
+        lat=np.asarray(lat, dtype=np.float64),
+        lon=np.asarray(lon, dtype=np.float64),
+    )
+
+
+# Jarak haversine (km) untuk semua pasangan titik (n, m)
+def haversine_matrix(lat1, lon1, lat2, lon2):
+    lat1 = np.radians(np.asarray(lat1, dtype=np.float64))[:, None]
+    lon1 = np.radians(np.asarray(lon1, dtype=np.float64))[:, None]
+    lat2 = np.radians(np.asarray(lat2, dtype=np.float64))[None, :]
+    lon2 = np.radians(np.asarray(lon2, dtype=np.float64))[None, :]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+# Jarak haversine (km) per elemen untuk pasangan titik yang sejajar
+def haversine_pairs(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype=np.float64)) for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class HaversineProvider:
+    name = "haversine"
+    label = "Haversine (garis lurus)"
+    key = "haversine"
+    # Greedy boleh memakai indeks spasial (BallTree haversine) karena metriknya sama
+    geometric = True
+
+    def matrix(self, origins, destinations):
+        return haversine_matrix(origins.lat, origins.lon, destinations.lat, destinations.lon)
+
+
+class MatrixProvider:
+    name = "matrix"
+    geometric = False
+
+    def __init__(self, ids, dist, key, label=None):
+        self.ids = [str(i) for i in ids]
+        self.dist = np.asarray(dist, dtype=np.float32)
+        self.index = {i: k for k, i in enumerate(self.ids)}
+        self.key = key
+        self.label = label or f"Matriks jarak ({len(self.ids)} titik)"
+
+    def _lookup(self, pts):
+        missing = [i for i in pts.ids if i not in self.index]
+        if missing:
+            raise KeyError(f"Titik tidak ada di matriks jarak: {', '.join(missing[:5])}")
+        return np.array([self.index[i] for i in pts.ids], dtype=np.int64)
+
+    def matrix(self, origins, destinations):
+        return self.dist[np.ix_(self._lookup(origins), self._lookup(destinations))].astype(np.float64)
+
+
+# Format jarak_*: kolom jarak_A, jarak_B, ... berurutan sesuai baris, jadi baris
+# ke-k berlabel huruf ke-k. Nama di kolom `lokasi` ikut didaftarkan sebagai alias.
+# Kolom jarak_dari_TPS_km (bila ada) menjadi titik tambahan berlabel "TPS".
+def read_jarak_csv(path):
+    frame = pd.read_csv(path)
+    cols = [c for c in frame.columns if c.startswith("jarak_") and c != "jarak_dari_TPS_km"]
+    labels = [c[len("jarak_"):] for c in cols]
+    if len(labels) != len(frame):
+        raise ValueError(f"{Path(path).name}: {len(frame)} baris tetapi {len(labels)} kolom jarak_*")
+    expected = list(string.ascii_uppercase[:len(labels)])
+    if labels != expected:
+        raise ValueError(f"{Path(path).name}: kolom jarak_* harus berurutan {expected}")
+    dist = frame[cols].to_numpy(np.float64)
+    ids = list(labels)
+    if "jarak_dari_TPS_km" in frame.columns:
+        depot = frame["jarak_dari_TPS_km"].to_numpy(np.float64)
+        dist = np.block([[np.zeros((1, 1)), depot[None, :]], [depot[:, None], dist]])
+        ids = ["TPS"] + ids
+    aliases = {}
+    if "lokasi" in frame.columns:
+        offset = 1 if ids[0] == "TPS" else 0
+        aliases = {str(name): k + offset for k, name in enumerate(frame["lokasi"])}
+    return ids, dist, aliases
+
+
+# Format biner ringkas: array `ids` (str) dan `dist` (float32) dalam satu .npz
+def write_matrix_npz(path, ids, dist):
+    np.savez_compressed(path, ids=np.asarray(ids, dtype=str), dist=np.asarray(dist, dtype=np.float32))
+
+
+def read_matrix_npz(path):
+    with np.load(path, allow_pickle=False) as f:
+        return [str(i) for i in f["ids"]], f["dist"], {}
+
+
+def load_matrix_provider(path):
+    path = Path(path)
+    if path.suffix == ".npz":
+        ids, dist, aliases = read_matrix_npz(path)
+    else:
+        ids, dist, aliases = read_jarak_csv(path)
+    provider = MatrixProvider(ids, dist, key=repr(file_signature(path)), label=f"Matriks jarak ({path.name})")
+    provider.index.update(aliases)
+    return provider
+
+
+# Pemetaan id aplikasi -> label matriks dari CSV berkolom `label` dan `id`
+def read_id_map(path):
+    frame = pd.read_csv(path, dtype=str)
+    if not {"label", "id"} <= set(frame.columns):
+        raise ValueError(f"{Path(path).name}: file pemetaan id harus berkolom 'label' dan 'id'")
+    return dict(zip(frame["id"].str.strip(), frame["label"].str.strip()))
+
+
+# Daftarkan id aplikasi sebagai alias label matriks; label yang tidak ada di matriks adalah kesalahan
+def apply_id_map(provider, mapping):
+    unknown = sorted({label for label in mapping.values() if label not in provider.index})
+    if unknown:
+        raise KeyError(f"Label tidak ada di matriks jarak: {', '.join(unknown[:5])}")
+    provider.index.update({i: provider.index[label] for i, label in mapping.items()})
+    return provider
+
+
+class RoadGraphProvider:
+    name = "road"
+    geometric = False
+
+    # node_lat/node_lon: koordinat simpul; edges: (u, v, panjang_km) dua arah
+    def __init__(self, node_lat, node_lon, edges, key, label=None):
+        from scipy.sparse import csr_matrix
+        from sklearn.neighbors import BallTree
+
+        self.node_lat = np.asarray(node_lat, dtype=np.float64)
+        self.node_lon = np.asarray(node_lon, dtype=np.float64)
+        u, v, w = (np.asarray(x) for x in edges)
+        n = len(self.node_lat)
+        self.graph = csr_matrix(
+            (np.concatenate([w, w]).astype(np.float64),
+             (np.concatenate([u, v]).astype(np.int64), np.concatenate([v, u]).astype(np.int64))),
+            shape=(n, n),
+        )
+        self.tree = BallTree(np.radians(np.column_stack([self.node_lat, self.node_lon])), metric="haversine")
+        self.key = key
+        self.label = label or f"Graf jalan ({n} simpul)"
+
+    # Simpul terdekat tiap titik dan jarak titik -> simpul (km)
+    def snap(self, pts):
+        d, idx = self.tree.query(np.radians(np.column_stack([pts.lat, pts.lon])), k=1)
+        return idx[:, 0], d[:, 0] * EARTH_RADIUS_KM
+
+    def matrix(self, origins, destinations):
+        from scipy.sparse.csgraph import dijkstra
+
+        src, src_off = self.snap(origins)
+        dst, dst_off = self.snap(destinations)
+        unique_src, inverse = np.unique(src, return_inverse=True)
+        # Dijkstra dari semua simpul asal unik dalam satu panggilan (banyak-ke-banyak)
+        tree_dist = dijkstra(self.graph, directed=True, indices=unique_src)
+        out = tree_dist[inverse][:, dst] + src_off[:, None] + dst_off[None, :]
+        # Titik yang tidak terhubung ke graf: jatuh kembali ke garis lurus
+        unreachable = ~np.isfinite(out)
+        if unreachable.any():
+            straight = haversine_matrix(origins.lat, origins.lon, destinations.lat, destinations.lon)
+            out[unreachable] = straight[unreachable]
+        same = origins.ids[:, None] == destinations.ids[None, :]
+        out[same] = 0.0
+        return out
+
+
+# Graf jalan dari CSV ruas: dari_lat, dari_lon, ke_lat, ke_lon (opsional jarak_km).
+# Simpul disatukan berdasarkan koordinat yang dibulatkan ke 6 desimal.
+def load_road_csv(path):
+    path = Path(path)
+    edges = pd.read_csv(path)
+    start = np.round(edges[["dari_lat", "dari_lon"]].to_numpy(np.float64), 6)
+    end = np.round(edges[["ke_lat", "ke_lon"]].to_numpy(np.float64), 6)
+    coords, inverse = np.unique(np.vstack([start, end]), axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    u, v = inverse[:len(edges)], inverse[len(edges):]
+    if "jarak_km" in edges.columns:
+        w = edges["jarak_km"].to_numpy(np.float64)
+    else:
+        w = haversine_pairs(start[:, 0], start[:, 1], end[:, 0], end[:, 1])
+    return RoadGraphProvider(
+        coords[:, 0], coords[:, 1], (u, v, w),
+        key=repr(file_signature(path)), label=f"Graf jalan ({path.name})",
+    )
+
+
+# Graf jalan: GraphML memakai mesin contraction hierarchies (roadnet.py), CSV ruas memakai Dijkstra
+def load_road_provider(path):
+    if Path(path).suffix == ".graphml":
+        from roadnet import load_network_provider
+        return load_network_provider(path)
+    return load_road_csv(path)
+
+
+_LOADERS = {"matrix": load_matrix_provider, "road": load_road_provider}
+
+
+# Koordinat garis antar dua titik; mengikuti jalan bila provider punya geometri
+def segment_geometry(provider, lat1, lon1, lat2, lon2):
+    geometry = getattr(provider, "geometry", None)
+    if geometry is None:
+        return [[lat1, lon1], [lat2, lon2]]
+    return geometry(lat1, lon1, lat2, lon2)
+
+
+def provider_name():
+    name = os.environ.get("SAMPAH_DISTANCE", "haversine").lower()
+    return name if name in PROVIDERS else "haversine"
+
+
+# Provider aktif sesuai lingkungan; backend berbasis file di-cache per tanda tangan file
+def active_provider():
+    name = provider_name()
+    if name == "haversine":
+        return HaversineProvider()
+    path = os.environ.get("SAMPAH_DISTANCE_FILE")
+    if not path:
+        raise ValueError(f"SAMPAH_DISTANCE={name} membutuhkan SAMPAH_DISTANCE_FILE")
+    id_map = os.environ.get("SAMPAH_DISTANCE_IDS") if name == "matrix" else None
+    signature = (file_signature(path), file_signature(id_map) if id_map else None)
+    with _lock:
+        cached = _providers.get(name)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+    provider = _LOADERS[name](path)
+    if id_map:
+        apply_id_map(provider, read_id_map(id_map))
+        # Pemetaan mengubah jarak per id_tps, jadi ikut menentukan kunci cache
+        provider.key = repr(signature)
+    with _lock:
+        _providers[name] = (signature, provider)
+    return provider
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Utilitas matriks jarak")
+    sub = parser.add_subparsers(dest="command", required=True)
+    convert = sub.add_parser("convert", help="Konversi matriks jarak_* (CSV) ke format biner .npz")
+    convert.add_argument("source", help="File CSV berformat jarak_* (mis. vehicle_routing_matrix.csv)")
+    convert.add_argument("-o", "--output", help="File .npz tujuan (default: nama sumber dengan akhiran .npz)")
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        ids, dist, _ = read_jarak_csv(args.source)
+        output = Path(args.output or Path(args.source).with_suffix(".npz"))
+        write_matrix_npz(output, ids, dist)
+        print(f"Ditulis: {output.name} ({len(ids)} titik)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""Perencanaan rute armada truk per TPA (CVRP dengan ritase ke TPA).
+
+Setiap TPA adalah depo: truk berangkat dari TPA, mengangkut sampah dari TPS
+di wilayahnya dan kembali ke TPA untuk membuang muatan setiap kali muatannya
+penuh. Satu perjalanan TPA -> TPS ... -> TPA disebut satu ritase.
+
+Ritase dibangun dengan algoritma savings (Clarke-Wright) yang menghormati
+kapasitas angkut truk, lalu diperbaiki dengan local search: relokasi TPS antar
+ritase dan local search di dalam ritase (``routing.local_search``). Ritase lalu
+dibagi ke truk-truk TPA tersebut agar total jarak per truk seimbang. Semua jarak
+diambil dari matriks yang sudah di-cache di ``routing.distance_tables``.
+"""
+import math
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from routing import EPS, LOCAL_SEARCH_BUDGET, is_symmetric, local_search, neighbour_lists
+
+# Kapasitas angkut default satu truk (m³, satuan sama dengan volume_saat_ini)
+TRUCK_PAYLOAD = 1500.0
+
+# Di atas jumlah TPS ini pasangan savings dibatasi ke tetangga terdekat saja
+SAVINGS_FULL_MAX = 300
+SAVINGS_NEIGHBOURS = 30
+
+# Armada dan pembagian default truk per TPA (urut nama TPA); lihat load_split
+# untuk pembagian sebanding muatan wilayah
+FLEET = [f"TR{str(i).zfill(2)}" for i in range(1, 11)]
+TRUCK_SPLIT = [3, 3, 4]
+
+Trip = namedtuple("Trip", ["stops", "load", "distance"])
+TruckPlan = namedtuple("TruckPlan", ["truck", "tpa", "trips"])
+
+
+# Pembagian truk ke TPA: {nama TPA: [truk]}; TPA di luar pembagian tidak mendapat truk
+def truck_map(tpa_names, trucks=FLEET, split=TRUCK_SPLIT):
+    mapping = {}
+    idx = 0
+    for tpa, count in zip(sorted(pd.unique(pd.Series(tpa_names))), split):
+        mapping[tpa] = list(trucks[idx:idx + count])
+        idx += count
+    return mapping
+
+
+# Jumlah truk per TPA (urut nama TPA) sebanding total muatan wilayahnya, metode
+# sisa terbesar. TPA bermuatan mendapat minimal satu truk selama truknya cukup.
+def load_split(tpa_names, loads, trucks=FLEET):
+    names = sorted(pd.unique(pd.Series(tpa_names)))
+    weights = np.array([max(float(loads.get(n, 0.0) or 0.0), 0.0) for n in names])
+    total = len(trucks)
+    if weights.sum() <= 0:
+        weights = np.ones(len(names))
+    split = np.zeros(len(names), dtype=np.int64)
+    active = np.flatnonzero(weights > 0)
+    # Jaminan satu truk per TPA bermuatan, mulai dari muatan terbesar
+    for i in active[np.argsort(-weights[active], kind="stable")][:total]:
+        split[i] = 1
+    spare = total - int(split.sum())
+    if spare > 0:
+        quota = weights / weights.sum() * total
+        extra = np.maximum(np.floor(quota) - split, 0).astype(np.int64)
+        while extra.sum() > spare:
+            extra[np.argmax(extra)] -= 1
+        split += extra
+        remainder = quota - split
+        for i in np.argsort(-remainder, kind="stable")[:total - int(split.sum())]:
+            split[i] += 1
+    return split.tolist()
+
+
+# Matriks lokal satu wilayah: node 0 = TPA, node 1..k = TPS (urut `positions`)
+def region_matrix(tables, positions, tpa_idx):
+    positions = np.asarray(positions, dtype=np.int64)
+    k = len(positions)
+    dist = np.zeros((k + 1, k + 1), dtype=np.float64)
+    dist[1:, 1:] = tables.tps_tps[np.ix_(positions, positions)]
+    dist[0, 1:] = tables.tpa_tps[tpa_idx, positions]
+    dist[1:, 0] = tables.tps_tpa[positions, tpa_idx]
+    return dist
+
+
+def trip_length(nodes, dist):
+    if not nodes:
+        return 0.0
+    path = [0] + list(nodes) + [0]
+    return float(sum(dist[a, b] for a, b in zip(path[:-1], path[1:])))
+
+
+# Konstruksi savings paralel: gabungkan dua ritase bila ujungnya bertetangga
+# dan total muatannya masih muat di truk. Untuk matriks tidak simetris savings
+# dihitung per arah (i akhir ritase pertama, j awal ritase kedua) dan ritase
+# tidak dibalik saat digabung, karena membalik ritase mengubah panjangnya.
+def savings_trips(dist, loads, payload):
+    k = len(loads)
+    routes = {i: [i] for i in range(1, k + 1)}
+    route_of = list(range(k + 1))
+    route_load = {i: float(loads[i - 1]) for i in range(1, k + 1)}
+
+    if k <= SAVINGS_FULL_MAX:
+        ii, jj = np.triu_indices(k, 1)
+        ii, jj = ii + 1, jj + 1
+    else:
+        near = np.array(neighbour_lists(dist[1:, 1:], SAVINGS_NEIGHBOURS), dtype=np.int64)
+        ii = np.repeat(np.arange(k), near.shape[1]) + 1
+        jj = near.ravel() + 1
+        keep = ii < jj
+        ii, jj = ii[keep], jj[keep]
+    symmetric = is_symmetric(dist)
+    if symmetric:
+        saving = dist[0, ii] + dist[0, jj] - dist[ii, jj]
+    else:
+        ii, jj = np.r_[ii, jj], np.r_[jj, ii]
+        saving = dist[ii, 0] + dist[0, jj] - dist[ii, jj]
+    rank = np.argsort(-saving, kind="stable")
+
+    for idx in rank:
+        if saving[idx] <= EPS:
+            break
+        i, j = int(ii[idx]), int(jj[idx])
+        ri, rj = route_of[i], route_of[j]
+        if ri == rj or route_load[ri] + route_load[rj] > payload + EPS:
+            continue
+        a, b = routes[ri], routes[rj]
+        # i dan j harus di ujung ritase masing-masing
+        if a[-1] == i and b[0] == j:
+            merged = a + b
+        elif not symmetric:
+            continue
+        elif a[0] == i and b[-1] == j:
+            merged = b + a
+        elif a[-1] == i and b[-1] == j:
+            merged = a + b[::-1]
+        elif a[0] == i and b[0] == j:
+            merged = a[::-1] + b
+        else:
+            continue
+        routes[ri] = merged
+        route_load[ri] += route_load.pop(rj)
+        del routes[rj]
+        for node in b:
+            route_of[node] = ri
+    return [routes[r] for r in routes]
+
+
+# Local search di dalam satu ritase (tur tertutup dari dan ke TPA)
+def improve_trip(nodes, dist, time_budget):
+    if len(nodes) < 3:
+        return list(nodes)
+    local = [0] + list(nodes)
+    sub = dist[np.ix_(local, local)]
+    order = local_search(np.arange(len(local)), sub, end_cost=sub[:, 0], time_budget=time_budget)
+    return [local[i] for i in order[1:]]
+
+
+# Pindahkan satu TPS ke posisi termurah di ritase lain bila kapasitas cukup.
+# Setelah satu relokasi pemindaian berlanjut dari posisi yang sama (bukan
+# dari ritase pertama); putaran baru hanya bila ada relokasi di putaran ini.
+def relocate_between_trips(trips, dist, loads, payload, deadline):
+    trip_loads = [sum(loads[n - 1] for n in t) for t in trips]
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for src, trip in enumerate(trips):
+            if time.perf_counter() >= deadline:
+                break
+            p = 0
+            while p < len(trip):
+                node = trip[p]
+                prev = trip[p - 1] if p > 0 else 0
+                nxt = trip[p + 1] if p + 1 < len(trip) else 0
+                gain = dist[prev, node] + dist[node, nxt] - dist[prev, nxt]
+                best = None
+                for dst, other in enumerate(trips):
+                    if dst == src or trip_loads[dst] + loads[node - 1] > payload + EPS:
+                        continue
+                    path = [0] + other + [0]
+                    a, b = np.array(path[:-1]), np.array(path[1:])
+                    extra = dist[a, node] + dist[node, b] - dist[a, b]
+                    q = int(np.argmin(extra))
+                    if extra[q] - gain < -EPS and (best is None or extra[q] < best[0]):
+                        best = (float(extra[q]), dst, q)
+                if best is None:
+                    p += 1
+                    continue
+                _, dst, q = best
+                # trip[p] kini TPS berikutnya, jadi p tidak dinaikkan
+                del trip[p]
+                trips[dst].insert(q, node)
+                trip_loads[src] -= loads[node - 1]
+                trip_loads[dst] += loads[node - 1]
+                improved = True
+    return [t for t in trips if t]
+
+
+# Bagi ritase ke truk: ritase terpanjang dulu ke truk dengan total jarak terkecil
+def assign_trips(trips, trucks):
+    totals = {truck: 0.0 for truck in trucks}
+    plans = {truck: [] for truck in trucks}
+    for trip in sorted(trips, key=lambda t: t.distance, reverse=True):
+        truck = min(trucks, key=lambda t: (totals[t], len(plans[t])))
+        plans[truck].append(trip)
+        totals[truck] += trip.distance
+    return plans
+
+
+# Rencanakan ritase semua truk satu TPA dari matriks lokalnya (lihat region_matrix).
+# `loads` sejajar dengan `positions`. TPS dengan muatan melebihi kapasitas truk
+# mendapat ritase penuh tersendiri untuk kelipatan kapasitasnya, sisanya
+# (0 < sisa <= kapasitas) ikut dioptimasi bersama TPS lain.
+def plan_region_matrix(dist, positions, loads, tpa_idx, trucks, payload=TRUCK_PAYLOAD,
+                       time_budget=LOCAL_SEARCH_BUDGET):
+    deadline = time.perf_counter() + time_budget
+    positions = np.asarray(positions, dtype=np.int64)
+    loads = np.nan_to_num(np.asarray(loads, dtype=np.float64), nan=0.0).clip(min=0.0)
+
+    full_trips = []
+    rest = loads.copy()
+    for i, load in enumerate(loads):
+        if load > payload:
+            # ceil - 1: muatan kelipatan kapasitas tidak menyisakan kunjungan bermuatan nol
+            count = math.ceil(load / payload) - 1
+            full_trips.extend([[i + 1]] * count)
+            rest[i] = load - count * payload
+
+    trips = savings_trips(dist, rest, payload) if len(positions) else []
+    per_trip = max(time_budget / (2 * max(len(trips), 1)), 0.01)
+    trips = [improve_trip(t, dist, per_trip) for t in trips]
+    trips = relocate_between_trips(trips, dist, rest, payload, deadline)
+    remaining = max(deadline - time.perf_counter(), 0.0)
+    trips = [improve_trip(t, dist, max(remaining / max(len(trips), 1), 0.01)) for t in trips]
+
+    built = [
+        Trip(
+            stops=positions[np.array(t) - 1],
+            load=float(sum(rest[n - 1] for n in t)),
+            distance=trip_length(t, dist),
+        )
+        for t in trips
+    ]
+    built += [
+        Trip(stops=positions[np.array(t) - 1], load=float(payload), distance=trip_length(t, dist))
+        for t in full_trips
+    ]
+    return [TruckPlan(truck, tpa_idx, plan) for truck, plan in assign_trips(built, trucks).items()]
+
+
+def plan_region(tables, positions, loads, tpa_idx, trucks, payload=TRUCK_PAYLOAD,
+                time_budget=LOCAL_SEARCH_BUDGET):
+    dist = region_matrix(tables, positions, tpa_idx)
+    return plan_region_matrix(dist, positions, loads, tpa_idx, trucks, payload, time_budget)
+
+
+# Rencana seluruh armada: TPS dikelompokkan per TPA (kolom `region_column`),
+# tiap TPA memakai truknya sendiri dari `truck_map` {nama TPA: [truk]}.
+# Dengan `zone_column` (lihat zones.assign_zones) TPS sudah dibagi ke zona satu
+# truk, jadi tiap zona direncanakan terpisah hanya untuk truk pemiliknya.
+# Dengan workers > 1 tiap wilayah/zona direncanakan di proses terpisah; yang
+# dikirim ke worker hanya matriks lokalnya, bukan matriks penuh. TPS dengan
+# wilayah yang tidak dikenal dilewati; daftarnya dari unplanned_stops.
+def plan_fleet(tables, tps_df, truck_map, payload=TRUCK_PAYLOAD, time_budget=LOCAL_SEARCH_BUDGET,
+               region_column="nearest_tpa", load_column="volume_saat_ini", spare="Cadangan", workers=None,
+               zone_column=None):
+    lookup = {tps_id: i for i, tps_id in enumerate(tables.tps_ids)}
+    tpa_lookup = {name: i for i, name in enumerate(tables.tpa_names)}
+    ids = tps_df["id_tps"].astype(str)
+    group_columns = [region_column] if zone_column is None else [region_column, zone_column]
+    groups = [
+        g for g in tps_df[group_columns].drop_duplicates().itertuples(index=False, name=None)
+        if g[0] in tpa_lookup
+    ]
+    parallel = bool(workers and workers > 1 and len(groups) > 1)
+    # Wilayah paralel masing-masing mendapat seluruh anggaran waktu
+    budget = time_budget if parallel else time_budget / max(len(groups), 1)
+    jobs = []
+    for group in groups:
+        region = group[0]
+        mask = (tps_df[group_columns] == list(group)).all(axis=1).to_numpy()
+        positions = np.array([lookup[i] for i in ids[mask]], dtype=np.int64)
+        trucks = [group[1]] if zone_column is not None else truck_map.get(region) or [spare]
+        jobs.append((
+            region_matrix(tables, positions, tpa_lookup[region]), positions,
+            tps_df.loc[mask, load_column].to_numpy(float), tpa_lookup[region],
+            trucks, payload, budget,
+        ))
+    if parallel:
+        from concurrent.futures import ProcessPoolExecutor
+        from multiprocessing import get_context
+
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=get_context("spawn")) as pool:
+            results = list(pool.map(_plan_job, jobs))
+    else:
+        results = [_plan_job(job) for job in jobs]
+    return [plan for result in results for plan in result]
+
+
+# id TPS yang tidak ikut direncanakan plan_fleet karena wilayahnya (mis.
+# nearest_tpa kosong atau nama TPA yang tidak ada di tabel jarak) tidak dikenal
+def unplanned_stops(tables, tps_df, region_column="nearest_tpa"):
+    known = tps_df[region_column].isin(list(tables.tpa_names))
+    return tps_df.loc[~known, "id_tps"].astype(str).tolist()
+
+
+def _plan_job(job):
+    return plan_region_matrix(*job)
+
+
+# Satu baris per TPS: truk, ritase ke-berapa dan urutan kunjungan di ritase itu
+def stop_assignments(plans, tables):
+    rows = []
+    for plan in plans:
+        for trip_no, trip in enumerate(plan.trips, start=1):
+            for seq, pos in enumerate(trip.stops, start=1):
+                rows.append({
+                    "id_tps": tables.tps_ids[pos],
+                    "Truk": plan.truck,
+                    "Ritase": trip_no,
+                    "Urutan": seq,
+                })
+    frame = pd.DataFrame(rows, columns=["id_tps", "Truk", "Ritase", "Urutan"])
+    # TPS dengan muatan > kapasitas muncul di beberapa ritase; ambil kunjungan pertamanya
+    return frame.drop_duplicates("id_tps", keep="first").reset_index(drop=True)
+
+
+# Ringkasan per truk: jumlah ritase, TPS, muatan dan jarak total
+def truck_summary(plans, tables):
+    rows = []
+    for plan in plans:
+        rute = [
+            " ➜ ".join([tables.tpa_names[plan.tpa], *tables.tps_ids[t.stops], tables.tpa_names[plan.tpa]])
+            for t in plan.trips
+        ]
+        rows.append({
+            "Truk": plan.truck,
+            "Wilayah (TPA)": tables.tpa_names[plan.tpa],
+            "Jumlah Ritase": len(plan.trips),
+            "Jumlah TPS": int(sum(len(t.stops) for t in plan.trips)),
+            "Muatan (m³)": round(sum(t.load for t in plan.trips), 1),
+            "Jarak (km)": round(sum(t.distance for t in plan.trips), 2),
+            "Rute": " | ".join(rute) if rute else "-",
+        })
+    return pd.DataFrame(rows)
@@ -0,0 +1,152 @@
+"""Agregasi keterisian TPS per sel heksagon untuk peta panas dashboard.
+
+Koordinat TPS diproyeksikan ke bidang datar (km, equirectangular di sekitar
+pusat data, sama seperti ``zones.project_km``) lalu dipetakan ke heksagon
+pointy-top dengan koordinat aksial (q, r) dan pembulatan kubus -- semuanya
+operasi array NumPy, tanpa loop per titik. Tiap sel berisi jumlah TPS,
+rata-rata dan maksimum ``keterisian_%`` serta total ``volume_saat_ini``.
+
+Agregat semua resolusi ``HEX_SIZES_KM`` dihitung sekaligus dan di-cache per
+versi dataset TPS, jadi mengganti resolusi di peta tidak menghitung ulang.
+"""
+import math
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+
+from distance import EARTH_RADIUS_KM
+from zones import project_km
+
+# Jarak pusat ke sudut heksagon (km)
+HEX_SIZES_KM = (0.5, 1.0, 2.0, 5.0)
+# Di bawah jumlah ini marker TPS masih terbaca, peta panas tidak aktif secara default
+HEX_MIN_POINTS = 300
+DEFAULT_HEX_SIZE_KM = 1.0
+GRID_CACHE_SIZE = 4
+CELL_COLUMNS = ["q", "r", "latitude", "longitude", "jumlah", "keterisian_rata", "keterisian_maks", "volume"]
+
+SQRT3 = math.sqrt(3.0)
+
+# cells: satu baris per heksagon berisi TPS; lat0/lon0 titik acuan proyeksi
+HexGrid = namedtuple("HexGrid", ["size_km", "lat0", "lon0", "cells"])
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def default_hex_size(count):
+    return DEFAULT_HEX_SIZE_KM if count >= HEX_MIN_POINTS else None
+
+
+# Koordinat aksial heksagon (pointy-top) untuk titik xy (km), dengan pembulatan kubus
+def hex_axial(xy, size):
+    fq = (SQRT3 / 3.0 * xy[:, 0] - xy[:, 1] / 3.0) / size
+    fr = (2.0 / 3.0 * xy[:, 1]) / size
+    fs = -fq - fr
+    q, r, s = np.round(fq), np.round(fr), np.round(fs)
+    dq, dr, ds = np.abs(q - fq), np.abs(r - fr), np.abs(s - fs)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    q = np.where(fix_q, -r - s, q)
+    r = np.where(fix_r, -q - s, r)
+    return q.astype(np.int64), r.astype(np.int64)
+
+
+# Pusat heksagon aksial (q, r) di bidang km
+def hex_center(q, r, size):
+    return size * (SQRT3 * q + SQRT3 / 2.0 * r), size * 1.5 * r
+
+
+def unproject_km(x, y, lat0, lon0):
+    lat = lat0 + np.degrees(np.asarray(y) / EARTH_RADIUS_KM)
+    lon = lon0 + np.degrees(np.asarray(x) / (EARTH_RADIUS_KM * math.cos(math.radians(lat0))))
+    return lat, lon
+
+
+# Agregat satu resolusi; xy hasil project_km, fill/volume sejajar xy
+def bin_cells(xy, fill, volume, size, lat0, lon0):
+    if len(xy) == 0:
+        return pd.DataFrame(columns=CELL_COLUMNS)
+    q, r = hex_axial(xy, size)
+    keys, inverse, counts = np.unique(np.column_stack([q, r]), axis=0, return_inverse=True, return_counts=True)
+    inverse = inverse.reshape(-1)
+    fill_max = np.full(len(keys), -np.inf)
+    np.maximum.at(fill_max, inverse, fill)
+    x, y = hex_center(keys[:, 0], keys[:, 1], size)
+    lat, lon = unproject_km(x, y, lat0, lon0)
+    return pd.DataFrame({
+        "q": keys[:, 0],
+        "r": keys[:, 1],
+        "latitude": lat,
+        "longitude": lon,
+        "jumlah": counts,
+        "keterisian_rata": np.bincount(inverse, weights=fill, minlength=len(keys)) / counts,
+        "keterisian_maks": fill_max,
+        "volume": np.bincount(inverse, weights=volume, minlength=len(keys)),
+    })
+
+
+def _numeric(frame, column):
+    if column not in frame.columns:
+        return np.zeros(len(frame))
+    return pd.to_numeric(frame[column], errors="coerce").fillna(0).to_numpy(np.float64)
+
+
+# Agregat semua resolusi sekaligus: {ukuran_km: HexGrid}
+def compute_grids(tps_df, sizes=HEX_SIZES_KM):
+    lat = pd.to_numeric(tps_df["latitude"], errors="coerce")
+    lon = pd.to_numeric(tps_df["longitude"], errors="coerce")
+    keep = (lat.notna() & lon.notna()).to_numpy()
+    lat, lon = lat.to_numpy(np.float64)[keep], lon.to_numpy(np.float64)[keep]
+    lat0 = float(lat.mean()) if lat.size else 0.0
+    lon0 = float(lon.mean()) if lon.size else 0.0
+    xy = project_km(lat, lon, lat0, lon0)
+    fill = _numeric(tps_df, "keterisian_%")[keep]
+    volume = _numeric(tps_df, "volume_saat_ini")[keep]
+    return {size: HexGrid(size, lat0, lon0, bin_cells(xy, fill, volume, size, lat0, lon0)) for size in sizes}
+
+
+# Grid per versi dataset; tanpa versi (mis. TPS hasil filter) dihitung langsung
+def hex_grid(tps_df, size, version=None):
+    if version is None:
+        return compute_grids(tps_df, sizes=(size,))[size]
+    with _lock:
+        grids = _cache.get(version)
+        if grids is not None:
+            _cache.move_to_end(version)
+    if grids is None:
+        grids = compute_grids(tps_df)
+        with _lock:
+            _cache[version] = grids
+            while len(_cache) > GRID_CACHE_SIZE:
+                _cache.popitem(last=False)
+    if size not in grids:
+        return compute_grids(tps_df, sizes=(size,))[size]
+    return grids[size]
+
+
+# Sudut heksagon tiap sel sebagai [[lon, lat], ...] (cincin tertutup, urutan GeoJSON)
+def hex_rings(grid):
+    cells = grid.cells
+    x, y = hex_center(cells["q"].to_numpy(np.float64), cells["r"].to_numpy(np.float64), grid.size_km)
+    angles = np.radians(30.0 + 60.0 * np.arange(7))
+    vx = x[:, None] + grid.size_km * np.cos(angles)[None, :]
+    vy = y[:, None] + grid.size_km * np.sin(angles)[None, :]
+    lat, lon = unproject_km(vx, vy, grid.lat0, grid.lon0)
+    return np.stack([lon, lat], axis=-1).round(6).tolist()
+
+
+def hex_geojson(grid):
+    fields = ["jumlah", "keterisian_rata", "keterisian_maks", "volume"]
+    values = {f: grid.cells[f].astype(float).round(1).tolist() for f in fields}
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Polygon", "coordinates": [ring]},
+            "properties": {f: values[f][i] for f in fields},
+        }
+        for i, ring in enumerate(hex_rings(grid))
+    ]
+    return {"type": "FeatureCollection", "features": features}
@@ -0,0 +1,247 @@
+"""Lapisan titik peta folium (TPS/TPA) dalam satu layer.
+
+Alih-alih satu ``folium.Marker`` plus satu label ``DivIcon`` per baris, semua
+titik dikirim sebagai satu layer:
+
+- ``geojson`` : satu FeatureCollection; popup, tooltip dan label diambil dari
+  properti fitur oleh ``GeoJsonPopup``/``GeoJsonTooltip``
+- ``cluster`` : ``FastMarkerCluster``; titik dikirim sebagai array kolom dan
+  marker + popup dibuat di browser, jadi ukuran HTML per titik kecil dan
+  hanya klaster yang terlihat yang digambar
+
+Mode dipilih lewat ``SAMPAH_MAP_RENDER`` (``auto`` default: geojson untuk
+titik sedikit, cluster di atas ``CLUSTER_MIN_POINTS``). Label nama permanen
+hanya ditampilkan bila jumlah titik tidak melebihi ``LABEL_MAX_POINTS``.
+
+Peta yang sudah dibangun disimpan di cache LRU per proses (``cached_map``)
+dengan kunci versi data, pilihan TPS dan hasil rute, dan ditampilkan lewat
+``show_map`` yang secara default tidak mengirim interaksi peta (geser/zoom)
+kembali ke Python, jadi interaksi itu tidak memicu rerun skrip. Peta di cache
+dipakai bersama semua sesi; layer per tampilan dipasang di ``view_copy``.
+"""
+import copy
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from route_cache import RouteCache, memoize, route_key
+
+RENDER_MODES = ("auto", "geojson", "cluster")
+CLUSTER_MIN_POINTS = 2000
+LABEL_MAX_POINTS = 300
+MAP_CACHE_SIZE = 32
+
+_map_cache = None
+_map_cache_lock = threading.Lock()
+
+LABEL_CSS = """
+<style>
+.label-titik {
+    background: transparent; border: none; box-shadow: none;
+    font-size: 11px; font-weight: bold; text-shadow: 1px 1px 2px #fff; white-space: nowrap;
+}
+.label-titik::before { display: none; }
+</style>
+"""
+
+
+def render_mode(count=0):
+    mode = os.environ.get("SAMPAH_MAP_RENDER", "auto").lower()
+    if mode not in RENDER_MODES:
+        mode = "auto"
+    if mode == "auto":
+        return "cluster" if count >= CLUSTER_MIN_POINTS else "geojson"
+    return mode
+
+
+# Nilai properti yang aman untuk JSON: NaN -> None, angka dibulatkan
+def _column_values(series, decimals=1):
+    if pd.api.types.is_numeric_dtype(series):
+        values = series.astype(float).round(decimals)
+        return [None if np.isnan(v) else v for v in values.tolist()]
+    return series.astype(str).tolist()
+
+
+# FeatureCollection titik; `fields` adalah kolom yang ikut menjadi properti fitur
+def points_geojson(frame, fields):
+    lat = frame["latitude"].to_numpy(np.float64).round(6).tolist()
+    lon = frame["longitude"].to_numpy(np.float64).round(6).tolist()
+    columns = {f: _column_values(frame[f]) for f in fields}
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [lon[i], lat[i]]},
+            "properties": {f: columns[f][i] for f in fields},
+        }
+        for i in range(len(frame))
+    ]
+    return {"type": "FeatureCollection", "features": features}
+
+
+def _cluster_callback(aliases, color, icon):
+    return f"""
+    function (row) {{
+        var labels = {json.dumps(aliases)};
+        var html = '<b>' + row[2] + '</b>';
+        for (var i = 0; i < labels.length; i++) {{
+            html += '<br><b>' + labels[i] + ':</b> ' + (row[i + 3] === null ? 'N/A' : row[i + 3]);
+        }}
+        var marker = L.marker(new L.LatLng(row[0], row[1]), {{
+            icon: L.AwesomeMarkers.icon({{icon: '{icon}', prefix: 'fa', markerColor: '{color}'}})
+        }});
+        marker.bindTooltip(String(row[2]));
+        marker.bindPopup(html);
+        return marker;
+    }}
+    """
+
+
+# CSS label permanen; layer yang belum terpasang ke peta (mis. FeatureGroup untuk
+# st_folium feature_group_to_add) tidak punya header, jadi CSS dipasang di peta dasarnya
+def add_label_css(m):
+    import folium
+
+    root = m.get_root()
+    if hasattr(root, "header"):
+        root.header.add_child(folium.Element(LABEL_CSS), name="label_titik_css")
+
+
+# Tambahkan semua baris `frame` ke peta sebagai satu layer titik.
+# `popup_fields`: {kolom: label} untuk isi popup; `label_column` menjadi tooltip/label.
+def add_point_layer(m, frame, label_column, popup_fields, color="green", icon="trash", name=None, mode=None):
+    import folium
+    from folium.plugins import FastMarkerCluster
+
+    frame = frame.dropna(subset=["latitude", "longitude"])
+    if frame.empty:
+        return None
+    mode = mode or render_mode(len(frame))
+    fields = [label_column] + [f for f in popup_fields if f != label_column and f in frame.columns]
+    aliases = [popup_fields[f] for f in fields[1:]]
+
+    if mode == "cluster":
+        columns = [_column_values(frame[f]) for f in fields]
+        data = [
+            [lat, lon, *values]
+            for lat, lon, *values in zip(
+                frame["latitude"].round(6).tolist(), frame["longitude"].round(6).tolist(), *columns
+            )
+        ]
+        layer = FastMarkerCluster(data, callback=_cluster_callback(aliases, color, icon), name=name)
+        return layer.add_to(m)
+
+    permanent = len(frame) <= LABEL_MAX_POINTS
+    if permanent:
+        add_label_css(m)
+    layer = folium.GeoJson(
+        points_geojson(frame, fields),
+        name=name,
+        marker=folium.Marker(icon=folium.Icon(color=color, icon=icon, prefix="fa")),
+        popup=folium.GeoJsonPopup(fields=fields, aliases=[""] + aliases, labels=True),
+        tooltip=folium.GeoJsonTooltip(
+            fields=[label_column], labels=False, permanent=permanent, direction="right",
+            class_name="label-titik" if permanent else "foliumtooltip",
+            style=f"color: {color};" if permanent else None,
+        ),
+    )
+    return layer.add_to(m)
+
+
+# Warna tingkat keterisian (%): hijau < 50, oranye < 80, merah selebihnya
+def fill_color(percent):
+    if percent is None or percent < 50:
+        return "green"
+    if percent < 80:
+        return "orange"
+    return "red"
+
+
+# Sel agregat (kolom latitude, longitude, jumlah, keterisian_rata, keterisian_maks, volume)
+# sebagai satu layer lingkaran; ukuran mengikuti jumlah TPS, warna rata-rata keterisian
+def add_cell_layer(m, cells, name=None):
+    import folium
+
+    if cells.empty:
+        return None
+    fields = ["jumlah", "keterisian_rata", "keterisian_maks", "volume"]
+    layer = folium.GeoJson(
+        points_geojson(cells, fields),
+        name=name,
+        marker=folium.CircleMarker(fill=True, weight=1),
+        style_function=lambda f: {
+            "radius": 6 + 3 * np.log2(max(f["properties"]["jumlah"], 1)),
+            "color": fill_color(f["properties"]["keterisian_rata"]),
+            "fillColor": fill_color(f["properties"]["keterisian_rata"]),
+            "fillOpacity": 0.6,
+        },
+        popup=folium.GeoJsonPopup(
+            fields=fields, aliases=["Jumlah TPS", "Rata-rata keterisian (%)", "Keterisian maks (%)", "Volume"],
+        ),
+    )
+    return layer.add_to(m)
+
+
+# Peta panas heksagon (FeatureCollection poligon dari hexbin.hex_geojson) sebagai satu layer choropleth
+def add_hex_layer(m, geojson, name="Peta panas keterisian", show=True):
+    import folium
+
+    if not geojson["features"]:
+        return None
+    fields = ["jumlah", "keterisian_rata", "keterisian_maks", "volume"]
+    layer = folium.GeoJson(
+        geojson,
+        name=name,
+        show=show,
+        style_function=lambda f: {
+            "color": fill_color(f["properties"]["keterisian_rata"]),
+            "weight": 1,
+            "fillColor": fill_color(f["properties"]["keterisian_rata"]),
+            "fillOpacity": 0.45,
+        },
+        tooltip=folium.GeoJsonTooltip(
+            fields=fields, aliases=["Jumlah TPS", "Rata-rata keterisian (%)", "Keterisian maks (%)", "Volume"],
+        ),
+    )
+    return layer.add_to(m)
+
+
+# Kunci peta: seperti route_key, ditambah mode render yang aktif
+def map_key(version, tps_ids, **settings):
+    return route_key(version, tps_ids, render=os.environ.get("SAMPAH_MAP_RENDER", "auto").lower(), **settings)
+
+
+# Cache peta terpisah dari cache rute dan hanya di memori (objek folium tidak disimpan ke disk)
+def map_cache():
+    global _map_cache
+    with _map_cache_lock:
+        if _map_cache is None:
+            _map_cache = RouteCache(maxsize=MAP_CACHE_SIZE)
+        return _map_cache
+
+
+# Ambil peta dari cache atau bangun dengan `build()` lalu simpan
+def cached_map(key, build):
+    m, _ = memoize(key, build, cache=map_cache())
+    return m
+
+
+# Salinan dangkal peta dari cache untuk satu tampilan. Daftar anaknya milik salinan
+# sendiri, jadi layer yang ditambahkan (mis. feature_group_to_add yang dipasang
+# st_folium ke peta) tidak masuk ke peta bersama yang sedang dipakai sesi lain.
+def view_copy(m):
+    view = copy.copy(m)
+    view._children = OrderedDict(m._children)
+    return view
+
+
+# Tampilkan peta. Tanpa `returned_objects` komponen tidak mengirim apa pun ke
+# Python, jadi geser/zoom/klik tidak memicu rerun; isi hanya untuk nilai yang dipakai.
+# `kwargs` diteruskan ke st_folium (mis. feature_group_to_add untuk layer yang berganti tanpa membangun ulang peta).
+def show_map(m, key, width=1000, height=550, returned_objects=(), **kwargs):
+    from streamlit_folium import st_folium
+
+    return st_folium(m, width=width, height=height, key=key, returned_objects=list(returned_objects), **kwargs)
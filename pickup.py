@@ -0,0 +1,305 @@
+"""Titik pickup ``routes.csv`` yang dipartisi per hari, dan rute harian.
+
+``routes.csv`` berisi titik pickup dengan kolom ``hari`` dan ``pickup_sampah``.
+Saat dimuat:
+
+- nama hari dinormalisasi ("Mon", "Thursday", "senin", ...) ke nama hari
+  kanonik; baris dengan hari yang tidak dikenal dibuang
+- urutan lintang/bujur divalidasi: bila kolom ``latitude`` jelas berisi
+  bujur kedua kolom ditukar. Dengan ``SAMPAH_CITY_BBOX`` (selatan,barat,
+  utara,timur) dipilih urutan yang titiknya paling banyak jatuh di kotak
+  kota; tanpa itu, kolom ditukar bila lintangnya mustahil (di luar +/-90)
+  atau jatuh di Antarktika (selatan 60 LS) sementara hasil tukarnya tidak
+- titik dengan ``pickup_sampah == "Yes"`` dipartisi per hari, masing-masing
+  dengan BallTree haversine sendiri
+
+Rute tiap hari adalah tur tertutup atas titik pickup hari itu, dihitung
+dengan ``routing.solve_route`` dan di-cache sendiri-sendiri (``route_cache``),
+sehingga mengganti satu hari tidak menghitung ulang hari lain. Hari yang
+belum ada di cache dihitung paralel di pool proses.
+
+    python pickup.py check            # ringkasan per hari + hasil validasi koordinat
+    python pickup.py check --write    # tulis koordinat yang sudah diperbaiki ke routes.csv
+    python pickup.py plan --workers 4 # rute semua hari
+"""
+import argparse
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+
+from data import dataset_path, dataset_version, load_dataset
+from distance import EARTH_RADIUS_KM, HaversineProvider, points
+from route_cache import route_key, shared_cache
+from routing import LOCAL_SEARCH_BUDGET, default_workers, route_length, solve_route
+
+DAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+DAY_LABELS = dict(zip(DAYS, ("Senin", "Selasa", "Rabu", "Kamis", "Jumat", "Sabtu", "Minggu")))
+# Ejaan yang diterima: nama Inggris penuh / 3 huruf dan nama Indonesia
+DAY_ALIASES = {
+    **{d.lower(): d for d in DAYS},
+    **{d[:3].lower(): d for d in DAYS},
+    **{label.lower(): d for d, label in DAY_LABELS.items()},
+    "tues": "Tuesday", "wed": "Wednesday", "thu": "Thursday", "thur": "Thursday", "thurs": "Thursday",
+    "jum'at": "Friday",
+}
+PICKUP_YES = "yes"
+# Selatan lintang ini hanya Antarktika (tanpa permukiman tetap); titik pickup di sana berarti kolom tertukar
+ANTARCTIC_LATITUDE = -60.0
+# Toleransi (derajat) di sekitar kotak kota saat membandingkan kedua urutan kolom
+CITY_BBOX_MARGIN = 0.5
+INDEX_CACHE_SIZE = 4
+# Di bawah jumlah titik ini pool proses lebih mahal (start-up spawn) daripada solve-nya
+PARALLEL_MIN_POINTS = 1000
+
+DayPoints = namedtuple("DayPoints", ["ids", "lat", "lon", "tree"])
+DayRoute = namedtuple("DayRoute", ["hari", "ids", "lat", "lon", "distance", "engine", "seconds"])
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def normalize_day(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    return DAY_ALIASES.get(str(value).strip().lower().rstrip("."))
+
+
+# Kotak kota dari SAMPAH_CITY_BBOX ("selatan,barat,utara,timur"), atau None
+def city_bounds():
+    raw = os.environ.get("SAMPAH_CITY_BBOX")
+    if not raw:
+        return None
+    try:
+        south, west, north, east = (float(x) for x in raw.split(","))
+    except ValueError:
+        return None
+    return south, west, north, east
+
+
+def _inside(lat, lon, bounds):
+    south, west, north, east = bounds
+    m = CITY_BBOX_MARGIN
+    return int(((lat >= south - m) & (lat <= north + m) & (lon >= west - m) & (lon <= east + m)).sum())
+
+
+# True bila kolom latitude/longitude tertukar. Diputuskan per file, bukan per
+# baris, agar satu baris rusak tidak membalik baris lainnya. Dengan `bounds`
+# (kotak kota) urutan dengan lebih banyak titik di dalam kotak yang menang.
+def coordinates_swapped(lat, lon, bounds=None):
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    if len(lat) == 0:
+        return False
+    if bounds is not None:
+        as_is, swapped = _inside(lat, lon, bounds), _inside(lon, lat, bounds)
+        if as_is != swapped:
+            return swapped > as_is
+    lat_med, lon_med = np.nanmedian(lat), np.nanmedian(lon)
+    if abs(lat_med) > 90:
+        return abs(lon_med) <= 90
+    return bool(lat_med < ANTARCTIC_LATITUDE and ANTARCTIC_LATITUDE <= lon_med <= 90)
+
+
+# routes.csv yang sudah dibersihkan: hari kanonik, koordinat berurutan benar, id titik
+def clean_routes(frame, bounds=None):
+    lat = frame["latitude"].to_numpy(np.float64)
+    lon = frame["longitude"].to_numpy(np.float64)
+    swapped = coordinates_swapped(lat, lon, bounds)
+    if swapped:
+        lat, lon = lon, lat
+    clean = pd.DataFrame({
+        "id_titik": [f"R{i + 1:03d}" for i in range(len(frame))],
+        "hari": frame["hari"].map(normalize_day).astype(object),
+        "pickup": frame["pickup_sampah"].astype(str).str.strip().str.lower() == PICKUP_YES,
+        "latitude": lat,
+        "longitude": lon,
+    })
+    valid = (
+        clean["hari"].notna()
+        & clean["latitude"].between(-90, 90)
+        & clean["longitude"].between(-180, 180)
+    )
+    return clean[valid].reset_index(drop=True), swapped, int((~valid).sum())
+
+
+class PickupIndex:
+    def __init__(self, frame, bounds=None):
+        from sklearn.neighbors import BallTree
+
+        self.frame, self.swapped, self.dropped = clean_routes(frame, bounds)
+        self.partitions = {}
+        pickups = self.frame[self.frame["pickup"]]
+        for day in DAYS:
+            part = pickups[pickups["hari"] == day]
+            if part.empty:
+                continue
+            lat = part["latitude"].to_numpy(np.float64)
+            lon = part["longitude"].to_numpy(np.float64)
+            tree = BallTree(np.radians(np.column_stack([lat, lon])), metric="haversine")
+            self.partitions[day] = DayPoints(part["id_titik"].to_numpy(str), lat, lon, tree)
+
+    # Hari yang punya titik pickup, berurutan Senin..Minggu
+    def days(self):
+        return list(self.partitions)
+
+    def points(self, day):
+        part = self.partitions[day]
+        return pd.DataFrame({"id_titik": part.ids, "latitude": part.lat, "longitude": part.lon})
+
+    # k titik pickup terdekat pada hari `day`: (id, jarak km)
+    def nearest(self, day, lat, lon, k=1):
+        part = self.partitions[day]
+        k = min(k, len(part.ids))
+        dist, idx = part.tree.query(np.radians([[lat, lon]]), k=k)
+        return part.ids[idx[0]], dist[0] * EARTH_RADIUS_KM
+
+    # Semua titik pickup hari `day` dalam radius (km) dari satu titik
+    def within(self, day, lat, lon, radius_km):
+        part = self.partitions[day]
+        idx = part.tree.query_radius(np.radians([[lat, lon]]), r=radius_km / EARTH_RADIUS_KM)[0]
+        return part.ids[np.sort(idx)]
+
+    # Ringkasan per hari: titik pickup, titik tanpa pickup
+    def summary(self):
+        counts = self.frame.groupby(["hari", "pickup"]).size().unstack(fill_value=0)
+        rows = []
+        for day in DAYS:
+            if day not in counts.index:
+                continue
+            rows.append({
+                "Hari": DAY_LABELS[day],
+                "Titik pickup": int(counts.loc[day].get(True, 0)),
+                "Tanpa pickup": int(counts.loc[day].get(False, 0)),
+            })
+        return pd.DataFrame(rows)
+
+
+def load_pickup_index(version=None):
+    if version is None:
+        version = dataset_version("routes")
+    bounds = city_bounds()
+    version = (version, bounds)
+    with _lock:
+        index = _cache.get(version)
+        if index is not None:
+            _cache.move_to_end(version)
+            return index
+    index = PickupIndex(load_dataset("routes"), bounds)
+    with _lock:
+        _cache[version] = index
+        while len(_cache) > INDEX_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return index
+
+
+# Tur tertutup: dimulai dari titik terdekat ke pusat titik hari itu dan kembali ke sana
+def _day_job(job):
+    dist, lat, lon, start, time_budget = job
+    result = solve_route(dist, dist[:, start], lat, lon, start=start, time_budget=time_budget)
+    return result, route_length(result.order, dist) + float(dist[result.order[-1], start])
+
+
+def _prepare_day(index, day, provider, time_budget):
+    part = index.partitions[day]
+    pts = points(part.ids, part.lat, part.lon)
+    dist = provider.matrix(pts, pts)
+    start = int(part.tree.query(np.radians([[part.lat.mean(), part.lon.mean()]]), k=1)[1][0, 0])
+    coords = (part.lat, part.lon) if provider.geometric else (None, None)
+    return (dist, *coords, start, time_budget)
+
+
+def _day_route(index, day, job_result):
+    result, distance = job_result
+    part = index.partitions[day]
+    order = np.asarray(result.order)
+    return DayRoute(
+        hari=day, ids=part.ids[order], lat=part.lat[order], lon=part.lon[order],
+        distance=distance, engine=result.engine, seconds=result.seconds,
+    )
+
+
+# Rute semua hari (atau `days`) dalam satu dict {hari: DayRoute}. Setiap hari
+# di-cache sendiri per versi routes.csv + pengaturan; hari yang belum ada di
+# cache dihitung paralel bila workers > 1 dan datanya cukup besar, dan saat
+# paralel masing-masing hari mendapat seluruh anggaran waktu.
+def plan_week(index, provider=None, time_budget=LOCAL_SEARCH_BUDGET, workers=None, days=None, version=None,
+              cache=None):
+    provider = provider or HaversineProvider()
+    version = version or dataset_version("routes")
+    days = [d for d in (days or index.days()) if d in index.partitions]
+    keys = {
+        day: route_key(
+            version, index.partitions[day].ids, solver="pickup_day", hari=day,
+            time_budget=time_budget, distance=provider.key,
+        )
+        for day in days
+    }
+    if cache is None:
+        cache = shared_cache()
+    routes = {day: cache.get(keys[day]) for day in days}
+    missing = [day for day in days if routes[day] is None]
+    if missing:
+        total = sum(len(index.partitions[day].ids) for day in missing)
+        parallel = bool(workers and workers > 1 and len(missing) > 1 and total >= PARALLEL_MIN_POINTS)
+        budget = time_budget if parallel else time_budget / len(missing)
+        jobs = [_prepare_day(index, day, provider, budget) for day in missing]
+        if parallel:
+            from concurrent.futures import ProcessPoolExecutor
+            from multiprocessing import get_context
+
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=get_context("spawn")) as pool:
+                results = list(pool.map(_day_job, jobs))
+        else:
+            results = [_day_job(job) for job in jobs]
+        for day, result in zip(missing, results):
+            routes[day] = _day_route(index, day, result)
+            cache.put(keys[day], routes[day])
+    return routes
+
+
+def week_summary(routes):
+    return pd.DataFrame([
+        {
+            "Hari": DAY_LABELS[day],
+            "Titik pickup": len(route.ids),
+            "Jarak tur (km)": round(route.distance, 2),
+            "Mesin optimasi": route.engine,
+        }
+        for day, route in routes.items()
+    ])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Titik pickup routes.csv per hari dan rute harian")
+    sub = parser.add_subparsers(dest="command", required=True)
+    check = sub.add_parser("check", help="Validasi koordinat dan ringkasan titik per hari")
+    check.add_argument("--write", action="store_true", help="Tulis koordinat yang sudah diperbaiki ke routes.csv")
+    plan = sub.add_parser("plan", help="Hitung rute tur tertutup untuk setiap hari")
+    plan.add_argument("--budget", type=float, default=LOCAL_SEARCH_BUDGET, help="Batas waktu optimasi (detik)")
+    plan.add_argument("--workers", type=int, default=default_workers(), help="Jumlah proses paralel")
+    args = parser.parse_args(argv)
+
+    index = load_pickup_index()
+    if args.command == "check":
+        state = "tertukar, sudah diperbaiki" if index.swapped else "benar"
+        print(f"Urutan latitude/longitude: {state}; {index.dropped} baris dibuang")
+        print(index.summary().to_string(index=False))
+        if args.write and index.swapped:
+            raw = load_dataset("routes")
+            fixed = raw.assign(latitude=raw["longitude"], longitude=raw["latitude"])
+            path = dataset_path("routes")
+            if path.suffix == ".parquet":
+                fixed.to_parquet(path, index=False)
+            else:
+                fixed.to_csv(path, index=False)
+            print(f"Ditulis: {path.name}")
+    elif args.command == "plan":
+        routes = plan_week(index, time_budget=args.budget, workers=args.workers)
+        print(week_summary(routes).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""Perencana batch (tanpa browser) untuk jadwal harian seluruh wilayah TPA.
+
+Membaca dataset TPS/TPA, membagi truk ke TPA dan TPS ke zona kerja truk
+(``zones.py``), lalu merencanakan ritase semua truk di semua wilayah
+(wilayah dijalankan paralel di pool proses). Hasilnya
+ditulis ke direktori keluaran dan dibaca halaman "Jadwal & Rute" bila masih
+cocok dengan data dan pengaturannya:
+
+- ``jadwal.parquet``    : satu baris per TPS (truk, ritase, urutan)
+- ``ringkasan.parquet`` : satu baris per truk (ritase, TPS, muatan, jarak)
+- ``rute.geojson``      : satu LineString per ritase (TPA -> TPS ... -> TPA)
+- ``meta.json``         : versi dataset, sumber jarak, kapasitas, pembagian truk dan metode zona
+
+    python planner.py                          # tulis ke .rencana/
+    python planner.py --payload 2000 --workers 4 --output /srv/rencana
+"""
+import argparse
+import json
+import os
+import threading
+from collections import namedtuple
+from datetime import date, datetime
+from pathlib import Path
+
+import pandas as pd
+
+from data import DATA_DIR, dataset_version, file_signature, load_dataset
+from distance import active_provider, segment_geometry
+from fleet import (
+    TRUCK_PAYLOAD, load_split, plan_fleet, stop_assignments, truck_map, truck_summary, unplanned_stops,
+)
+from routing import LOCAL_SEARCH_BUDGET, default_workers, distance_tables
+from tpa_index import refresh_nearest
+from zones import ZONE_METHOD, assign_zones
+
+PLAN_DIR = DATA_DIR / ".rencana"
+PLAN_FILES = {
+    "jadwal": "jadwal.parquet",
+    "ringkasan": "ringkasan.parquet",
+    "rute": "rute.geojson",
+    "meta": "meta.json",
+}
+
+SavedPlan = namedtuple("SavedPlan", ["jadwal", "ringkasan", "rute", "meta"])
+
+_cache = {}
+_lock = threading.Lock()
+
+
+# Rencana yang dibaca dari disk; rute.geojson (bisa besar) baru dibaca saat .rute diakses
+class StoredPlan:
+    def __init__(self, directory, jadwal, ringkasan, meta):
+        self.directory = directory
+        self.jadwal = jadwal
+        self.ringkasan = ringkasan
+        self.meta = meta
+        self._rute = None
+        self._rute_lock = threading.Lock()
+
+    @property
+    def rute(self):
+        with self._rute_lock:
+            if self._rute is None:
+                self._rute = json.loads((self.directory / PLAN_FILES["rute"]).read_text())
+            return self._rute
+
+
+# Identitas rencana: dipakai UI untuk memutuskan apakah rencana tersimpan masih berlaku
+def plan_meta(version, provider, payload, trucks):
+    return {
+        "versi": version,
+        "jarak": provider.key,
+        "payload": float(payload),
+        "truk": {tpa: list(t) for tpa, t in sorted(trucks.items())},
+        "zona": ZONE_METHOD,
+    }
+
+
+def trip_features(plans, tables, tps_df, tpa_df, provider):
+    tps_xy = tps_df.assign(id_tps=tps_df["id_tps"].astype(str)).set_index("id_tps")[["latitude", "longitude"]]
+    tpa_xy = tpa_df.set_index("nama")[["latitude", "longitude"]]
+    features = []
+    for plan in plans:
+        tpa_name = tables.tpa_names[plan.tpa]
+        depot = tpa_xy.loc[tpa_name].tolist()
+        for trip_no, trip in enumerate(plan.trips, start=1):
+            stops = [tps_xy.loc[i].tolist() for i in tables.tps_ids[trip.stops]]
+            points = [depot, *stops, depot]
+            line = []
+            for (lat1, lon1), (lat2, lon2) in zip(points[:-1], points[1:]):
+                segment = segment_geometry(provider, lat1, lon1, lat2, lon2)
+                line.extend(segment if not line else segment[1:])
+            features.append({
+                "type": "Feature",
+                "geometry": {"type": "LineString", "coordinates": [[lon, lat] for lat, lon in line]},
+                "properties": {
+                    "Truk": plan.truck,
+                    "Wilayah (TPA)": tpa_name,
+                    "Ritase": trip_no,
+                    "TPS": list(tables.tps_ids[trip.stops]),
+                    "Muatan (m³)": round(trip.load, 1),
+                    "Jarak (km)": round(trip.distance, 2),
+                },
+            })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def build_plan(payload=TRUCK_PAYLOAD, time_budget=LOCAL_SEARCH_BUDGET, workers=None):
+    tpa_df = load_dataset("tpa")
+    version = dataset_version("tps", "tpa")
+    tps_df, _ = refresh_nearest(load_dataset("tps"), tpa_df, version)
+    provider = active_provider()
+    tables = distance_tables(tps_df, tpa_df, version, provider)
+    loads = tps_df.groupby("nearest_tpa")["volume_saat_ini"].sum().to_dict()
+    trucks = truck_map(tpa_df["nama"], split=load_split(tpa_df["nama"], loads))
+    tps_df = tps_df.assign(zona=assign_zones(tps_df, tpa_df, trucks))
+    plans = plan_fleet(
+        tables, tps_df, trucks, payload=payload, time_budget=time_budget, workers=workers, zone_column="zona"
+    )
+
+    jadwal = tps_df.assign(id_tps=tps_df["id_tps"].astype(str)).merge(
+        stop_assignments(plans, tables), on="id_tps", how="left"
+    ).sort_values(["nearest_tpa", "Truk", "Ritase", "Urutan"]).reset_index(drop=True)
+    return SavedPlan(
+        jadwal=jadwal,
+        ringkasan=truck_summary(plans, tables),
+        rute=trip_features(plans, tables, tps_df, tpa_df, provider),
+        # TPS tanpa wilayah yang dikenal tidak punya truk; dicatat agar tidak hilang diam-diam
+        meta=dict(plan_meta(version, provider, payload, trucks), tanpa_wilayah=unplanned_stops(tables, tps_df)),
+    )
+
+
+def write_plan(plan, directory=PLAN_DIR, tanggal=None):
+    directory.mkdir(parents=True, exist_ok=True)
+    meta = dict(plan.meta, tanggal=str(tanggal or date.today()), dibuat=datetime.now().isoformat(timespec="seconds"))
+    outputs = {
+        "jadwal": lambda p: plan.jadwal.to_parquet(p, index=False),
+        "ringkasan": lambda p: plan.ringkasan.to_parquet(p, index=False),
+        "rute": lambda p: p.write_text(json.dumps(plan.rute, ensure_ascii=False)),
+        # meta ditulis terakhir: rencana baru dianggap lengkap setelah meta.json diganti
+        "meta": lambda p: p.write_text(json.dumps(meta, indent=2, ensure_ascii=False)),
+    }
+    for key, write in outputs.items():
+        target = directory / PLAN_FILES[key]
+        tmp = target.with_name(f"{target.name}.tmp")
+        write(tmp)
+        os.replace(tmp, target)
+    return [directory / f for f in PLAN_FILES.values()]
+
+
+# Rencana tersimpan, atau None bila belum ada / tidak terbaca. Di-cache per
+# signature meta.json: meta ditulis terakhir, jadi rencana baru selalu mengganti signature-nya.
+def load_plan(directory=PLAN_DIR):
+    directory = Path(directory)
+    try:
+        key = file_signature(directory / PLAN_FILES["meta"])
+    except OSError:
+        return None
+    with _lock:
+        cached = _cache.get(str(directory))
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    try:
+        plan = StoredPlan(
+            directory,
+            jadwal=pd.read_parquet(directory / PLAN_FILES["jadwal"]),
+            ringkasan=pd.read_parquet(directory / PLAN_FILES["ringkasan"]),
+            meta=json.loads((directory / PLAN_FILES["meta"]).read_text()),
+        )
+    except (OSError, ValueError):
+        return None
+    with _lock:
+        _cache[str(directory)] = (key, plan)
+    return plan
+
+
+# Rencana tersimpan yang masih cocok dengan data dan pengaturan saat ini
+def matching_plan(meta, directory=PLAN_DIR):
+    plan = load_plan(directory)
+    if plan is None:
+        return None
+    current = {k: plan.meta.get(k) for k in meta}
+    return plan if current == meta else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rencana jadwal & rute harian semua wilayah TPA (batch)")
+    parser.add_argument("--payload", type=float, default=TRUCK_PAYLOAD, help="Kapasitas angkut per truk (m³)")
+    parser.add_argument(
+        "--budget", type=float, default=LOCAL_SEARCH_BUDGET,
+        help="Batas waktu optimasi (detik): total semua wilayah bila --workers 1, per wilayah bila paralel",
+    )
+    parser.add_argument("--workers", type=int, default=default_workers(), help="Jumlah proses paralel")
+    parser.add_argument("--output", default=str(PLAN_DIR), help="Direktori keluaran")
+    parser.add_argument("--tanggal", type=date.fromisoformat, default=date.today(), help="Tanggal jadwal (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+
+    plan = build_plan(payload=args.payload, time_budget=args.budget, workers=args.workers)
+    for path in write_plan(plan, Path(args.output), tanggal=args.tanggal):
+        print(f"Ditulis: {path}")
+    total = plan.ringkasan["Jarak (km)"].sum() if not plan.ringkasan.empty else 0.0
+    print(f"{len(plan.ringkasan)} truk, {len(plan.rute['features'])} ritase, total {total:.2f} km")
+    skipped = plan.meta["tanpa_wilayah"]
+    if skipped:
+        print(f"Peringatan: {len(skipped)} TPS tidak direncanakan (nearest_tpa tidak dikenal): "
+              f"{', '.join(skipped[:20])}{' ...' if len(skipped) > 20 else ''}")
+
+
+if __name__ == "__main__":
+    main()
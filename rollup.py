@@ -0,0 +1,359 @@
+"""Agregat histori_rute yang dibangun secara streaming dan inkremental.
+
+Dashboard hanya butuh agregat histori (total per TPS dan per bulan), jadi
+histori dibaca per potongan dan setiap potongan langsung dilipat ke agregat
+TPS x bulan. Memori yang dipakai sebanding dengan jumlah TPS x bulan, bukan
+jumlah baris histori, sehingga file histori berukuran GB tetap bisa dipakai.
+
+Agregat disimpan di ``.rollup/`` bersama posisi terakhir yang sudah diproses.
+Karena data bulanan baru selalu ditambahkan di akhir file, refresh cukup
+membaca baris setelah posisi itu dan menambahkannya ke agregat yang ada.
+Bila file ditulis ulang (bukan ditambah), agregat dibangun ulang dari awal:
+CSV dikenali dari hash potongan byte sebelum posisi terakhir, Parquet dari
+hash statistik row group bagian yang sudah diproses plus isi baris terakhirnya.
+
+    python rollup.py refresh    # proses baris baru saja
+    python rollup.py rebuild    # bangun ulang dari awal
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import namedtuple
+
+import pandas as pd
+
+from data import DATA_DIR, PARSE_DATES, SCHEMAS, dataset_path, file_signature, iter_dataset_chunks
+
+HISTORI_COLUMNS = ["id_tps", "tanggal", "Volume_kg"]
+ROLLUP_COLUMNS = ["id_tps", "bulan", "Volume_kg", "jumlah_baris"]
+CHUNK_ROWS = 200_000
+
+ROLLUP_DIR = DATA_DIR / ".rollup"
+STATE_FILE = "state.json"
+ROLLUP_FILES = {
+    "tps_bulan": "histori_tps_bulan.parquet",
+    "tps": "histori_tps.parquet",
+    "bulan": "histori_bulan.parquet",
+}
+# Potongan byte sebelum offset yang di-hash untuk mendeteksi file ditulis ulang
+TAIL_BYTES = 4096
+# Padanan untuk Parquet: jumlah baris terakhir yang isinya ikut di-hash
+TAIL_ROWS = 1000
+
+Rollups = namedtuple("Rollups", ["tps_bulan", "tps", "bulan"])
+
+_cache = {}
+_lock = threading.Lock()
+
+
+# Agregat satu potongan histori ke level TPS x bulan
+def rollup_chunk(chunk):
+    tanggal = pd.to_datetime(chunk["tanggal"], errors="coerce")
+    frame = pd.DataFrame({
+        "id_tps": chunk["id_tps"].astype(str),
+        "bulan": tanggal.dt.to_period("M").astype(str),
+        "Volume_kg": chunk["Volume_kg"].astype("float64"),
+    })
+    frame = frame[tanggal.notna() & chunk["id_tps"].notna()]
+    return frame.groupby(["id_tps", "bulan"]).agg(
+        Volume_kg=("Volume_kg", "sum"),
+        jumlah_baris=("Volume_kg", "size"),
+    )
+
+
+# Gabungkan dua agregat TPS x bulan (dipakai saat melipat potongan)
+def merge_rollups(left, right):
+    if left is None:
+        return right
+    if right is None:
+        return left
+    return left.add(right, fill_value=0)
+
+
+def finalize_rollup(acc):
+    if acc is None:
+        return pd.DataFrame(columns=ROLLUP_COLUMNS)
+    out = acc.reset_index().sort_values(["id_tps", "bulan"]).reset_index(drop=True)
+    out["jumlah_baris"] = out["jumlah_baris"].astype("int64")
+    return out[ROLLUP_COLUMNS]
+
+
+def _fold(chunks):
+    acc = None
+    rows = 0
+    for chunk in chunks:
+        rows += len(chunk)
+        acc = merge_rollups(acc, rollup_chunk(chunk))
+    return acc, rows
+
+
+def stream_rollup(chunksize=CHUNK_ROWS):
+    acc, _ = _fold(iter_dataset_chunks("histori", columns=HISTORI_COLUMNS, chunksize=chunksize))
+    return finalize_rollup(acc)
+
+
+# Turunan per TPS dan per bulan dari agregat TPS x bulan
+def derive_rollups(tps_bulan):
+    tps = tps_bulan.groupby("id_tps", as_index=False)[["Volume_kg", "jumlah_baris"]].sum()
+    bulan = (
+        tps_bulan.groupby("bulan", as_index=False)[["Volume_kg", "jumlah_baris"]].sum()
+        .sort_values("bulan")
+        .reset_index(drop=True)
+    )
+    return Rollups(tps_bulan=tps_bulan, tps=tps, bulan=bulan)
+
+
+def _add_delta(current, delta, keys):
+    merged = current.set_index(keys)[["Volume_kg", "jumlah_baris"]].add(
+        delta.set_index(keys)[["Volume_kg", "jumlah_baris"]], fill_value=0
+    )
+    out = merged.reset_index().sort_values(keys).reset_index(drop=True)
+    out["jumlah_baris"] = out["jumlah_baris"].astype("int64")
+    return out
+
+
+# Tambahkan agregat baris baru ke ketiga rollup tanpa menghitung ulang semuanya
+def apply_delta(rollups, delta_tps_bulan):
+    if delta_tps_bulan.empty:
+        return rollups
+    delta = derive_rollups(delta_tps_bulan)
+    return Rollups(
+        tps_bulan=_add_delta(rollups.tps_bulan, delta.tps_bulan, ["id_tps", "bulan"]),
+        tps=_add_delta(rollups.tps, delta.tps, ["id_tps"]),
+        bulan=_add_delta(rollups.bulan, delta.bulan, ["bulan"]),
+    )
+
+
+def _tail_hash(path, offset):
+    start = max(0, offset - TAIL_BYTES)
+    with open(path, "rb") as f:
+        f.seek(start)
+        return hashlib.sha1(f.read(offset - start)).hexdigest()
+
+
+# Posisi akhir baris lengkap terakhir (baris yang sedang ditulis diabaikan)
+def _complete_end(path, size):
+    with open(path, "rb") as f:
+        pos = size
+        while pos > 0:
+            step = min(TAIL_BYTES, pos)
+            f.seek(pos - step)
+            block = f.read(step)
+            idx = block.rfind(b"\n")
+            if idx >= 0:
+                return pos - step + idx + 1
+            pos -= step
+    return 0
+
+
+class _BoundedReader(io.RawIOBase):
+    def __init__(self, f, limit):
+        self._f = f
+        self._left = limit
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = min(len(buffer), self._left)
+        if n <= 0:
+            return 0
+        data = self._f.read(n)
+        buffer[:len(data)] = data
+        self._left -= len(data)
+        return len(data)
+
+
+def _csv_header(path):
+    with open(path, "rb") as f:
+        line = f.readline()
+    return line, len(line)
+
+
+# Baca baris CSV pada rentang byte [start, end) per potongan
+def _iter_csv_range(path, header, start, end, chunksize):
+    columns = [c for c in header if c in HISTORI_COLUMNS]
+    schema = SCHEMAS.get("histori", {})
+    with open(path, "rb") as f:
+        f.seek(start)
+        reader = pd.read_csv(
+            io.BufferedReader(_BoundedReader(f, end - start)),
+            header=None,
+            names=header,
+            usecols=columns,
+            dtype={c: t for c, t in schema.items() if c in columns},
+            parse_dates=[c for c in PARSE_DATES.get("histori", []) if c in columns] or None,
+            chunksize=chunksize,
+        )
+        with reader:
+            yield from reader
+
+
+def _iter_parquet_from(path, start_row, chunksize, stop_row=None):
+    import pyarrow.parquet as pq
+    seen = 0
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=HISTORI_COLUMNS):
+        if stop_row is not None and seen >= stop_row:
+            break
+        if seen + batch.num_rows > start_row:
+            end = batch.num_rows if stop_row is None else min(batch.num_rows, stop_row - seen)
+            yield batch.slice(max(0, start_row - seen), end - max(0, start_row - seen)).to_pandas()
+        seen += batch.num_rows
+
+
+# Sidik isi `rows` baris pertama Parquet: statistik (min/maks/null) tiap row group
+# yang memuatnya dan isi TAIL_ROWS baris terakhirnya. Row group yang ikut berubah
+# saat file ditambah hanya memicu bangun ulang, tidak pernah rollup basi.
+def _parquet_fingerprint(path, rows):
+    import pyarrow.parquet as pq
+    meta = pq.ParquetFile(path).metadata
+    digest = hashlib.sha1()
+    seen = 0
+    for i in range(meta.num_row_groups):
+        if seen >= rows:
+            break
+        group = meta.row_group(i)
+        digest.update(repr(group.num_rows).encode())
+        for c in range(group.num_columns):
+            column = group.column(c)
+            stats = column.statistics.to_dict() if column.statistics is not None else None
+            digest.update(repr((column.path_in_schema, stats)).encode())
+        seen += group.num_rows
+    for chunk in _iter_parquet_from(path, max(0, rows - TAIL_ROWS), CHUNK_ROWS, stop_row=rows):
+        digest.update(pd.util.hash_pandas_object(chunk, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _read_state(directory):
+    try:
+        state = json.loads((directory / STATE_FILE).read_text())
+        frames = {k: pd.read_parquet(directory / f) for k, f in ROLLUP_FILES.items()}
+    except (OSError, ValueError):
+        return None, None
+    return state, Rollups(**frames)
+
+
+def _write_state(directory, state, rollups):
+    directory.mkdir(parents=True, exist_ok=True)
+    for key, filename in ROLLUP_FILES.items():
+        tmp = directory / f"{filename}.tmp"
+        getattr(rollups, key).to_parquet(tmp, index=False)
+        os.replace(tmp, directory / filename)
+    tmp = directory / f"{STATE_FILE}.tmp"
+    tmp.write_text(json.dumps(state, indent=2))
+    os.replace(tmp, directory / STATE_FILE)
+
+
+# Perbarui rollup tersimpan dengan baris yang belum diproses saja.
+# Mengembalikan (rollups, jumlah_baris_baru, dibangun_ulang).
+def refresh_rollups(directory=ROLLUP_DIR, chunksize=CHUNK_ROWS, rebuild=False):
+    path = dataset_path("histori")
+    size = os.path.getsize(path)
+    state, rollups = (None, None) if rebuild else _read_state(directory)
+
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+        total_rows = pq.ParquetFile(path).metadata.num_rows
+        appendable = (
+            state is not None
+            and state.get("source") == str(path)
+            and state.get("rows", 0) <= total_rows
+            and state.get("fingerprint") == _parquet_fingerprint(path, state.get("rows", 0))
+        )
+        start_row = state["rows"] if appendable else 0
+        acc, new_rows = _fold(_iter_parquet_from(path, start_row, chunksize))
+        new_state = {
+            "source": str(path),
+            "rows": start_row + new_rows,
+            "fingerprint": _parquet_fingerprint(path, start_row + new_rows),
+        }
+    else:
+        header_line, header_len = _csv_header(path)
+        header = pd.read_csv(io.BytesIO(header_line), nrows=0).columns.tolist()
+        offset = state.get("offset", 0) if state else 0
+        appendable = (
+            state is not None
+            and state.get("source") == str(path)
+            and state.get("header") == header
+            and header_len <= offset <= size
+            and state.get("tail_sha1") == _tail_hash(path, offset)
+        )
+        start = offset if appendable else header_len
+        end = _complete_end(path, size)
+        acc, new_rows = (None, 0)
+        if end > start:
+            acc, new_rows = _fold(_iter_csv_range(path, header, start, end, chunksize))
+        end = max(end, start)
+        new_state = {
+            "source": str(path),
+            "header": header,
+            "offset": end,
+            "tail_sha1": _tail_hash(path, end),
+            "rows": (state.get("rows", 0) if appendable else 0) + new_rows,
+        }
+
+    delta = finalize_rollup(acc)
+    if appendable:
+        rollups = apply_delta(rollups, delta)
+    else:
+        rollups = derive_rollups(delta)
+    try:
+        _write_state(directory, new_state, rollups)
+    except OSError:
+        # Direktori tidak bisa ditulis: rollup tetap dipakai dari memori
+        pass
+    return rollups, new_rows, not appendable
+
+
+# Rollup di-cache per proses, di-refresh (inkremental) hanya bila file histori berubah
+def load_rollups():
+    key = file_signature(dataset_path("histori"))
+    with _lock:
+        cached = _cache.get("histori")
+        if cached is None or cached[0] != key:
+            rollups, _, _ = refresh_rollups()
+            cached = (key, rollups)
+            _cache["histori"] = cached
+    return Rollups(*(frame.copy(deep=False) for frame in cached[1]))
+
+
+def empty_rollups():
+    return derive_rollups(pd.DataFrame(columns=ROLLUP_COLUMNS))
+
+
+def _filter_tps(frame, tps_ids):
+    if tps_ids:
+        return frame[frame["id_tps"].isin([str(t) for t in tps_ids])]
+    return frame
+
+
+def total_per_tps(rollups, tps_ids=None):
+    return _filter_tps(rollups.tps, tps_ids)[["id_tps", "Volume_kg"]].reset_index(drop=True)
+
+
+def total_per_bulan(rollups, tps_ids=None):
+    if not tps_ids:
+        return rollups.bulan[["bulan", "Volume_kg"]]
+    return (
+        _filter_tps(rollups.tps_bulan, tps_ids).groupby("bulan", as_index=False)["Volume_kg"].sum()
+        .sort_values("bulan")
+        .reset_index(drop=True)
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest histori_rute ke rollup bulanan")
+    parser.add_argument("command", choices=["refresh", "rebuild"])
+    parser.add_argument("--chunksize", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    rollups, new_rows, rebuilt = refresh_rollups(chunksize=args.chunksize, rebuild=args.command == "rebuild")
+    status = "dibangun ulang" if rebuilt else "diperbarui"
+    print(f"Rollup {status}: {new_rows} baris baru, {len(rollups.tps_bulan)} sel TPS x bulan")
+
+
+if __name__ == "__main__":
+    main()
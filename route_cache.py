@@ -0,0 +1,147 @@
+"""Cache hasil optimasi rute (LRU, opsional tersimpan di disk).
+
+Kunci cache dibentuk dari himpunan TPS yang sudah dikanonisasi (urutan pilih
+tidak berpengaruh), versi dataset dan pengaturan solver, jadi rerun halaman
+yang tidak mengubah pilihan TPS -- misalnya hanya mengganti filter truk --
+langsung memakai hasil sebelumnya, termasuk pilihan yang sama dari sesi lain.
+
+Ukuran cache dibatasi; entri yang paling lama tidak dipakai dibuang lebih
+dulu. Dengan ``SAMPAH_ROUTE_CACHE=disk`` isi cache juga ditulis ke
+``.route_cache/`` sehingga tetap ada setelah server di-restart. Penulisan ke
+disk dikumpulkan: entri baru hanya menandai cache kotor, file ditulis paling
+sering tiap ``FLUSH_INTERVAL`` detik dan sekali lagi saat proses berhenti.
+"""
+import atexit
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from data import DATA_DIR
+
+CACHE_SIZE = 256
+CACHE_DIR = DATA_DIR / ".route_cache"
+CACHE_FILE = "routes.pkl"
+CACHE_MODES = ("memory", "disk")
+# Jeda minimum antar penulisan file cache (detik)
+FLUSH_INTERVAL = 30.0
+
+_instance = None
+_instance_lock = threading.Lock()
+
+
+def cache_mode():
+    mode = os.environ.get("SAMPAH_ROUTE_CACHE", "memory").lower()
+    return mode if mode in CACHE_MODES else "memory"
+
+
+# Kunci kanonik: id TPS diurutkan dan dibuat unik, pengaturan diurutkan per nama
+def route_key(version, tps_ids, **settings):
+    payload = {
+        "version": version,
+        "tps": sorted({str(i) for i in tps_ids}),
+        "settings": {k: settings[k] for k in sorted(settings)},
+    }
+    raw = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+class RouteCache:
+    def __init__(self, maxsize=CACHE_SIZE, directory=None):
+        self.maxsize = maxsize
+        self.path = directory / CACHE_FILE if directory is not None else None
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        # Menjaga agar hanya satu flush menulis file pada satu waktu
+        self._flush_lock = threading.Lock()
+        self._dirty = False
+        self._flushed_at = float("-inf")
+        self._load()
+        if self.path is not None:
+            atexit.register(self.flush)
+
+    def __len__(self):
+        return len(self._data)
+
+    def _load(self):
+        if self.path is None:
+            return
+        try:
+            with open(self.path, "rb") as f:
+                items = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return
+        self._data.update(items[-self.maxsize:])
+
+    # Tulis isi cache ke disk bila ada perubahan. Snapshot diambil di bawah lock,
+    # pickle dan penulisan file di luar lock agar get/put tidak ikut menunggu.
+    def flush(self):
+        if self.path is None:
+            return
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                items = list(self._data.items())
+                self._dirty = False
+                self._flushed_at = time.monotonic()
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.path.with_name(f"{self.path.name}.tmp")
+                with open(tmp, "wb") as f:
+                    pickle.dump(items, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp, self.path)
+            except OSError:
+                # Direktori tidak bisa ditulis: cache tetap jalan di memori
+                pass
+
+    def _flush_due(self):
+        return self.path is not None and time.monotonic() - self._flushed_at >= FLUSH_INTERVAL
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            self._dirty = True
+            due = self._flush_due()
+        if due:
+            self.flush()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._dirty = True
+        self.flush()
+
+
+# Cache bersama satu proses server (dipakai semua sesi)
+def shared_cache():
+    global _instance
+    with _instance_lock:
+        if _instance is None:
+            _instance = RouteCache(directory=CACHE_DIR if cache_mode() == "disk" else None)
+        return _instance
+
+
+# Ambil dari cache atau hitung lalu simpan. Mengembalikan (nilai, dari_cache).
+def memoize(key, compute, cache=None):
+    if cache is None:
+        cache = shared_cache()
+    value = cache.get(key)
+    if value is not None:
+        return value, True
+    value = compute()
+    cache.put(key, value)
+    return value, False
@@ -0,0 +1,689 @@
+"""Kernel jarak dan optimasi rute TPS -> TPA.
+
+Jarak diminta dari penyedia jarak (lihat ``distance.py``, default haversine)
+dalam dua kueri banyak-ke-banyak: matriks TPS x TPS dan TPS x TPA penuh.
+Matriks di-cache per versi dataset dan provider, lalu dipakai bersama oleh
+greedy, local search, pencarian TPA terdekat dan tabel segmen di halaman
+"Jadwal & Rute".
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+
+from distance import HaversineProvider, points
+
+# Jumlah versi dataset yang matriksnya disimpan di memori
+MATRIX_CACHE_SIZE = 4
+
+# Kandidat awal per query BallTree pada greedy tanpa matriks
+INDEX_QUERY_K = 8
+
+# Local search: jumlah tetangga kandidat, batas waktu default (detik) dan jenis langkah
+NEIGHBOUR_K = 10
+LOCAL_SEARCH_BUDGET = 2.0
+LOCAL_SEARCH_MOVES = ("2opt", "oropt", "relocate")
+# Matriks sampai ukuran ini disalin ke list Python agar akses per elemen lebih cepat
+LIST_MATRIX_MAX = 800
+EPS = 1e-9
+
+# Pemilihan mesin: Held-Karp dipakai sampai jumlah TPS ini (termasuk titik awal)
+EXACT_MAX_STOPS = 16
+HELD_KARP_SECONDS_PER_OP = 7e-9
+ENGINE_EXACT = "Held-Karp (eksak)"
+ENGINE_HEURISTIC = "Greedy + local search"
+ENGINE_REPAIR = "Perbaikan inkremental"
+
+# Perbaikan inkremental: batas waktu local search di sekitar posisi yang berubah
+REPAIR_BUDGET = 0.3
+
+# Multi-start: ILS paralel di pool proses; tambahan waktu tunggu hasil worker (detik)
+ENGINE_MULTI = "Multi-start ILS"
+# Label bila multi-start jatuh ke ILS di proses sendiri (pool belum siap / satu worker)
+ENGINE_ILS = "ILS (1 proses)"
+MULTI_START_GRACE = 0.5
+# Pool yang belum siap boleh ditunggu paling lama sebagian anggaran waktu ini;
+# selebihnya ILS dijalankan di proses sendiri sementara pool terus disiapkan
+MULTI_START_WARMUP_SHARE = 0.25
+# Perturbasi double-bridge butuh minimal sekian node
+KICK_MIN_STOPS = 8
+
+# tps_tpa: jarak TPS -> TPA, tpa_tps: TPA -> TPS (berbeda untuk jalan satu arah)
+DistanceTables = namedtuple("DistanceTables", ["tps_ids", "tpa_names", "tps_tps", "tps_tpa", "tpa_tps"])
+RouteResult = namedtuple("RouteResult", ["order", "engine", "seconds"])
+
+_tables_cache = OrderedDict()
+_tables_lock = threading.Lock()
+_pool = None
+_pool_workers = 0
+_pool_warmup = []
+_pool_lock = threading.Lock()
+
+
+def build_distance_tables(tps_df, tpa_df, provider=None):
+    provider = provider or HaversineProvider()
+    tps_pts = points(tps_df["id_tps"], tps_df["latitude"], tps_df["longitude"])
+    tpa_pts = points(tpa_df["nama"], tpa_df["latitude"], tpa_df["longitude"])
+    # Kueri banyak-ke-banyak ke provider: TPS x TPS, TPS x TPA dan, bila jaraknya
+    # tidak pasti simetris (bukan haversine), TPA x TPS
+    tps_tpa = provider.matrix(tps_pts, tpa_pts).astype(np.float32)
+    return DistanceTables(
+        tps_ids=tps_pts.ids,
+        tpa_names=tpa_pts.ids,
+        # float32 cukup untuk km dan memangkas memori matriks besar setengahnya
+        tps_tps=provider.matrix(tps_pts, tps_pts).astype(np.float32),
+        tps_tpa=tps_tpa,
+        tpa_tps=tps_tpa.T if provider.geometric else provider.matrix(tpa_pts, tps_pts).astype(np.float32),
+    )
+
+
+# Matriks jarak di-cache per versi dataset (lihat data.dataset_version) dan provider jarak
+def distance_tables(tps_df, tpa_df, version, provider=None):
+    provider = provider or HaversineProvider()
+    key = (version, provider.key)
+    with _tables_lock:
+        tables = _tables_cache.get(key)
+        if tables is not None:
+            _tables_cache.move_to_end(key)
+            return tables
+    tables = build_distance_tables(tps_df, tpa_df, provider)
+    with _tables_lock:
+        _tables_cache[key] = tables
+        while len(_tables_cache) > MATRIX_CACHE_SIZE:
+            _tables_cache.popitem(last=False)
+    return tables
+
+
+def tps_positions(tables, ids):
+    lookup = {tps_id: i for i, tps_id in enumerate(tables.tps_ids)}
+    return np.array([lookup[str(i)] for i in ids], dtype=np.int64)
+
+
+# Sub-matriks (float64) untuk TPS terpilih, urut sesuai `positions`
+def submatrix(tables, positions):
+    return tables.tps_tps[np.ix_(positions, positions)].astype(np.float64)
+
+
+def route_length(order, dist):
+    order = np.asarray(order)
+    if len(order) < 2:
+        return 0.0
+    return float(dist[order[:-1], order[1:]].sum())
+
+
+def segment_lengths(order, dist):
+    order = np.asarray(order)
+    return dist[order[:-1], order[1:]]
+
+
+# TPA terdekat dari sebuah TPS: (indeks TPA, jarak km)
+def closest_tpa(tables, position):
+    row = tables.tps_tpa[position]
+    idx = int(np.argmin(row))
+    return idx, float(row[idx])
+
+
+# Greedy nearest-neighbour mulai dari `start`
+def greedy_route(dist, start=0):
+    n = len(dist)
+    visited = np.zeros(n, dtype=bool)
+    order = [start]
+    visited[start] = True
+    current = start
+    for _ in range(n - 1):
+        row = np.where(visited, np.inf, dist[current])
+        current = int(np.argmin(row))
+        visited[current] = True
+        order.append(current)
+    return np.array(order, dtype=np.int64)
+
+
+# Greedy nearest-neighbour dengan BallTree (haversine) tanpa matriks jarak.
+# BallTree tidak mendukung hapus titik, jadi titik yang sudah dikunjungi dilewati
+# saat query (k diperbesar bila perlu) dan pohon dibangun ulang dari titik sisa
+# setiap kali lebih dari separuh isinya sudah dikunjungi.
+def greedy_route_indexed(lat, lon, start=0):
+    from sklearn.neighbors import BallTree
+
+    coords = np.radians(np.column_stack([lat, lon]).astype(np.float64))
+    n = len(coords)
+    visited = np.zeros(n, dtype=bool)
+    visited[start] = True
+    order = np.empty(n, dtype=np.int64)
+    order[0] = start
+    if n == 1:
+        return order
+
+    members = np.flatnonzero(~visited)
+    tree = BallTree(coords[members], metric="haversine")
+    stale = 0
+    current = start
+    for step in range(1, n):
+        k = min(INDEX_QUERY_K, len(members))
+        while True:
+            _, idx = tree.query(coords[current:current + 1], k=k)
+            candidates = members[idx[0]]
+            free = candidates[~visited[candidates]]
+            if len(free):
+                current = int(free[0])
+                break
+            k = min(k * 4, len(members))
+        visited[current] = True
+        order[step] = current
+        stale += 1
+        if stale * 2 > len(members) and step < n - 1:
+            members = np.flatnonzero(~visited)
+            tree = BallTree(coords[members], metric="haversine")
+            stale = 0
+    return order
+
+
+# Pilih konstruksi greedy: baris matriks bila matriksnya ada (selalu lebih cepat,
+# mis. 8000 TPS ~0,15 dtk), BallTree hanya bila matriks tidak tersedia
+def nearest_neighbour_route(lat, lon, dist=None, start=0):
+    if dist is not None:
+        return greedy_route(dist, start=start)
+    return greedy_route_indexed(lat, lon, start=start)
+
+
+# Matriks simetris (dist[i, j] == dist[j, i]); dicek per ubin segitiga atas agar hemat memori
+def is_symmetric(dist, tol=1e-6, tile=512):
+    n = len(dist)
+    for r0 in range(0, n, tile):
+        for c0 in range(r0, n, tile):
+            a = dist[r0:r0 + tile, c0:c0 + tile]
+            b = dist[c0:c0 + tile, r0:r0 + tile].T
+            if not np.allclose(a, b, rtol=tol, atol=tol, equal_nan=True):
+                return False
+    return True
+
+
+# K tetangga terdekat per node (tanpa dirinya sendiri), dihitung per blok baris
+def neighbour_lists(dist, k=NEIGHBOUR_K):
+    n = len(dist)
+    k = min(k, n - 1)
+    if k <= 0:
+        return [[] for _ in range(n)]
+    out = []
+    for r0 in range(0, n, 1024):
+        block = np.array(dist[r0:r0 + 1024], dtype=np.float64)
+        block[np.arange(len(block)), np.arange(r0, r0 + len(block))] = np.inf
+        near = np.argpartition(block, k - 1, axis=1)[:, :k]
+        near_d = np.take_along_axis(block, near, axis=1)
+        near = np.take_along_axis(near, np.argsort(near_d, axis=1), axis=1)
+        out.extend(near.tolist())
+    return out
+
+
+# Local search pada rute terbuka: node pertama tetap, setelah node terakhir ada
+# "ujung" virtual dengan biaya end_cost[node] (mis. jarak ke TPA terdekat).
+# Setiap langkah dievaluasi O(1) dari matriks jarak; hanya node di antrean
+# (don't-look bit mati) yang dicoba, dengan kandidat dari daftar tetangga.
+# Langkah: "2opt", "oropt" (segmen 2-3 node) dan "relocate" (1 node).
+# Matriks tidak simetris (jalan satu arah, matriks jarak_*) ikut dihitung: delta
+# 2-opt dan sisipan terbalik memperhitungkan arah ruas di dalam segmen yang dibalik.
+# Rute masukan dikembalikan bila hasil akhirnya ternyata tidak lebih pendek.
+def local_search(order, dist, end_cost=None, time_budget=LOCAL_SEARCH_BUDGET,
+                 moves=LOCAL_SEARCH_MOVES, neighbours=None, active=None, symmetric=None):
+    deadline = time.perf_counter() + time_budget
+    order = [int(x) for x in order]
+    n = len(dist)
+    if len(order) < 3:
+        return np.array(order, dtype=np.int64)
+    if symmetric is None:
+        symmetric = is_symmetric(dist)
+
+    end = n
+    rows = dist.tolist() if n <= LIST_MATRIX_MAX else None
+    ends = [0.0] * n if end_cost is None else [float(x) for x in end_cost]
+
+    def cost(a, b):
+        if b == end:
+            return ends[a]
+        if rows is not None:
+            return rows[a][b]
+        return dist.item(a, b)
+
+    if neighbours is None:
+        neighbours = neighbour_lists(dist)
+
+    tour = order + [end]
+    last = len(tour) - 1
+    pos = [0] * (n + 1)
+    for i, node in enumerate(tour):
+        pos[node] = i
+    in_tour = set(order)
+
+    # Prefix jarak maju/mundur sepanjang tour (hanya untuk matriks tidak simetris):
+    # biaya ruas di dalam tour[i..j] setelah dibalik = bwd[j] - bwd[i]
+    fwd, bwd = [], []
+
+    def refresh_prefix():
+        if symmetric:
+            return
+        fwd[:] = [0.0]
+        bwd[:] = [0.0]
+        for k in range(last - 1):
+            fwd.append(fwd[-1] + cost(tour[k], tour[k + 1]))
+            bwd.append(bwd[-1] + cost(tour[k + 1], tour[k]))
+
+    def reversal_change(i, j):
+        if symmetric or j <= i:
+            return 0.0
+        return (bwd[j] - bwd[i]) - (fwd[j] - fwd[i])
+
+    refresh_prefix()
+
+    queue = deque(order[1:] if active is None else [a for a in active if a in in_tour and a != order[0]])
+    queued = set(queue)
+    seg_lengths = [s for s, name in ((1, "relocate"), (2, "oropt"), (3, "oropt")) if name in moves]
+
+    def push(*nodes):
+        for node in nodes:
+            if node != end and node != tour[0] and node not in queued:
+                queue.append(node)
+                queued.add(node)
+
+    def reverse(p, q):
+        # balik tour[p+1 .. q]
+        tour[p + 1:q + 1] = tour[p + 1:q + 1][::-1]
+        for idx in range(p + 1, q + 1):
+            pos[tour[idx]] = idx
+
+    def try_two_opt(a):
+        i = pos[a]
+        for c in neighbours[a]:
+            if c not in in_tour:
+                continue
+            d_ac = cost(a, c)
+            j = pos[c]
+            # a dengan penerusnya: buang (t[p],t[p+1]) & (t[q],t[q+1])
+            if i < last and d_ac < cost(a, tour[i + 1]):
+                p, q = min(i, j), max(i, j)
+                if q > p + 1 and q <= last - 1:
+                    delta = (cost(tour[p], tour[q]) + cost(tour[p + 1], tour[q + 1])
+                             - cost(tour[p], tour[p + 1]) - cost(tour[q], tour[q + 1])
+                             + reversal_change(p + 1, q))
+                    if delta < -EPS:
+                        reverse(p, q)
+                        refresh_prefix()
+                        push(tour[p], tour[p + 1], tour[q], tour[q + 1])
+                        return True
+            # a dengan pendahulunya
+            if i > 0 and d_ac < cost(tour[i - 1], a):
+                p, q = min(i, j) - 1, max(i, j) - 1
+                if p >= 0 and q > p + 1 and q <= last - 1:
+                    delta = (cost(tour[p], tour[q]) + cost(tour[p + 1], tour[q + 1])
+                             - cost(tour[p], tour[p + 1]) - cost(tour[q], tour[q + 1])
+                             + reversal_change(p + 1, q))
+                    if delta < -EPS:
+                        reverse(p, q)
+                        refresh_prefix()
+                        push(tour[p], tour[p + 1], tour[q], tour[q + 1])
+                        return True
+        return False
+
+    def try_or_opt(a):
+        i = pos[a]
+        for s in seg_lengths:
+            # segmen dengan a sebagai node pertama atau terakhir
+            for first in {i, i - s + 1}:
+                seg_end = first + s - 1
+                if first < 1 or seg_end > last - 1:
+                    continue
+                f, l = tour[first], tour[seg_end]
+                prev, nxt = tour[first - 1], tour[seg_end + 1]
+                removal = cost(prev, f) + cost(l, nxt) - cost(prev, nxt)
+                if removal <= EPS:
+                    continue
+                flip = reversal_change(first, seg_end)
+                best = None
+                for c in neighbours[a]:
+                    if c not in in_tour:
+                        continue
+                    k = pos[c]
+                    for left in (k - 1, k):
+                        # sisipkan di antara tour[left] dan tour[left+1]
+                        if left < 0 or left >= last or first - 1 <= left <= seg_end:
+                            continue
+                        x, y = tour[left], tour[left + 1]
+                        base = cost(x, y)
+                        for rev in (False, True):
+                            head, tail = (l, f) if rev else (f, l)
+                            delta = cost(x, head) + cost(tail, y) - base - removal + (flip if rev else 0.0)
+                            if delta < -EPS and (best is None or delta < best[0]):
+                                best = (delta, left, rev)
+                if best is not None:
+                    _, left, rev = best
+                    segment = tour[first:seg_end + 1]
+                    if rev:
+                        segment.reverse()
+                    x, y = tour[left], tour[left + 1]
+                    rest = tour[:first] + tour[seg_end + 1:]
+                    at = rest.index(x) + 1
+                    tour[:] = rest[:at] + segment + rest[at:]
+                    for idx, node in enumerate(tour):
+                        pos[node] = idx
+                    refresh_prefix()
+                    push(prev, nxt, x, y, *segment)
+                    return True
+        return False
+
+    while queue and time.perf_counter() < deadline:
+        a = queue.popleft()
+        queued.discard(a)
+        improved = ("2opt" in moves and try_two_opt(a)) or (seg_lengths and try_or_opt(a))
+        if improved:
+            push(a)
+
+    def open_cost(route):
+        return sum(cost(a, b) for a, b in zip(route[:-1], route[1:]))
+
+    if open_cost(tour) > open_cost(order + [end]) + EPS:
+        return np.array(order, dtype=np.int64)
+    return np.array(tour[:-1], dtype=np.int64)
+
+
+# Held-Karp (DP bitmask) untuk rute terbuka dari `start` yang berakhir di TPA:
+# biaya akhir end_cost[node]. Tervektorisasi per lapisan jumlah bit mask.
+def held_karp(dist, end_cost=None, start=0):
+    n = len(dist)
+    if n <= 2:
+        return np.array([start] + [i for i in range(n) if i != start], dtype=np.int64)
+    others = np.array([i for i in range(n) if i != start], dtype=np.int64)
+    m = len(others)
+    inner = np.asarray(dist, dtype=np.float64)[np.ix_(others, others)]
+    from_start = np.asarray(dist, dtype=np.float64)[start, others]
+    ends = np.zeros(m) if end_cost is None else np.asarray(end_cost, dtype=np.float64)[others]
+
+    full = 1 << m
+    dp = np.full((full, m), np.inf)
+    parent = np.full((full, m), -1, dtype=np.int16)
+    singles = 1 << np.arange(m)
+    dp[singles, np.arange(m)] = from_start
+
+    masks = np.arange(full, dtype=np.int64)
+    bits = ((masks[:, None] >> np.arange(m)) & 1).astype(bool)
+    popcount = bits.sum(axis=1)
+    for size in range(2, m + 1):
+        layer = masks[popcount == size]
+        layer_bits = bits[layer]
+        for j in range(m):
+            with_j = layer[layer_bits[:, j]]
+            prev = with_j ^ (1 << j)
+            cand = dp[prev] + inner[:, j]
+            best = np.argmin(cand, axis=1)
+            dp[with_j, j] = cand[np.arange(len(with_j)), best]
+            parent[with_j, j] = best
+
+    last = int(np.argmin(dp[full - 1] + ends))
+    path = []
+    mask = full - 1
+    node = last
+    while node >= 0:
+        path.append(node)
+        prev = int(parent[mask, node])
+        mask ^= 1 << node
+        node = prev
+    return np.array([start] + [int(others[i]) for i in reversed(path)], dtype=np.int64)
+
+
+# Perkiraan waktu Held-Karp (detik), dipakai untuk memilih mesin optimasi
+def held_karp_estimate(n):
+    m = max(n - 1, 0)
+    return HELD_KARP_SECONDS_PER_OP * (1 << m) * m * m
+
+
+def _open_route_cost(order, dist, ends):
+    return route_length(order, dist) + float(ends[order[-1]])
+
+
+# Double-bridge pada rute terbuka (node awal tetap): A B C D -> A C B D.
+# Mengembalikan rute baru dan node di sekitar titik potong untuk local search.
+def double_bridge(order, rng):
+    n = len(order)
+    i, j, k = np.sort(rng.choice(np.arange(1, n), size=3, replace=False))
+    new = np.concatenate([order[:i], order[j:k], order[i:j], order[k:]])
+    touched = {int(new[p]) for c in (i, i + k - j, k) for p in (c - 1, c) if 0 <= p < n}
+    return new, touched
+
+
+# Iterated local search sampai `deadline` (time.time()): tendang rute terbaik
+# dengan double-bridge lalu perbaiki hanya di sekitar titik potong
+def iterated_local_search(order, dist, end_cost=None, deadline=None, seed=0, neighbours=None):
+    rng = np.random.default_rng(seed)
+    n = len(dist)
+    ends = np.zeros(n) if end_cost is None else np.asarray(end_cost, dtype=np.float64)
+    if neighbours is None:
+        neighbours = neighbour_lists(dist)
+    symmetric = is_symmetric(dist)
+    order = np.asarray(order, dtype=np.int64)
+    # Seed selain 0 mulai dari titik acak (random restart) di sekitar rute awal
+    if seed and len(order) >= KICK_MIN_STOPS:
+        for _ in range(max(1, len(order) // 20)):
+            order, _ = double_bridge(order, rng)
+    best = local_search(order, dist, ends, time_budget=max(deadline - time.time(), 0.0), neighbours=neighbours,
+                        symmetric=symmetric)
+    best_cost = _open_route_cost(best, dist, ends)
+    while len(best) >= KICK_MIN_STOPS and time.time() < deadline:
+        kicked, touched = double_bridge(best, rng)
+        cand = local_search(
+            kicked, dist, ends, time_budget=max(deadline - time.time(), 0.0),
+            neighbours=neighbours, active=sorted(touched), symmetric=symmetric,
+        )
+        cost = _open_route_cost(cand, dist, ends)
+        if cost < best_cost - EPS:
+            best, best_cost = cand, cost
+    return best, best_cost
+
+
+# Dijalankan di proses worker: matriks dibaca langsung dari shared memory
+def _multi_start_worker(shm_name, shape, end_cost, order, seed, deadline):
+    # Pool memakai spawn, jadi worker berbagi resource tracker dengan proses utama
+    # yang memiliki dan meng-unlink blok shared memory ini
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        dist = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        best, cost = iterated_local_search(order, dist, end_cost, deadline=deadline, seed=seed)
+        del dist
+        return best, cost
+    finally:
+        shm.close()
+
+
+# Tugas kosong untuk memastikan worker sudah start dan sudah mengimpor modul ini
+def _worker_ready():
+    return os.getpid()
+
+
+# Pool persisten; saat dibuat, setiap worker langsung diberi tugas kosong
+# sehingga start-up proses spawn berjalan di latar belakang
+def _process_pool(workers):
+    global _pool, _pool_workers, _pool_warmup
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            # spawn: aman dipakai dari server multi-thread (Streamlit)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+            _pool_workers = workers
+            _pool_warmup = [_pool.submit(_worker_ready) for _ in range(workers)]
+        return _pool, list(_pool_warmup)
+
+
+# Siapkan pool multi-start lebih awal (mis. saat opsi multi-start dicentang)
+def warm_pool(workers=None):
+    workers = workers or default_workers()
+    if workers > 1:
+        _process_pool(workers)
+
+
+def _reset_pool():
+    global _pool, _pool_workers, _pool_warmup
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool, _pool_workers, _pool_warmup = None, 0, []
+
+
+# Tunggu semua worker siap paling lama `timeout` detik
+def _wait_ready(warmup, timeout):
+    deadline = time.time() + timeout
+    try:
+        for future in warmup:
+            future.result(timeout=max(deadline - time.time(), 0.0))
+    except TimeoutError:
+        return False
+    except BrokenProcessPool:
+        _reset_pool()
+        return False
+    return True
+
+
+# Jumlah core yang boleh dipakai proses ini (menghormati CPU affinity bila ada)
+def default_workers():
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+# Multi-start paralel: setiap worker menjalankan ILS dengan seed berbeda dari
+# rute awal yang sama; rute terbaik yang selesai sebelum batas waktu dipakai.
+# Matriks jarak dibagi lewat shared memory, bukan di-pickle ke setiap worker.
+# Batas waktu worker dihitung setelah pool siap. Bila pool belum siap dalam
+# MULTI_START_WARMUP_SHARE anggaran, sisa waktu dipakai ILS di proses sendiri
+# (pool tetap disiapkan untuk panggilan berikutnya), jadi panggilan pertama
+# tidak pernah lebih buruk dari ILS satu core.
+# Mengembalikan (urutan, mesin): label mesin sesuai jalur yang benar-benar berjalan.
+def parallel_multi_start(order, dist, end_cost=None, time_budget=LOCAL_SEARCH_BUDGET, workers=None):
+    workers = workers or default_workers()
+    budget_end = time.time() + time_budget
+    dist = np.ascontiguousarray(dist, dtype=np.float64)
+    ends = np.zeros(len(dist)) if end_cost is None else np.asarray(end_cost, dtype=np.float64)
+    if workers <= 1:
+        best, _ = iterated_local_search(order, dist, ends, deadline=budget_end)
+        return best, ENGINE_ILS
+
+    pool, warmup = _process_pool(workers)
+    if not _wait_ready(warmup, time_budget * MULTI_START_WARMUP_SHARE):
+        best, _ = iterated_local_search(order, dist, ends, deadline=budget_end)
+        return best, ENGINE_ILS
+    deadline = budget_end
+
+    shm = shared_memory.SharedMemory(create=True, size=max(dist.nbytes, 1))
+    try:
+        view = np.ndarray(dist.shape, dtype=np.float64, buffer=shm.buf)
+        view[:] = dist
+        del view
+        futures = [
+            pool.submit(_multi_start_worker, shm.name, dist.shape, ends, np.asarray(order), seed, deadline)
+            for seed in range(workers)
+        ]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result(timeout=max(deadline - time.time(), 0.0) + MULTI_START_GRACE))
+            except BrokenProcessPool:
+                # pool rusak (worker mati): buat ulang pada panggilan berikutnya
+                _reset_pool()
+                break
+            except TimeoutError:
+                # worker lambat: hasil worker lain tetap dipakai
+                continue
+    finally:
+        shm.close()
+        shm.unlink()
+    if not results:
+        return local_search(order, dist, ends, time_budget=MULTI_START_GRACE), ENGINE_HEURISTIC
+    return min(results, key=lambda r: r[1])[0], f"{ENGINE_MULTI} ({len(results)} proses)"
+
+
+# Pilih mesin optimasi otomatis: eksak untuk rute kecil yang muat di anggaran
+# waktu, greedy + local search untuk sisanya
+def solve_route(dist, end_cost=None, lat=None, lon=None, start=0, time_budget=LOCAL_SEARCH_BUDGET, workers=None):
+    t0 = time.perf_counter()
+    n = len(dist)
+    if n <= EXACT_MAX_STOPS and held_karp_estimate(n) <= time_budget:
+        order = held_karp(dist, end_cost, start=start)
+        engine = ENGINE_EXACT
+    else:
+        if lat is not None and lon is not None:
+            order = nearest_neighbour_route(lat, lon, dist, start=start)
+        else:
+            order = greedy_route(dist, start=start)
+        remaining = max(time_budget - (time.perf_counter() - t0), 0.05)
+        if workers:
+            # workers diisi: multi-start ILS memakai seluruh anggaran waktu
+            order, engine = parallel_multi_start(order, dist, end_cost, time_budget=remaining, workers=workers)
+        else:
+            order = local_search(order, dist, end_cost, time_budget=remaining)
+            engine = ENGINE_HEURISTIC
+    return RouteResult(order=order, engine=engine, seconds=time.perf_counter() - t0)
+
+
+# Sisipkan `node` ke rute terbuka pada posisi termurah (tidak sebelum node awal);
+# posisi terakhir memakai end_cost sebagai biaya ke ujung virtual.
+def cheapest_insertion(order, node, dist, ends):
+    tour = np.asarray(order, dtype=np.int64)
+    a, b = tour[:-1], tour[1:]
+    extra = dist[a, node] + dist[node, b] - dist[a, b]
+    tail = dist[tour[-1], node] + ends[node] - ends[tour[-1]]
+    if len(extra) and extra.min() <= tail:
+        return int(np.argmin(extra)) + 1
+    return len(tour)
+
+
+# Perbaiki rute lama setelah TPS ditambah/dihapus, tanpa optimasi ulang penuh.
+# `previous` adalah urutan lama dalam indeks node sekarang; TPS yang sudah
+# dihapus ditandai -1. TPS baru disisipkan dengan cheapest insertion, lalu
+# local search hanya dijalankan dari node di sekitar posisi yang berubah.
+def repair_route(previous, dist, end_cost=None, start=0, time_budget=REPAIR_BUDGET):
+    t0 = time.perf_counter()
+    n = len(dist)
+    ends = np.zeros(n) if end_cost is None else np.asarray(end_cost, dtype=np.float64)
+    previous = [int(x) for x in previous]
+
+    order = [start]
+    touched = set()
+    for i, node in enumerate(previous):
+        if node < 0:
+            # sambungan baru: tetangga kiri dan kanan dari node yang dihapus
+            if i > 0 and previous[i - 1] >= 0:
+                touched.add(previous[i - 1])
+            if i + 1 < len(previous) and previous[i + 1] >= 0:
+                touched.add(previous[i + 1])
+        elif node != start:
+            order.append(node)
+
+    present = set(order)
+    added = [node for node in range(n) if node not in present]
+    for node in added:
+        at = cheapest_insertion(order, node, dist, ends)
+        order.insert(at, node)
+        touched.add(node)
+    if previous and previous[0] != start:
+        touched.update((start, order[1] if len(order) > 1 else start))
+
+    pos = {node: i for i, node in enumerate(order)}
+    active = set()
+    for node in touched:
+        i = pos[node]
+        active.update(order[max(i - 1, 0):i + 2])
+    order = local_search(order, dist, ends, time_budget=time_budget, active=sorted(active, key=pos.get))
+    return RouteResult(order=order, engine=ENGINE_REPAIR, seconds=time.perf_counter() - t0)
+
+
+# Rute baru bila belum ada rute sebelumnya atau rute cukup kecil untuk eksak,
+# selain itu rute sebelumnya diperbaiki secara inkremental
+def update_route(previous, dist, end_cost=None, lat=None, lon=None, start=0, time_budget=LOCAL_SEARCH_BUDGET,
+                 workers=None):
+    n = len(dist)
+    kept = [p for p in (previous or []) if p >= 0]
+    if not kept or (n <= EXACT_MAX_STOPS and held_karp_estimate(n) <= time_budget):
+        return solve_route(dist, end_cost, lat=lat, lon=lon, start=start, time_budget=time_budget, workers=workers)
+    return repair_route(previous, dist, end_cost, start=start, time_budget=min(REPAIR_BUDGET, time_budget))
@@ -0,0 +1,168 @@
+"""Mesin kueri lokal (SQLite) untuk filter dashboard.
+
+Dengan ``SAMPAH_QUERY_ENGINE=sqlite`` dataset TPS dan histori disalin ke file
+``sampah.db`` yang diberi indeks pada ``id_tps`` dan ``tanggal``. Filter, agregasi
+dan top-k dashboard lalu dijalankan di SQLite sehingga yang kembali ke Python
+hanya baris hasilnya, bukan salinan seluruh frame. Tabel dibangun ulang
+otomatis bila tanda tangan file sumbernya berubah. Tabel ``tps`` menyimpan
+``nearest_tpa``/``nearest_dist_km`` yang sudah diperbarui (``tpa_index``),
+sama seperti jalur pandas, jadi ikut dibangun ulang bila ``tpa`` berubah.
+"""
+import json
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+
+from data import DATA_DIR, dataset_signature, dataset_version, iter_dataset_chunks, load_dataset
+from tpa_index import refresh_nearest
+
+DB_PATH = DATA_DIR / "sampah.db"
+ENGINES = ("pandas", "sqlite")
+CHUNK_ROWS = 200_000
+
+# Kolom yang boleh dipakai untuk pengurutan top-k
+SORT_COLUMNS = ("volume_saat_ini", "Volume_kg", "keterisian_%")
+
+_local = threading.local()
+_sync_lock = threading.Lock()
+_synced = {}
+
+
+def query_engine():
+    engine = os.environ.get("SAMPAH_QUERY_ENGINE", "pandas").lower()
+    return engine if engine in ENGINES else "pandas"
+
+
+def enabled():
+    return query_engine() == "sqlite"
+
+
+def _connect():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        _local.conn = conn
+    return conn
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _stored_signature(conn, table):
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (tabel TEXT PRIMARY KEY, signature TEXT)")
+    row = conn.execute("SELECT signature FROM meta WHERE tabel = ?", (table,)).fetchone()
+    return row[0] if row else None
+
+
+def _load_tps(conn):
+    tps = load_dataset("tps")
+    try:
+        tpa = load_dataset("tpa")
+    except (OSError, ValueError):
+        tpa = pd.DataFrame()
+    tps, _ = refresh_nearest(tps, tpa, dataset_version("tps", "tpa") if not tpa.empty else None)
+    tps.to_sql("tps", conn, if_exists="replace", index=False)
+    conn.execute("CREATE INDEX idx_tps_id ON tps (id_tps)")
+
+
+def _load_histori(conn):
+    conn.execute("DROP TABLE IF EXISTS histori")
+    for chunk in iter_dataset_chunks("histori", chunksize=CHUNK_ROWS):
+        chunk = chunk.assign(
+            id_tps=chunk["id_tps"].astype(str),
+            tanggal=pd.to_datetime(chunk["tanggal"], errors="coerce").dt.strftime("%Y-%m-%d"),
+        )
+        chunk.to_sql("histori", conn, if_exists="append", index=False)
+    conn.execute("CREATE INDEX idx_histori_id ON histori (id_tps)")
+    conn.execute("CREATE INDEX idx_histori_tanggal ON histori (tanggal)")
+    conn.execute("CREATE INDEX idx_histori_id_tanggal ON histori (id_tps, tanggal)")
+
+
+_LOADERS = {"tps": _load_tps, "histori": _load_histori}
+# File sumber yang menentukan isi tiap tabel
+_SOURCES = {"tps": ("tps", "tpa"), "histori": ("histori",)}
+
+
+# Pastikan tabel sesuai dengan file sumber terbaru (dibangun ulang bila berubah)
+def sync(tables=("tps", "histori")):
+    conn = _connect()
+    for table in tables:
+        signature = json.dumps([dataset_signature(name) for name in _SOURCES[table]])
+        if _synced.get(table) == signature:
+            continue
+        with _sync_lock:
+            if _stored_signature(conn, table) != signature:
+                with conn:
+                    _LOADERS[table](conn)
+                    conn.execute(
+                        "INSERT OR REPLACE INTO meta (tabel, signature) VALUES (?, ?)",
+                        (table, signature),
+                    )
+            _synced[table] = signature
+    return conn
+
+
+def _where_ids(ids, column="id_tps"):
+    if not ids:
+        return "", []
+    marks = ", ".join("?" for _ in ids)
+    return f"WHERE {column} IN ({marks})", [str(i) for i in ids]
+
+
+# Baris TPS (plus keterisian_%) untuk daftar id tertentu; semua TPS bila kosong
+def tps_rows(ids=None):
+    conn = sync(("tps",))
+    where, params = _where_ids(ids)
+    sql = f"""
+        SELECT *, COALESCE(volume_saat_ini * 100.0 / NULLIF(kapasitas, 0), 0) AS "keterisian_%"
+        FROM tps {where}
+    """
+    return pd.read_sql_query(sql, conn, params=params)
+
+
+def histori_tps_ids():
+    conn = sync(("histori",))
+    rows = conn.execute("SELECT DISTINCT id_tps FROM histori ORDER BY id_tps").fetchall()
+    return [r[0] for r in rows]
+
+
+# Top-k TPS berdasarkan kolom tertentu, dengan total volume histori per TPS
+def top_tps(ids=None, sort_by="Volume_kg", k=5):
+    if sort_by not in SORT_COLUMNS:
+        raise ValueError(f"Kolom urut tidak didukung: {sort_by}")
+    conn = sync(("tps", "histori"))
+    where, params = _where_ids(ids)
+    tps_cols = [r[1] for r in conn.execute("PRAGMA table_info(tps)") if r[1] != "id_tps"]
+    select_tps = ", ".join(f"t.{_quote(c)}" for c in tps_cols)
+    # id_tps diambil dari histori (sisi kanan join), seperti merge how="right"
+    sql = f"""
+        WITH h AS (
+            SELECT id_tps, SUM(Volume_kg) AS Volume_kg
+            FROM histori {where}
+            GROUP BY id_tps
+        )
+        SELECT h.id_tps, {select_tps}, h.Volume_kg,
+               COALESCE(t.volume_saat_ini * 100.0 / NULLIF(t.kapasitas, 0), 0) AS "keterisian_%"
+        FROM h LEFT JOIN tps t ON t.id_tps = h.id_tps
+        ORDER BY {_quote(sort_by)} DESC NULLS LAST
+        LIMIT ?
+    """
+    return pd.read_sql_query(sql, conn, params=params + [int(k)])
+
+
+# Total volume per bulan (YYYY-MM), opsional untuk sebagian TPS saja
+def monthly_totals(ids=None):
+    conn = sync(("histori",))
+    where, params = _where_ids(ids)
+    sql = f"""
+        SELECT substr(tanggal, 1, 7) AS bulan, SUM(Volume_kg) AS Volume_kg
+        FROM histori {where}
+        GROUP BY bulan
+        HAVING bulan IS NOT NULL
+        ORDER BY bulan
+    """
+    return pd.read_sql_query(sql, conn, params=params)
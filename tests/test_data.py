@@ -0,0 +1,109 @@
+import os
+
+import pandas as pd
+import pytest
+
+import data
+
+
+@pytest.fixture
+def tps_csv(tmp_path, monkeypatch):
+    pd.DataFrame({
+        "id_tps": ["T1", "T2", "T3"],
+        "latitude": [28.60, 28.61, None],
+        "longitude": [77.20, 77.21, 77.22],
+        "volume_saat_ini": [10.0, 20.0, 30.0],
+    }).to_csv(tmp_path / "tps.csv", index=False)
+    monkeypatch.setattr(data, "DATA_DIR", tmp_path)
+    monkeypatch.setenv("SAMPAH_STORAGE", "csv")
+    data.clear_cache()
+    yield
+    data.clear_cache()
+
+
+def test_copy_on_write_is_process_wide():
+    assert pd.get_option("mode.copy_on_write") is True
+
+
+def test_session_changes_do_not_leak_into_cache(tps_csv):
+    frame = data.load_dataset("tps")
+    frame.loc[0, "volume_saat_ini"] = 999.0
+    frame["latitude"] = frame["latitude"].fillna(0.0)
+    frame["id_tps"] = frame["id_tps"].str.lower()
+    frame.drop(index=1, inplace=True)
+
+    fresh = data.load_dataset("tps")
+    assert fresh["volume_saat_ini"].tolist() == [10.0, 20.0, 30.0]
+    assert fresh["latitude"].isna().tolist() == [False, False, True]
+    assert fresh["id_tps"].tolist() == ["T1", "T2", "T3"]
+
+
+def test_column_projection_shares_cached_columns(tps_csv):
+    lokasi = data.load_dataset("tps", columns=["latitude", "longitude"])
+    lokasi.loc[1, "longitude"] = 0.0
+    assert data.load_dataset("tps", columns=["longitude"])["longitude"].tolist() == [77.20, 77.21, 77.22]
+    assert data.dataset_columns("tps") == ["id_tps", "latitude", "longitude", "volume_saat_ini"]
+
+
+HISTORI = (
+    "id_tps,tanggal,kapasitas,Volume_kg,keterisian_%,latitude,longitude\n"
+    "TPS01,2020-01-31,600.0,100.5,16.8,28.60,77.20\n"
+    "TPS02,2020-01-31,400.0,50.0,12.5,28.61,77.21\n"
+    "TPS01,2020-02-29,600.0,20.0,3.3,28.60,77.20\n"
+)
+
+
+@pytest.fixture
+def histori_dir(tmp_path, monkeypatch):
+    (tmp_path / "histori_rute.csv").write_text(HISTORI)
+    monkeypatch.setattr(data, "DATA_DIR", tmp_path)
+    data.clear_cache()
+    yield tmp_path
+    data.clear_cache()
+
+
+def test_parquet_conversion_keeps_typed_schema(histori_dir, monkeypatch):
+    monkeypatch.setenv("SAMPAH_STORAGE", "parquet")
+    (path,) = data.convert_to_parquet(["histori"])
+    assert path == histori_dir / "histori_rute.parquet"
+
+    frame = data.load_dataset("histori")
+    assert data.dataset_path("histori") == path
+    assert isinstance(frame["id_tps"].dtype, pd.CategoricalDtype)
+    assert frame["Volume_kg"].dtype == "float32"
+    assert pd.api.types.is_datetime64_any_dtype(frame["tanggal"])
+    assert data.dataset_rows("histori") == 3
+    pd.testing.assert_frame_equal(frame, pd.read_parquet(path))
+
+
+def test_column_projection_reads_only_requested_columns(histori_dir, monkeypatch):
+    monkeypatch.setenv("SAMPAH_STORAGE", "csv")
+    reads = []
+    read = data._read
+
+    def counting_read(name, path, columns):
+        reads.append(list(columns))
+        return read(name, path, columns)
+
+    monkeypatch.setattr(data, "_read", counting_read)
+
+    volume = data.load_dataset("histori", columns=["id_tps", "Volume_kg"])
+    assert list(volume.columns) == ["id_tps", "Volume_kg"]
+    # Kolom yang sudah di cache tidak dibaca ulang, hanya kolom baru
+    data.load_dataset("histori", columns=["Volume_kg", "tanggal"])
+    assert reads == [["id_tps", "Volume_kg"], ["tanggal"]]
+
+
+def test_auto_mode_prefers_newer_parquet(histori_dir, monkeypatch):
+    monkeypatch.setenv("SAMPAH_STORAGE", "auto")
+    csv_file = histori_dir / "histori_rute.csv"
+    assert data.dataset_path("histori") == csv_file
+    (pq_file,) = data.convert_to_parquet(["histori"])
+    assert data.dataset_path("histori") == pq_file
+
+    # CSV diperbarui setelah konversi: Parquet dianggap basi
+    later = pq_file.stat().st_mtime_ns + 10**9
+    os.utime(csv_file, ns=(later, later))
+    assert data.dataset_path("histori") == csv_file
+    monkeypatch.setenv("SAMPAH_STORAGE", "lainnya")
+    assert data.storage_mode() == "auto"
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from deck_layers import DECK_MIN_POINTS, TPA_RGB, default_backend, fill_rgb, point_columns
+
+
+def test_fill_colour_follows_fill_level():
+    rgb = fill_rgb([0.0, 50.0, 100.0, 150.0, -5.0, np.nan, 25.0])
+    assert rgb.dtype == np.uint8 and rgb.shape == (7, 3)
+    assert rgb[:3].tolist() == [[46, 160, 67], [240, 200, 40], [215, 48, 39]]
+    # Di luar 0-100 dipotong, NaN dianggap kosong
+    assert rgb[3].tolist() == rgb[2].tolist()
+    assert rgb[4].tolist() == rgb[5].tolist() == rgb[0].tolist()
+    assert rgb[6].tolist() == [143, 180, 54]
+
+
+def test_point_columns_are_flat_and_skip_missing_coordinates():
+    tps = pd.DataFrame({
+        "id_tps": ["T1", "T2", "T3"],
+        "latitude": [28.6, None, 28.7],
+        "longitude": [77.2, 77.3, "bukan angka"],
+        "keterisian_%": [100.0, 10.0, 0.0],
+        "volume_saat_ini": [12.345, 1.0, 2.0],
+    }, index=[10, 11, 12])
+    data = point_columns(tps, "id_tps", {"volume_saat_ini": "Volume", "tidak_ada": "X"}, percent_column="keterisian_%")
+    assert list(data.columns) == ["lon", "lat", "r", "g", "b", "label", "info"]
+    assert data[["lon", "lat", "label"]].values.tolist() == [[77.2, 28.6, "T1"]]
+    assert data[["r", "g", "b"]].values.tolist() == [[215, 48, 39]]
+    assert data["info"].tolist() == ["<br><b>Volume:</b> 12.3"]
+
+    tpa = point_columns(pd.DataFrame({"nama": ["TPA A"], "latitude": [28.5], "longitude": [77.1]}), "nama")
+    assert tuple(tpa.loc[0, ["r", "g", "b"]]) == TPA_RGB
+    assert tpa["info"].tolist() == [""]
+
+
+@pytest.mark.parametrize("env, count, expected", [
+    (None, 10, "folium"),
+    (None, DECK_MIN_POINTS, "deck"),
+    ("deck", 10, "deck"),
+    ("FOLIUM", DECK_MIN_POINTS * 5, "folium"),
+    ("lainnya", DECK_MIN_POINTS, "deck"),
+])
+def test_default_backend(monkeypatch, env, count, expected):
+    if env is None:
+        monkeypatch.delenv("SAMPAH_MAP_BACKEND", raising=False)
+    else:
+        monkeypatch.setenv("SAMPAH_MAP_BACKEND", env)
+    assert default_backend(count) == expected
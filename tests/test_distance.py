@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from distance import MatrixProvider, apply_id_map, points, read_id_map
+
+
+def test_id_map_aliases_matrix_labels(tmp_path):
+    provider = MatrixProvider(["TPS", "A", "B"], np.array([[0, 1, 2], [1, 0, 3], [2, 3, 0]]), key="m")
+    mapping = tmp_path / "ids.csv"
+    mapping.write_text("label,id\nA,TPS01\nB,TPS02\nTPS,Okhla\n")
+    apply_id_map(provider, read_id_map(mapping))
+    pts = points(["TPS01", "TPS02", "Okhla"], [0, 0, 0], [0, 0, 0])
+    assert provider.matrix(pts, pts).tolist() == [[0, 3, 1], [3, 0, 2], [1, 2, 0]]
+
+
+def test_id_map_rejects_unknown_labels(tmp_path):
+    provider = MatrixProvider(["A"], np.zeros((1, 1)), key="m")
+    with pytest.raises(KeyError, match="Z"):
+        apply_id_map(provider, {"TPS01": "Z"})
+    mapping = tmp_path / "ids.csv"
+    mapping.write_text("a,b\nA,TPS01\n")
+    with pytest.raises(ValueError):
+        read_id_map(mapping)
@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fleet import (
+    plan_region_matrix, region_matrix, relocate_between_trips, savings_trips, trip_length, unplanned_stops,
+)
+
+
+def region(k, seed):
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(0, 10, (k + 1, 2))
+    return np.linalg.norm(xy[:, None] - xy[None, :], axis=-1)
+
+
+@pytest.mark.parametrize("load", [3000.0, 3000.5, 1500.0])
+def test_exact_multiple_load_has_no_empty_trip(load):
+    dist = region(4, seed=0)
+    loads = [load, 200.0, 300.0, 100.0]
+    plans = plan_region_matrix(dist, np.arange(4), loads, 0, ["T1", "T2"], payload=1500.0, time_budget=0.2)
+    trips = [t for p in plans for t in p.trips]
+    assert all(t.load > 0 for t in trips)
+    assert all(t.load <= 1500.0 + 1e-9 for t in trips)
+    assert sum(t.load for t in trips) == pytest.approx(sum(loads))
+    visits = sum(int(np.count_nonzero(t.stops == 0)) for t in trips)
+    assert visits == int(np.ceil(load / 1500.0))
+
+
+def test_relocate_keeps_stops_and_capacity():
+    dist = region(30, seed=1)
+    rng = np.random.default_rng(1)
+    loads = rng.uniform(50, 300, 30).tolist()
+    nodes = rng.permutation(np.arange(1, 31)).tolist()
+    trips = [nodes[i:i + 5] for i in range(0, 30, 5)]
+    before = sum(trip_length(t, dist) for t in trips)
+    out = relocate_between_trips([list(t) for t in trips], dist, loads, 1500.0, deadline=float("inf"))
+    assert sorted(n for t in out for n in t) == list(range(1, 31))
+    assert all(sum(loads[n - 1] for n in t) <= 1500.0 + 1e-9 for t in out)
+    assert sum(trip_length(t, dist) for t in out) < before
+
+
+def test_unplanned_stops_lists_unknown_regions():
+    tables = SimpleNamespace(tpa_names=np.array(["TPA A", "TPA B"]))
+    tps_df = pd.DataFrame({"id_tps": ["T1", "T2", "T3", "T4"], "nearest_tpa": ["TPA A", None, "TPA X", "TPA B"]})
+    assert unplanned_stops(tables, tps_df) == ["T2", "T3"]
+
+
+def test_region_matrix_keeps_depot_direction():
+    rng = np.random.default_rng(2)
+    tables = SimpleNamespace(
+        tps_tps=rng.uniform(1, 5, (6, 6)), tps_tpa=rng.uniform(1, 5, (6, 2)), tpa_tps=rng.uniform(6, 9, (2, 6)),
+    )
+    dist = region_matrix(tables, [4, 1, 3], 1)
+    assert dist[0, 1:].tolist() == tables.tpa_tps[1, [4, 1, 3]].tolist()
+    assert dist[1:, 0].tolist() == tables.tps_tpa[[4, 1, 3], 1].tolist()
+
+
+def test_savings_asymmetric_keeps_trip_direction():
+    dist = region(12, seed=3) * np.random.default_rng(3).uniform(0.5, 2.0, (13, 13))
+    np.fill_diagonal(dist, 0.0)
+    loads = np.full(12, 100.0)
+    trips = savings_trips(dist, loads, payload=400.0)
+    assert sorted(n for t in trips for n in t) == list(range(1, 13))
+    assert all(len(t) <= 4 for t in trips)
+    # Tiap gabungan hanya diterima bila savings searahnya positif
+    assert sum(trip_length(t, dist) for t in trips) < sum(trip_length([n], dist) for n in range(1, 13))
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+import hexbin
+from hexbin import HEX_SIZES_KM, compute_grids, hex_axial, hex_center, hex_geojson, hex_grid, hex_rings
+
+
+def tps_frame(n, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "id_tps": [f"T{i}" for i in range(n)],
+        "latitude": 28.6 + rng.normal(0, 0.05, n),
+        "longitude": 77.2 + rng.normal(0, 0.05, n),
+        "keterisian_%": rng.uniform(0, 100, n),
+        "volume_saat_ini": rng.uniform(0, 50, n),
+    })
+
+
+def test_points_fall_in_nearest_hexagon():
+    rng = np.random.default_rng(0)
+    xy = rng.uniform(-20, 20, (5000, 2))
+    q, r = hex_axial(xy, 1.5)
+    own = np.column_stack(hex_center(q, r, 1.5))
+    d_own = np.linalg.norm(xy - own, axis=1)
+    assert d_own.max() <= 1.5 + 1e-9
+    # Tidak ada pusat tetangga yang lebih dekat dari pusat sel sendiri
+    for dq, dr in [(1, 0), (-1, 0), (0, 1), (0, -1), (1, -1), (-1, 1)]:
+        other = np.column_stack(hex_center(q + dq, r + dr, 1.5))
+        assert (np.linalg.norm(xy - other, axis=1) >= d_own - 1e-9).all()
+
+
+def test_cell_aggregates_match_groupby():
+    tps = tps_frame(800, seed=1)
+    tps.loc[:9, "latitude"] = np.nan
+    grid = compute_grids(tps, sizes=(1.0,))[1.0]
+    valid = tps.iloc[10:]
+
+    xy = hexbin.project_km(valid["latitude"], valid["longitude"], grid.lat0, grid.lon0)
+    q, r = hex_axial(xy, 1.0)
+    expected = valid.assign(q=q, r=r).groupby(["q", "r"]).agg(
+        jumlah=("id_tps", "size"),
+        keterisian_rata=("keterisian_%", "mean"),
+        keterisian_maks=("keterisian_%", "max"),
+        volume=("volume_saat_ini", "sum"),
+    ).reset_index()
+    cells = grid.cells[["q", "r", "jumlah", "keterisian_rata", "keterisian_maks", "volume"]]
+    pd.testing.assert_frame_equal(cells, expected, check_dtype=False)
+    assert grid.cells["jumlah"].sum() == 790
+
+
+def test_grids_are_cached_per_version(monkeypatch):
+    tps = tps_frame(200, seed=2)
+    calls = []
+    compute = hexbin.compute_grids
+
+    def counting(frame, sizes=HEX_SIZES_KM):
+        calls.append(sizes)
+        return compute(frame, sizes)
+
+    monkeypatch.setattr(hexbin, "compute_grids", counting)
+    monkeypatch.setattr(hexbin, "_cache", hexbin.OrderedDict())
+    for size in HEX_SIZES_KM:
+        assert hex_grid(tps, size, version="v1").size_km == size
+    assert calls == [HEX_SIZES_KM]
+    # Tanpa versi (TPS hasil filter) selalu dihitung langsung, satu resolusi saja
+    hex_grid(tps, 2.0)
+    assert calls == [HEX_SIZES_KM, (2.0,)]
+
+
+def test_rings_and_geojson_follow_cells():
+    grid = compute_grids(tps_frame(300, seed=3), sizes=(2.0,))[2.0]
+    rings = hex_rings(grid)
+    assert len(rings) == len(grid.cells)
+    assert all(len(ring) == 7 and ring[0] == ring[-1] for ring in rings)
+    geojson = hex_geojson(grid)
+    assert len(geojson["features"]) == len(grid.cells)
+    assert geojson["features"][0]["properties"]["jumlah"] == float(grid.cells["jumlah"].iloc[0])
+    assert compute_grids(tps_frame(0, seed=4), sizes=(1.0,))[1.0].cells.empty
@@ -0,0 +1,33 @@
+import threading
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import map_layers
+import viewport
+from map_layers import view_copy
+
+
+def test_view_copy_keeps_cached_map_unchanged():
+    cached = SimpleNamespace(_children=OrderedDict(tiles="tile"), location=[28.6, 77.2])
+    view = view_copy(cached)
+    view._children["feature_group"] = "TPS sesi ini"
+    assert list(cached._children) == ["tiles"]
+    assert view.location is cached.location
+
+
+def test_lazy_caches_are_created_once(monkeypatch):
+    monkeypatch.setattr(map_layers, "_map_cache", None)
+    monkeypatch.setattr(viewport, "_tile_cache", None)
+    barrier = threading.Barrier(8)
+    seen = []
+
+    def ambil():
+        barrier.wait()
+        seen.append((id(map_layers.map_cache()), id(viewport.tile_cache())))
+
+    threads = [threading.Thread(target=ambil) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(set(seen)) == 1
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+import pickup
+from pickup import clean_routes, coordinates_swapped
+
+DELHI = (28.4, 76.8, 28.9, 77.4)
+
+
+def test_high_latitude_is_not_swapped():
+    # Longyearbyen, Svalbard (78,2 LU)
+    lat, lon = np.full(5, 78.22), np.linspace(15.5, 15.7, 5)
+    assert not coordinates_swapped(lat, lon)
+
+
+def test_swapped_columns_are_detected():
+    # routes.csv: kolom latitude berisi bujur Raleigh (-78,8) -> lintang Antarktika
+    assert coordinates_swapped(np.full(5, -78.8), np.full(5, 35.7))
+    # lintang mustahil
+    assert coordinates_swapped(np.full(5, 120.0), np.full(5, 30.0))
+    assert not coordinates_swapped(np.full(5, 35.7), np.full(5, -78.8))
+
+
+def test_city_bounds_decide_order():
+    lat, lon = np.full(4, 28.6), np.full(4, 77.2)
+    assert not coordinates_swapped(lat, lon, DELHI)
+    # Tertukar tapi keduanya lintang yang mungkin: hanya kotak kota yang bisa memutuskan
+    assert coordinates_swapped(lon, lat, DELHI)
+    assert not coordinates_swapped(lon, lat)
+
+
+def test_clean_routes_swaps_and_drops(monkeypatch):
+    frame = pd.DataFrame({
+        "hari": ["Mon", "senin", "Funday"],
+        "pickup_sampah": ["Yes", "No", "Yes"],
+        "latitude": [77.20, 77.21, 77.22],
+        "longitude": [28.60, 28.61, 28.62],
+    })
+    clean, swapped, dropped = clean_routes(frame, DELHI)
+    assert swapped and dropped == 1
+    assert clean["latitude"].tolist() == [28.60, 28.61]
+    assert clean["hari"].tolist() == ["Monday", "Monday"]
+
+    monkeypatch.setenv("SAMPAH_CITY_BBOX", "28.4,76.8,28.9,77.4")
+    assert pickup.city_bounds() == DELHI
+    monkeypatch.setenv("SAMPAH_CITY_BBOX", "bukan,angka")
+    assert pickup.city_bounds() is None
+
+
+def test_shipped_routes_are_swapped():
+    assert pickup.load_pickup_index().swapped
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from roadnet import ContractionHierarchy, grid_graph, index_path, load_network, load_network_provider, write_graphml
+from routing import greedy_route, is_symmetric, local_search, route_length
+
+
+def perturbed_grid(rows, cols, seed):
+    graph = grid_graph(rows, cols)
+    rng = np.random.default_rng(seed)
+    # bobot acak per arah agar jalur terpendek unik dan tidak simetris
+    return graph._replace(length=graph.length * rng.uniform(0.5, 1.5, len(graph.length)))
+
+
+def reference(graph):
+    n = len(graph.lat)
+    return dijkstra(csr_matrix((graph.length, (graph.u, graph.v)), shape=(n, n)))
+
+
+def path_length(graph, nodes):
+    weight = {}
+    for a, b, w in zip(graph.u.tolist(), graph.v.tolist(), graph.length.tolist()):
+        weight[(a, b)] = min(w, weight.get((a, b), np.inf))
+    return sum(weight[(a, b)] for a, b in zip(nodes[:-1], nodes[1:]))
+
+
+@pytest.mark.parametrize("rows, cols", [(20, 20), (50, 50)])
+def test_ch_matches_dijkstra(rows, cols):
+    graph = perturbed_grid(rows, cols, seed=rows)
+    n = len(graph.lat)
+    ch = ContractionHierarchy.build(n, graph.u, graph.v, graph.length)
+    expected = reference(graph)
+
+    rng = np.random.default_rng(0)
+    sources = rng.choice(n, 15, replace=False).tolist()
+    targets = rng.choice(n, 15, replace=False).tolist()
+    got = ch.many_to_many(sources, targets)
+    assert np.allclose(got, expected[np.ix_(sources, targets)])
+
+    for s, t in zip(sources, targets):
+        nodes = ch.path(s, t)
+        assert nodes[0] == s and nodes[-1] == t
+        assert path_length(graph, nodes) == pytest.approx(expected[s, t])
+
+
+def test_ch_roundtrips_through_arrays():
+    graph = perturbed_grid(8, 8, seed=1)
+    n = len(graph.lat)
+    ch = ContractionHierarchy.build(n, graph.u, graph.v, graph.length)
+    restored = ContractionHierarchy.from_arrays(ch.to_arrays())
+    nodes = list(range(n))
+    assert np.allclose(restored.many_to_many(nodes, nodes), reference(graph))
+    assert restored.path(0, n - 1) == ch.path(0, n - 1)
+
+
+def test_provider_requires_prebuilt_index(tmp_path):
+    path = tmp_path / "grid.graphml"
+    write_graphml(path, grid_graph(4, 4))
+    with pytest.raises(FileNotFoundError, match="roadnet.py build"):
+        load_network_provider(path)
+    assert not index_path(path).exists()
+
+    load_network(path, rebuild=True)
+    assert index_path(path).exists()
+    assert load_network_provider(path).network.ch is not None
+
+
+def test_one_way_streets_give_direction_aware_routes():
+    graph = perturbed_grid(12, 12, seed=5)
+    # Setengah ruas horizontal jadi satu arah: arah baliknya dibuang
+    rng = np.random.default_rng(5)
+    horizontal = np.abs(graph.u - graph.v) == 1
+    keep = ~(horizontal & (graph.u > graph.v) & (rng.random(len(graph.u)) < 0.5))
+    graph = graph._replace(u=graph.u[keep], v=graph.v[keep], length=graph.length[keep])
+    n = len(graph.lat)
+    ch = ContractionHierarchy.build(n, graph.u, graph.v, graph.length)
+    nodes = rng.choice(n, 40, replace=False).tolist()
+    dist = ch.many_to_many(nodes, nodes)
+    assert np.allclose(dist, reference(graph)[np.ix_(nodes, nodes)])
+    assert not is_symmetric(dist)
+
+    initial = greedy_route(dist)
+    improved = local_search(initial, dist, time_budget=5.0)
+    assert sorted(improved.tolist()) == list(range(40))
+    assert route_length(improved, dist) <= route_length(initial, dist) + 1e-9
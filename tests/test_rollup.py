@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import data
+import rollup
+
+HEADER = "id_tps,tanggal,kapasitas,Volume_kg,keterisian_%,latitude,longitude\n"
+
+
+def row(tps, bulan, volume):
+    return f"{tps},{bulan},600.0,{volume:.1f},50.0,27.18,78.02\n"
+
+
+@pytest.fixture
+def histori(tmp_path, monkeypatch):
+    path = tmp_path / "histori_rute.csv"
+    path.write_text(HEADER + row("TPS01", "2020-01", 100) + row("TPS02", "2020-01", 50) + row("TPS01", "2020-02", 20))
+    monkeypatch.setattr(rollup, "dataset_path", lambda name: path)
+    return path
+
+
+def totals(rollups):
+    return dict(zip(rollups.tps["id_tps"], rollups.tps["Volume_kg"]))
+
+
+def test_append_folds_only_new_rows(histori, tmp_path):
+    state_dir = tmp_path / "rollup"
+    rollups, new_rows, rebuilt = rollup.refresh_rollups(state_dir)
+    assert (new_rows, rebuilt) == (3, True)
+    assert totals(rollups) == {"TPS01": 120.0, "TPS02": 50.0}
+
+    with open(histori, "a") as f:
+        f.write(row("TPS02", "2020-02", 7))
+    rollups, new_rows, rebuilt = rollup.refresh_rollups(state_dir)
+    assert (new_rows, rebuilt) == (1, False)
+    assert totals(rollups) == {"TPS01": 120.0, "TPS02": 57.0}
+    bulan = dict(zip(rollups.bulan["bulan"], rollups.bulan["jumlah_baris"]))
+    assert bulan == {"2020-01": 2, "2020-02": 2}
+
+    # Tanpa baris baru tidak ada yang dibaca ulang
+    _, new_rows, rebuilt = rollup.refresh_rollups(state_dir)
+    assert (new_rows, rebuilt) == (0, False)
+
+
+def test_rewritten_tail_triggers_rebuild(histori, tmp_path):
+    state_dir = tmp_path / "rollup"
+    rollup.refresh_rollups(state_dir)
+
+    # Ukuran file sama, isi baris terakhir berubah: offset masih valid tapi hash ekor tidak
+    histori.write_text(histori.read_text().replace("20.0", "90.0"))
+    rollups, new_rows, rebuilt = rollup.refresh_rollups(state_dir)
+    assert (new_rows, rebuilt) == (3, True)
+    assert totals(rollups) == {"TPS01": 190.0, "TPS02": 50.0}
+    expected = rollup.finalize_rollup(rollup._fold([pd.read_csv(histori)])[0])
+    pd.testing.assert_frame_equal(rollups.tps_bulan, expected)
+
+
+def parquet_rows(rows):
+    return pd.DataFrame(rows, columns=["id_tps", "tanggal", "Volume_kg"])
+
+
+@pytest.fixture
+def histori_parquet(tmp_path, monkeypatch):
+    path = tmp_path / "histori_rute.parquet"
+    monkeypatch.setattr(rollup, "dataset_path", lambda name: path)
+    return path
+
+
+def test_parquet_append_and_rewrite(histori_parquet, tmp_path):
+    state_dir = tmp_path / "rollup"
+    base = [("TPS01", "2020-01", 100.0), ("TPS02", "2020-01", 50.0), ("TPS01", "2020-02", 20.0)]
+    parquet_rows(base).to_parquet(histori_parquet, index=False, row_group_size=3)
+    _, new_rows, rebuilt = rollup.refresh_rollups(state_dir)
+    assert (new_rows, rebuilt) == (3, True)
+
+    # Ditambah sebagai row group baru: hanya baris baru yang dilipat
+    parquet_rows(base + [("TPS02", "2020-02", 7.0)]).to_parquet(histori_parquet, index=False, row_group_size=3)
+    rollups, new_rows, rebuilt = rollup.refresh_rollups(state_dir)
+    assert (new_rows, rebuilt) == (1, False)
+    assert totals(rollups) == {"TPS01": 120.0, "TPS02": 57.0}
+
+    # Ditulis ulang dengan nilai lain dan jumlah baris sama: dibangun ulang
+    edited = [("TPS01", "2020-01", 100.0), ("TPS02", "2020-01", 50.0), ("TPS01", "2020-02", 90.0),
+              ("TPS02", "2020-02", 7.0)]
+    parquet_rows(edited).to_parquet(histori_parquet, index=False, row_group_size=3)
+    rollups, new_rows, rebuilt = rollup.refresh_rollups(state_dir)
+    assert (new_rows, rebuilt) == (4, True)
+    assert totals(rollups) == {"TPS01": 190.0, "TPS02": 57.0}
+
+
+@pytest.fixture
+def histori_besar(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    n = 600
+    frame = pd.DataFrame({
+        "id_tps": [f"TPS{i:02d}" for i in rng.integers(0, 40, n)],
+        "tanggal": pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 700, n), unit="D"),
+        "Volume_kg": rng.uniform(0, 500, n).round(1),
+    })
+    frame.to_csv(tmp_path / "histori_rute.csv", index=False)
+    monkeypatch.setattr(data, "DATA_DIR", tmp_path)
+    monkeypatch.setenv("SAMPAH_STORAGE", "csv")
+    return frame.assign(bulan=frame["tanggal"].dt.to_period("M").astype(str))
+
+
+@pytest.mark.parametrize("chunksize", [13, 997, 100_000])
+def test_stream_rollup_matches_in_memory_groupby(histori_besar, chunksize):
+    tps_bulan = rollup.stream_rollup(chunksize=chunksize)
+    expected = histori_besar.groupby(["id_tps", "bulan"]).agg(
+        Volume_kg=("Volume_kg", "sum"), jumlah_baris=("Volume_kg", "size")
+    ).reset_index()
+    pd.testing.assert_frame_equal(tps_bulan, expected, check_exact=False)
+
+    rollups = rollup.derive_rollups(tps_bulan)
+    per_tps = histori_besar.groupby("id_tps", as_index=False)["Volume_kg"].sum()
+    pd.testing.assert_frame_equal(rollup.total_per_tps(rollups), per_tps, check_exact=False)
+    dipilih = ["TPS03", "TPS17"]
+    per_bulan = (
+        histori_besar[histori_besar["id_tps"].isin(dipilih)].groupby("bulan", as_index=False)["Volume_kg"].sum()
+    )
+    pd.testing.assert_frame_equal(rollup.total_per_bulan(rollups, dipilih), per_bulan, check_exact=False)
+
+
+def test_rollup_chunk_skips_rows_without_date_or_tps():
+    chunk = pd.DataFrame({
+        "id_tps": ["TPS01", None, "TPS01", "TPS02"],
+        "tanggal": ["2020-01-05", "2020-01-06", "bukan tanggal", "2020-02-01"],
+        "Volume_kg": [10.0, 20.0, 30.0, 40.0],
+    })
+    out = rollup.finalize_rollup(rollup.rollup_chunk(chunk))
+    assert out.values.tolist() == [["TPS01", "2020-01", 10.0, 1], ["TPS02", "2020-02", 40.0, 1]]
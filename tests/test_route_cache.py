@@ -0,0 +1,34 @@
+import pickle
+
+import route_cache
+from route_cache import CACHE_FILE, RouteCache
+
+
+def saved_keys(directory):
+    with open(directory / CACHE_FILE, "rb") as f:
+        return [key for key, _ in pickle.load(f)]
+
+
+def test_disk_writes_are_batched(tmp_path, monkeypatch):
+    monkeypatch.setattr(route_cache, "FLUSH_INTERVAL", 3600.0)
+    cache = RouteCache(maxsize=2, directory=tmp_path)
+    cache.put("a", 1)
+    assert saved_keys(tmp_path) == ["a"]
+
+    # Masih dalam FLUSH_INTERVAL: hanya ditandai kotor, file belum ditulis ulang
+    cache.put("b", 2)
+    cache.put("c", 3)
+    assert saved_keys(tmp_path) == ["a"]
+
+    cache.flush()
+    assert saved_keys(tmp_path) == ["b", "c"]
+    restored = RouteCache(maxsize=2, directory=tmp_path)
+    assert (restored.get("a"), restored.get("b"), restored.get("c")) == (None, 2, 3)
+
+
+def test_memory_cache_never_writes(tmp_path):
+    cache = RouteCache(maxsize=2)
+    cache.put("a", 1)
+    cache.flush()
+    assert cache.get("a") == 1
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,226 @@
+import time
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from itertools import permutations
+
+import numpy as np
+import pytest
+
+from distance import haversine_matrix, haversine_pairs
+import routing
+from routing import (
+    ENGINE_HEURISTIC, ENGINE_ILS, ENGINE_MULTI, cheapest_insertion, greedy_route, greedy_route_indexed, held_karp,
+    is_symmetric, iterated_local_search, local_search, nearest_neighbour_route, parallel_multi_start, repair_route,
+    route_length, solve_route,
+)
+
+
+def random_instance(n, seed):
+    rng = np.random.default_rng(seed)
+    xy = rng.random((n, 2)) * 10
+    dist = np.sqrt(((xy[:, None] - xy[None]) ** 2).sum(axis=-1))
+    ends = rng.random(n) * 5
+    return dist, ends
+
+
+# Jarak searah: tiap arah dikali faktor acak sendiri (mis. jalan satu arah)
+def asymmetric_instance(n, seed):
+    dist, ends = random_instance(n, seed)
+    dist = dist * np.random.default_rng(seed + 1).uniform(0.5, 2.0, (n, n))
+    np.fill_diagonal(dist, 0.0)
+    return dist, ends
+
+
+def open_cost(order, dist, ends):
+    return route_length(order, dist) + float(ends[order[-1]])
+
+
+def brute_force(dist, ends, start=0):
+    others = [i for i in range(len(dist)) if i != start]
+    return min(open_cost([start, *p], dist, ends) for p in permutations(others))
+
+
+@pytest.mark.parametrize("n", range(1, 9))
+def test_held_karp_matches_brute_force(n):
+    dist, ends = random_instance(n, seed=n)
+    order = held_karp(dist, ends, start=0)
+    assert sorted(order.tolist()) == list(range(n))
+    assert order[0] == 0
+    assert open_cost(order, dist, ends) == pytest.approx(brute_force(dist, ends))
+
+
+def test_held_karp_start_other_than_zero():
+    dist, ends = random_instance(7, seed=42)
+    order = held_karp(dist, ends, start=3)
+    assert order[0] == 3
+    assert open_cost(order, dist, ends) == pytest.approx(brute_force(dist, ends, start=3))
+
+
+def assert_permutation(order, n, start=0):
+    assert sorted(np.asarray(order).tolist()) == list(range(n))
+    assert order[0] == start
+
+
+@pytest.mark.parametrize("n", [3, 10, 60, 300])
+def test_local_search_returns_no_longer_permutation(n):
+    dist, ends = random_instance(n, seed=n)
+    initial = greedy_route(dist)
+    improved = local_search(initial, dist, ends, time_budget=5.0)
+    assert_permutation(improved, n)
+    assert open_cost(improved, dist, ends) <= open_cost(initial, dist, ends) + 1e-9
+
+
+def test_local_search_improves_random_order():
+    dist, ends = random_instance(80, seed=7)
+    initial = np.r_[0, np.random.default_rng(7).permutation(np.arange(1, 80))]
+    improved = local_search(initial, dist, ends, time_budget=5.0)
+    assert_permutation(improved, 80)
+    assert open_cost(improved, dist, ends) < open_cost(initial, dist, ends)
+
+
+def test_local_search_asymmetric_matrix():
+    assert not is_symmetric(asymmetric_instance(5, seed=0)[0])
+    for seed in range(20):
+        dist, ends = asymmetric_instance(60, seed)
+        initial = greedy_route(dist)
+        improved = local_search(initial, dist, ends, time_budget=5.0)
+        assert_permutation(improved, 60)
+        assert open_cost(improved, dist, ends) <= open_cost(initial, dist, ends) + 1e-9
+
+    # Delta yang tepat arah: local search berhenti sendiri jauh sebelum batas waktu
+    dist, ends = asymmetric_instance(80, seed=3)
+    initial = np.r_[0, np.random.default_rng(3).permutation(np.arange(1, 80))]
+    t0 = time.perf_counter()
+    improved = local_search(initial, dist, ends, time_budget=30.0)
+    assert time.perf_counter() - t0 < 10.0
+    assert open_cost(improved, dist, ends) < open_cost(initial, dist, ends)
+
+
+@pytest.mark.parametrize("n", [6, 8])
+def test_ils_asymmetric_cost_is_consistent(n):
+    dist, ends = asymmetric_instance(n, seed=n)
+    best, cost = iterated_local_search(greedy_route(dist), dist, ends, deadline=time.time() + 0.5)
+    assert cost == pytest.approx(open_cost(best, dist, ends))
+    assert cost >= brute_force(dist, ends) - 1e-9
+
+
+@pytest.mark.parametrize("removed, added", [(0, 5), (5, 0), (4, 4)])
+def test_repair_route_after_stops_change(removed, added):
+    n_old = 50
+    dist, ends = random_instance(n_old + added, seed=removed * 10 + added)
+    old = local_search(greedy_route(dist[:n_old, :n_old]), dist[:n_old, :n_old], ends[:n_old], time_budget=2.0)
+    # TPS yang dihapus ditandai -1; node baru (indeks >= n_old) harus disisipkan
+    dropped = set(old[1:removed + 1].tolist())
+    previous = [-1 if node in dropped else int(node) for node in old]
+    keep = [i for i in range(n_old + added) if i not in dropped]
+    remap = {node: k for k, node in enumerate(keep)}
+    previous = [remap[p] if p >= 0 else -1 for p in previous]
+    sub, sub_ends = dist[np.ix_(keep, keep)], ends[keep]
+
+    result = repair_route(previous, sub, sub_ends, start=0, time_budget=2.0)
+    assert_permutation(result.order, len(keep))
+
+    # tidak lebih panjang dari rute lama dengan node dihapus dilewati dan node baru disisipkan termurah
+    baseline = [p for p in previous if p >= 0]
+    for node in sorted(set(range(len(keep))) - set(baseline)):
+        baseline.insert(cheapest_insertion(baseline, node, sub, sub_ends), node)
+    assert open_cost(result.order, sub, sub_ends) <= open_cost(baseline, sub, sub_ends) + 1e-9
+
+
+def test_repair_route_not_longer_than_input_order():
+    dist, ends = random_instance(40, seed=3)
+    previous = greedy_route(dist).tolist()
+    result = repair_route(previous, dist, ends, start=0, time_budget=2.0)
+    assert_permutation(result.order, 40)
+    assert open_cost(result.order, dist, ends) <= open_cost(previous, dist, ends) + 1e-9
+
+
+def test_haversine_matrix_matches_pairwise_kernel():
+    rng = np.random.default_rng(0)
+    lat, lon = 28.5 + rng.random(20) * 0.3, 77.0 + rng.random(20) * 0.3
+    full = haversine_matrix(lat, lon, lat, lon)
+    i, j = np.triu_indices(20, 1)
+    assert np.allclose(full[i, j], haversine_pairs(lat[i], lon[i], lat[j], lon[j]))
+    assert np.allclose(full, full.T)
+    assert np.allclose(np.diag(full), 0.0)
+
+
+@pytest.mark.parametrize("n", [2, 30, 200])
+def test_indexed_greedy_matches_matrix_greedy(n):
+    rng = np.random.default_rng(n)
+    lat, lon = 28.5 + rng.random(n) * 0.3, 77.0 + rng.random(n) * 0.3
+    dist = haversine_matrix(lat, lon, lat, lon)
+    assert greedy_route_indexed(lat, lon, start=0).tolist() == greedy_route(dist, start=0).tolist()
+
+
+def test_nearest_neighbour_uses_matrix_when_given():
+    rng = np.random.default_rng(1)
+    lat, lon = 28.5 + rng.random(600) * 0.3, 77.0 + rng.random(600) * 0.3
+    # Matriks bukan haversine: greedy harus mengikuti matriks, bukan koordinat
+    dist = haversine_matrix(lat, lon, lat, lon) * rng.uniform(0.5, 2.0, (600, 600))
+    assert nearest_neighbour_route(lat, lon, dist).tolist() == greedy_route(dist).tolist()
+    assert nearest_neighbour_route(lat, lon).tolist() == greedy_route_indexed(lat, lon).tolist()
+
+
+def test_multi_start_runs_in_worker_processes():
+    dist, ends = random_instance(60, seed=21)
+    start = greedy_route(dist)
+    try:
+        pool, warmup = routing._process_pool(2)
+        assert routing._wait_ready(warmup, 60.0)
+        order, engine = parallel_multi_start(start, dist, ends, time_budget=0.5, workers=2)
+    finally:
+        routing._reset_pool()
+    assert engine == f"{ENGINE_MULTI} (2 proses)"
+    assert sorted(order) == list(range(60)) and order[0] == 0
+    assert open_cost(order, dist, ends) <= open_cost(start, dist, ends) + 1e-9
+
+
+def test_multi_start_falls_back_to_ils_when_pool_not_ready(monkeypatch):
+    monkeypatch.setattr(routing, "_process_pool", lambda workers: (None, []))
+    monkeypatch.setattr(routing, "_wait_ready", lambda warmup, timeout: False)
+    dist, ends = random_instance(40, seed=22)
+    order, engine = parallel_multi_start(greedy_route(dist), dist, ends, time_budget=0.1, workers=4)
+    assert engine == ENGINE_ILS
+    assert sorted(order) == list(range(40))
+    _, engine = parallel_multi_start(greedy_route(dist), dist, ends, time_budget=0.1, workers=1)
+    assert engine == ENGINE_ILS
+
+    # Label di solve_route mengikuti jalur yang berjalan, bukan jumlah worker yang diminta
+    result = solve_route(dist, ends, time_budget=0.1, workers=4)
+    assert result.engine == ENGINE_ILS
+
+
+class BrokenPool:
+    def submit(self, *args, **kwargs):
+        future = Future()
+        future.set_exception(BrokenProcessPool("worker mati"))
+        return future
+
+
+def test_broken_pool_is_reset_and_route_still_improved(monkeypatch):
+    resets = []
+    monkeypatch.setattr(routing, "_process_pool", lambda workers: (BrokenPool(), []))
+    monkeypatch.setattr(routing, "_wait_ready", lambda warmup, timeout: True)
+    monkeypatch.setattr(routing, "_reset_pool", lambda: resets.append(True))
+    dist, ends = random_instance(40, seed=23)
+    start = greedy_route(dist)
+    order, engine = parallel_multi_start(start, dist, ends, time_budget=0.1, workers=2)
+    assert resets == [True]
+    assert engine == ENGINE_HEURISTIC
+    assert open_cost(order, dist, ends) <= open_cost(start, dist, ends) + 1e-9
+
+
+def test_reset_pool_shuts_down_and_clears(monkeypatch):
+    calls = []
+
+    class Pool:
+        def shutdown(self, wait=True, cancel_futures=False):
+            calls.append((wait, cancel_futures))
+
+    monkeypatch.setattr(routing, "_pool", Pool())
+    monkeypatch.setattr(routing, "_pool_workers", 3)
+    monkeypatch.setattr(routing, "_pool_warmup", [Future()])
+    routing._reset_pool()
+    assert calls == [(False, True)]
+    assert (routing._pool, routing._pool_workers, routing._pool_warmup) == (None, 0, [])
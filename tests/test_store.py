@@ -0,0 +1,27 @@
+import threading
+
+import pytest
+
+import store
+from data import load_dataset
+from tpa_index import refresh_nearest
+
+
+@pytest.fixture
+def sqlite_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, "DB_PATH", tmp_path / "sampah.db")
+    monkeypatch.setattr(store, "_local", threading.local())
+    monkeypatch.setattr(store, "_synced", {})
+    yield store
+    conn = getattr(store._local, "conn", None)
+    if conn is not None:
+        conn.close()
+
+
+def test_tps_rows_match_pandas_nearest(sqlite_store):
+    expected, stale = refresh_nearest(load_dataset("tps"), load_dataset("tpa"))
+    assert stale > 0
+    rows = sqlite_store.tps_rows().set_index("id_tps")
+    expected = expected.assign(id_tps=expected["id_tps"].astype(str)).set_index("id_tps")
+    assert rows["nearest_tpa"].to_dict() == expected["nearest_tpa"].to_dict()
+    assert rows["nearest_dist_km"].round(2).to_dict() == expected["nearest_dist_km"].round(2).to_dict()
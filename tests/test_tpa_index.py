@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from tpa_index import compute_nearest, refresh_nearest
+
+
+def frames():
+    tpa = pd.DataFrame({"nama": ["Utara", "Selatan"], "latitude": [28.8, 28.4], "longitude": [77.1, 77.1]})
+    tps = pd.DataFrame({
+        "id_tps": ["T1", "T2", "T3"],
+        "latitude": [28.75, np.nan, 28.45],
+        "longitude": [77.1, 77.1, 77.1],
+        # T1 basi (salah TPA), T2 tanpa koordinat, T3 sudah benar
+        "nearest_tpa": ["Selatan", "Utara", "Selatan"],
+        "nearest_dist_km": [38.92, 1.0, 5.56],
+    })
+    return tps, tpa
+
+
+def test_nan_tps_keeps_stored_values():
+    tps, tpa = frames()
+    out, stale = refresh_nearest(tps, tpa, version="nan-tps")
+    assert stale == 1
+    assert out["nearest_tpa"].tolist() == ["Utara", "Utara", "Selatan"]
+    assert out["nearest_dist_km"].tolist()[1] == 1.0
+
+
+def test_nan_tpa_is_skipped():
+    tps, tpa = frames()
+    tpa = pd.concat([tpa, pd.DataFrame({"nama": ["Hilang"], "latitude": [np.nan], "longitude": [77.1]})])
+    result = compute_nearest(tps, tpa)
+    assert "Hilang" not in result.names.tolist()
+    assert result.stale.tolist() == [True, False, False]
+
+    # Tanpa TPA berkoordinat sama sekali: semua nilai tersimpan dipakai apa adanya
+    result = compute_nearest(tps, tpa.iloc[2:])
+    assert result.names.tolist() == tps["nearest_tpa"].tolist()
+    assert not result.stale.any()
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from zones import assign_zones, balanced_zones
+
+
+# Beberapa kelompok TPS dengan muatan tidak rata (km di sekitar TPA)
+def clustered(n, seed):
+    rng = np.random.default_rng(seed)
+    centres = rng.uniform(-20, 20, (3, 2))
+    xy = np.concatenate([rng.normal(c, 3, (n // 3, 2)) for c in centres])
+    return xy, rng.gamma(2, 50, len(xy))
+
+
+@pytest.mark.parametrize("n, k, seed", [(300, 3, 0), (900, 8, 1), (1500, 17, 2)])
+def test_zone_loads_are_balanced(n, k, seed):
+    xy, weights = clustered(n, seed)
+    labels = balanced_zones(xy, weights, k)
+    load = np.bincount(labels, weights=weights, minlength=k)
+    target = weights.sum() / k
+    assert np.abs(load / target - 1).max() < 0.15
+
+
+@pytest.mark.parametrize("k", [1, 2, 5, 12])
+def test_no_empty_zones(k):
+    xy, weights = clustered(60, seed=3)
+    # Sebagian TPS bermuatan nol dan bertumpuk di satu titik
+    weights[:20] = 0.0
+    xy[20:30] = xy[20]
+    labels = balanced_zones(xy, weights, k)
+    assert sorted(np.unique(labels)) == list(range(k))
+    # Truk lebih banyak dari TPS: satu zona per TPS
+    assert sorted(balanced_zones(xy[:4], weights[:4], 10)) == [0, 1, 2, 3]
+
+
+def test_zones_are_deterministic():
+    xy, weights = clustered(600, seed=4)
+    first = balanced_zones(xy, weights, 6)
+    assert np.array_equal(first, balanced_zones(xy.copy(), weights.copy(), 6))
+
+    rng = np.random.default_rng(5)
+    tps = pd.DataFrame({
+        "id_tps": [f"T{i}" for i in range(40)],
+        "latitude": 28.6 + rng.normal(0, 0.05, 40),
+        "longitude": 77.2 + rng.normal(0, 0.05, 40),
+        "volume_saat_ini": rng.uniform(10, 100, 40),
+        "nearest_tpa": ["TPA A"] * 30 + ["TPA X"] * 10,
+    })
+    tpa = pd.DataFrame({"nama": ["TPA A"], "latitude": [28.6], "longitude": [77.2]})
+    trucks = {"TPA A": ["TR01", "TR02", "TR03"]}
+    zones = assign_zones(tps, tpa, trucks)
+    assert zones.equals(assign_zones(tps, tpa, trucks))
+    assert sorted(zones[:30].unique()) == ["TR01", "TR02", "TR03"]
+    # TPS di wilayah tanpa truk tidak dibagi ke zona mana pun
+    assert (zones[30:] == "Cadangan").all()
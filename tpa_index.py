@@ -0,0 +1,141 @@
+"""Indeks spasial TPA untuk penentuan TPA terdekat.
+
+TPA disimpan di BallTree (metrik haversine), jadi TPA terdekat untuk semua
+TPS dihitung dalam satu kueri batch dan kueri satu titik berjalan O(log n).
+
+Kolom ``nearest_tpa``/``nearest_dist_km`` di ``tps.csv`` adalah nilai statis
+yang bisa basi bila koordinat TPA berubah. Saat dataset dimuat, nilai itu
+dibandingkan dengan hasil indeks; baris yang berbeda diperbarui di memori.
+TPS atau TPA tanpa koordinat dilewati: nilai tersimpan TPS itu dibiarkan.
+Hasil di-cache per versi dataset TPS + TPA. Untuk menulis nilai baru kembali
+ke file sumber:
+
+    python tpa_index.py refresh --write
+"""
+import argparse
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+
+from data import dataset_path, dataset_version, load_dataset
+from distance import EARTH_RADIUS_KM
+
+# Selisih jarak (km) yang dianggap basi; nilai di CSV dibulatkan 2 desimal
+NEAREST_TOLERANCE_KM = 0.05
+INDEX_CACHE_SIZE = 4
+
+NearestTpa = namedtuple("NearestTpa", ["names", "km", "stale"])
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def _coords(frame):
+    lat = pd.to_numeric(frame["latitude"], errors="coerce").to_numpy(np.float64)
+    lon = pd.to_numeric(frame["longitude"], errors="coerce").to_numpy(np.float64)
+    return np.column_stack([lat, lon])
+
+
+# Hanya TPA berkoordinat yang diindeks; tanpa TPA valid `tree` bernilai None
+class TpaIndex:
+    def __init__(self, tpa_df):
+        from sklearn.neighbors import BallTree
+
+        coords = _coords(tpa_df)
+        valid = np.isfinite(coords).all(axis=1)
+        self.names = tpa_df["nama"].astype(str).to_numpy()[valid]
+        self.tree = BallTree(np.radians(coords[valid]), metric="haversine") if valid.any() else None
+
+    # TPA terdekat untuk banyak titik sekaligus: (nama TPA, jarak km)
+    def nearest(self, lat, lon):
+        coords = np.column_stack([np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64)])
+        dist, idx = self.tree.query(np.radians(coords), k=1)
+        return self.names[idx[:, 0]], dist[:, 0] * EARTH_RADIUS_KM
+
+    def nearest_one(self, lat, lon):
+        names, km = self.nearest([lat], [lon])
+        return str(names[0]), float(km[0])
+
+
+# TPA terdekat semua TPS, dibandingkan dengan nilai tersimpan di tps_df.
+# TPS tanpa koordinat (atau bila tidak ada TPA berkoordinat) memakai nilai
+# tersimpannya dan tidak pernah dianggap basi.
+def compute_nearest(tps_df, tpa_df):
+    has_stored = "nearest_tpa" in tps_df.columns and "nearest_dist_km" in tps_df.columns
+    names = np.array(tps_df["nearest_tpa"] if has_stored else [None] * len(tps_df), dtype=object)
+    stored = (
+        pd.to_numeric(tps_df["nearest_dist_km"], errors="coerce").to_numpy(np.float64)
+        if has_stored else np.full(len(tps_df), np.nan)
+    )
+    km = stored.copy()
+    stale = np.zeros(len(tps_df), dtype=bool)
+    index = TpaIndex(tpa_df)
+    coords = _coords(tps_df)
+    valid = np.isfinite(coords).all(axis=1)
+    if index.tree is not None and valid.any():
+        found, found_km = index.nearest(coords[valid, 0], coords[valid, 1])
+        found_km = np.round(found_km, 2)
+        if has_stored:
+            same_tpa = tps_df["nearest_tpa"].astype(str).to_numpy()[valid] == found
+            stale[valid] = ~(same_tpa & (np.abs(stored[valid] - found_km) <= NEAREST_TOLERANCE_KM))
+        else:
+            stale[valid] = True
+        names[valid] = found
+        km[valid] = found_km
+    return NearestTpa(names=names, km=km, stale=stale)
+
+
+def cached_nearest(tps_df, tpa_df, version):
+    with _lock:
+        result = _cache.get(version)
+        if result is not None:
+            _cache.move_to_end(version)
+            return result
+    result = compute_nearest(tps_df, tpa_df)
+    with _lock:
+        _cache[version] = result
+        while len(_cache) > INDEX_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+# Kembalikan tps_df dengan nearest_tpa/nearest_dist_km yang sudah diperbarui,
+# beserta jumlah baris yang nilainya basi
+def refresh_nearest(tps_df, tpa_df, version=None):
+    if tps_df.empty or tpa_df.empty:
+        return tps_df, 0
+    if version is None:
+        version = dataset_version("tps", "tpa")
+    result = cached_nearest(tps_df, tpa_df, version)
+    if len(result.names) != len(tps_df):
+        result = compute_nearest(tps_df, tpa_df)
+    stale = int(result.stale.sum())
+    if stale == 0:
+        return tps_df, 0
+    return tps_df.assign(nearest_tpa=result.names, nearest_dist_km=result.km), stale
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Periksa/perbarui kolom nearest_tpa di dataset TPS")
+    sub = parser.add_subparsers(dest="command", required=True)
+    refresh = sub.add_parser("refresh", help="Hitung ulang TPA terdekat semua TPS")
+    refresh.add_argument("--write", action="store_true", help="Tulis nilai baru ke file dataset TPS")
+    args = parser.parse_args(argv)
+
+    if args.command == "refresh":
+        tps_df, tpa_df = load_dataset("tps"), load_dataset("tpa")
+        updated, stale = refresh_nearest(tps_df, tpa_df)
+        print(f"{stale} dari {len(tps_df)} TPS memiliki nearest_tpa/nearest_dist_km basi")
+        if args.write and stale:
+            path = dataset_path("tps")
+            if path.suffix == ".parquet":
+                updated.to_parquet(path, index=False)
+            else:
+                updated.to_csv(path, index=False)
+            print(f"Ditulis: {path.name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""Culling TPS per area peta dan level-of-detail berbasis tile.
+
+Peta dashboard mode viewport hanya mengirim TPS di dalam batas peta yang
+dilaporkan ``st_folium`` (``bounds`` + ``zoom``). Area itu dipetakan ke tile
+Web Mercator (z/x/y); isi tiap tile diambil dari indeks spasial dan di-cache
+LRU per (versi data, tile, jenis isi).
+
+Indeks: koordinat TPS diproyeksikan ke Web Mercator lalu diurutkan menurut
+kode Morton pada zoom ``INDEX_ZOOM``. Semua titik dalam satu tile di zoom
+mana pun (<= ``INDEX_ZOOM``) menempati satu rentang kontigu, jadi isi tile
+cukup dua ``searchsorted``.
+
+Level-of-detail: pada zoom di bawah ``DETAIL_ZOOM`` (dan bila titik di area
+terlalu banyak) tile dikirim sebagai sel grid agregat -- ``CELL_LEVELS`` zoom
+lebih halus dari tile, berisi jumlah TPS, rata-rata dan maksimum
+``keterisian_%``, dan total ``volume_saat_ini``. TPS satu per satu baru
+muncul setelah pengguna memperbesar peta.
+"""
+import math
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+
+from route_cache import RouteCache, memoize
+
+INDEX_ZOOM = 16
+DETAIL_ZOOM = 13
+# Di bawah DETAIL_ZOOM titik tetap dikirim satu per satu bila jumlahnya sedikit
+POINTS_MAX = 500
+# Sel agregat = tile dibagi 2**CELL_LEVELS per sisi
+CELL_LEVELS = 3
+MAX_TILES = 64
+TILE_CACHE_SIZE = 1024
+INDEX_CACHE_SIZE = 4
+MAX_LAT = 85.05112878
+VIEWPORT_MIN_POINTS = 5000
+POINT_COLUMNS = ("id_tps", "nama", "kapasitas", "volume_saat_ini", "keterisian_%")
+
+# bounds = (selatan, barat, utara, timur)
+View = namedtuple("View", ["bounds", "zoom"])
+ViewLayer = namedtuple("ViewLayer", ["kind", "frame", "tiles"])
+
+_indexes = OrderedDict()
+_lock = threading.Lock()
+_tile_cache = None
+
+
+# Koordinat Web Mercator ternormalisasi [0, 1)
+def mercator(lat, lon):
+    lat = np.clip(np.asarray(lat, dtype=np.float64), -MAX_LAT, MAX_LAT)
+    lon = np.asarray(lon, dtype=np.float64)
+    x = (lon + 180.0) / 360.0
+    y = (1.0 - np.log(np.tan(np.radians(lat)) + 1.0 / np.cos(np.radians(lat))) / math.pi) / 2.0
+    return np.clip(x, 0.0, np.nextafter(1.0, 0)), np.clip(y, 0.0, np.nextafter(1.0, 0))
+
+
+def _spread_bits(v):
+    v = np.asarray(v, dtype=np.uint64) & np.uint64(0xFFFFFFFF)
+    for shift, mask in ((16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF), (4, 0x0F0F0F0F0F0F0F0F),
+                        (2, 0x3333333333333333), (1, 0x5555555555555555)):
+        v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+    return v
+
+
+# Kode Morton (Z-order) tile x/y: bit x di posisi genap, bit y di posisi ganjil
+def morton(tx, ty):
+    return _spread_bits(tx) | (_spread_bits(ty) << np.uint64(1))
+
+
+def tile_range(bounds, zoom):
+    south, west, north, east = bounds
+    n = 1 << zoom
+    (x0, x1), (y0, y1) = mercator([north, south], [west, east])
+    return int(x0 * n), int(x1 * n), int(y0 * n), int(y1 * n)
+
+
+# Tile yang menutupi bounds; zoom diturunkan bila jumlah tile melebihi MAX_TILES
+def view_tiles(bounds, zoom):
+    zoom = max(0, min(int(zoom), INDEX_ZOOM))
+    while True:
+        x0, x1, y0, y1 = tile_range(bounds, zoom)
+        if zoom == 0 or (x1 - x0 + 1) * (y1 - y0 + 1) <= MAX_TILES:
+            return [(zoom, x, y) for y in range(y0, y1 + 1) for x in range(x0, x1 + 1)]
+        zoom -= 1
+
+
+# Zoom terbesar yang memuat seluruh bounds di peta berukuran width x height piksel
+def fit_zoom(bounds, width=1000, height=550):
+    south, west, north, east = bounds
+    (x0, x1), (y0, y1) = mercator([north, south], [west, east])
+    span = max((x1 - x0) * 256 / width, (y1 - y0) * 256 / height, 1e-12)
+    return max(0, min(INDEX_ZOOM, math.floor(math.log2(1.0 / span))))
+
+
+# Nilai st_folium ({"bounds": {"_southWest": ..., "_northEast": ...}, "zoom": z}) -> View
+def view_from_map(value):
+    if not value:
+        return None
+    try:
+        sw, ne = value["bounds"]["_southWest"], value["bounds"]["_northEast"]
+        bounds = (float(sw["lat"]), float(sw["lng"]), float(ne["lat"]), float(ne["lng"]))
+        zoom = int(value["zoom"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not all(math.isfinite(b) for b in bounds):
+        return None
+    return View(bounds=bounds, zoom=zoom)
+
+
+class TpsViewIndex:
+    def __init__(self, tps_df, version=None):
+        frame = tps_df.copy()
+        frame["latitude"] = pd.to_numeric(frame["latitude"], errors="coerce")
+        frame["longitude"] = pd.to_numeric(frame["longitude"], errors="coerce")
+        frame = frame.dropna(subset=["latitude", "longitude"])
+        columns = [c for c in POINT_COLUMNS if c in frame.columns]
+        x, y = mercator(frame["latitude"], frame["longitude"])
+        n = 1 << INDEX_ZOOM
+        codes = morton((x * n).astype(np.uint64), (y * n).astype(np.uint64))
+        order = np.argsort(codes, kind="stable")
+        self.version = version
+        self.codes = codes[order]
+        self.frame = frame[["latitude", "longitude", *columns]].iloc[order].reset_index(drop=True)
+        self.lat = self.frame["latitude"].to_numpy(np.float64)
+        self.lon = self.frame["longitude"].to_numpy(np.float64)
+        self.fill = self._numeric("keterisian_%")
+        self.volume = self._numeric("volume_saat_ini")
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _numeric(self, column):
+        if column not in self.frame.columns:
+            return np.zeros(len(self.frame))
+        return pd.to_numeric(self.frame[column], errors="coerce").fillna(0).to_numpy(np.float64)
+
+    # Bounds seluruh TPS (selatan, barat, utara, timur)
+    def extent(self):
+        return float(self.lat.min()), float(self.lon.min()), float(self.lat.max()), float(self.lon.max())
+
+    def initial_view(self, width=1000, height=550):
+        bounds = self.extent()
+        return View(bounds=bounds, zoom=fit_zoom(bounds, width, height))
+
+    # Rentang posisi (terurut Morton) titik dalam tile z/x/y
+    def tile_slice(self, z, x, y):
+        shift = np.uint64(2 * (INDEX_ZOOM - z))
+        lo = morton(x, y) << shift
+        hi = lo + (np.uint64(1) << shift)
+        return slice(int(np.searchsorted(self.codes, lo)), int(np.searchsorted(self.codes, hi)))
+
+    def count(self, tiles):
+        return sum(s.stop - s.start for s in (self.tile_slice(*t) for t in tiles))
+
+    def tile_points(self, z, x, y):
+        return self.frame.iloc[self.tile_slice(z, x, y)]
+
+    # Sel agregat dalam tile: kode sel = kode Morton dipotong ke zoom sel
+    def tile_cells(self, z, x, y):
+        part = self.tile_slice(z, x, y)
+        if part.start == part.stop:
+            return pd.DataFrame(columns=["latitude", "longitude", "jumlah", "keterisian_rata", "keterisian_maks",
+                                         "volume"])
+        level = min(z + CELL_LEVELS, INDEX_ZOOM)
+        cells = self.codes[part] >> np.uint64(2 * (INDEX_ZOOM - level))
+        starts = np.flatnonzero(np.r_[True, cells[1:] != cells[:-1]])
+        counts = np.diff(np.r_[starts, len(cells)])
+        fill = self.fill[part]
+        return pd.DataFrame({
+            "latitude": np.add.reduceat(self.lat[part], starts) / counts,
+            "longitude": np.add.reduceat(self.lon[part], starts) / counts,
+            "jumlah": counts,
+            "keterisian_rata": np.add.reduceat(fill, starts) / counts,
+            "keterisian_maks": np.maximum.reduceat(fill, starts),
+            "volume": np.add.reduceat(self.volume[part], starts),
+        })
+
+
+# Indeks di-cache per versi dataset TPS (beberapa versi terakhir)
+def view_index(tps_df, version):
+    with _lock:
+        index = _indexes.get(version)
+        if index is not None:
+            _indexes.move_to_end(version)
+            return index
+    index = TpsViewIndex(tps_df, version)
+    with _lock:
+        _indexes[version] = index
+        while len(_indexes) > INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
+
+
+def tile_cache():
+    global _tile_cache
+    with _lock:
+        if _tile_cache is None:
+            _tile_cache = RouteCache(maxsize=TILE_CACHE_SIZE)
+        return _tile_cache
+
+
+# Isi satu tile ("points" atau "cells"), di-cache per versi data
+def tile_response(index, tile, kind):
+    build = index.tile_points if kind == "points" else index.tile_cells
+    value, _ = memoize((index.version, kind, *tile), lambda: build(*tile), cache=tile_cache())
+    return value
+
+
+# Titik/sel untuk satu tampilan peta. Titik satu per satu hanya bila zoom
+# cukup dekat atau jumlah TPS di area tidak melebihi POINTS_MAX.
+def view_layer(index, view):
+    tiles = view_tiles(view.bounds, view.zoom)
+    kind = "points" if view.zoom >= DETAIL_ZOOM or index.count(tiles) <= POINTS_MAX else "cells"
+    parts = [tile_response(index, t, kind) for t in tiles]
+    parts = [p for p in parts if not p.empty]
+    frame = pd.concat(parts, ignore_index=True) if parts else index.frame.iloc[:0]
+    return ViewLayer(kind=kind, frame=frame, tiles=len(tiles))
@@ -0,0 +1,184 @@
+"""Pembagian TPS satu TPA ke zona kerja truk.
+
+Setiap truk TPA mendapat satu zona: sekumpulan TPS yang berdekatan dengan
+total muatan yang kurang lebih sama dengan zona truk lain. Dengan begitu
+rute tiap truk tidak saling bersilangan seperti pada pembagian berdasarkan
+peringkat prioritas saja.
+
+Koordinat diproyeksikan ke bidang datar (km, equirectangular di sekitar
+TPA). Zona awal dibuat dengan pembagian dua rekursif: sebaran TPS dipotong
+tegak lurus sumbu utamanya pada kuantil muatan yang sesuai dengan jumlah truk
+di tiap sisi, jadi muatan zona sudah hampir sama. Zona lalu diperhalus dengan
+k-means berbatas muatan: TPS pindah ke pusat zona yang lebih dekat selama
+muatan kedua zona tetap di dalam batas. Satu iterasi O(n*k); ribuan TPS dan
+ratusan truk selesai dalam hitungan detik.
+"""
+import numpy as np
+import pandas as pd
+
+from distance import EARTH_RADIUS_KM
+
+# Dipakai di meta rencana/kunci cache: rencana lama tanpa zona tidak dipakai ulang
+ZONE_METHOD = "bisection+balanced-kmeans"
+# Batas muatan zona = rata-rata muatan per truk x (1 +/- BALANCE_SLACK)
+BALANCE_SLACK = 0.05
+ZONE_ITERATIONS = 10
+# Pusat zona terdekat yang dicoba saat memindahkan satu TPS
+ZONE_CANDIDATES = 4
+
+
+# Proyeksi equirectangular (km) relatif terhadap titik acuan
+def project_km(lat, lon, lat0, lon0):
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    x = (lon - np.radians(lon0)) * np.cos(np.radians(lat0)) * EARTH_RADIUS_KM
+    y = (lat - np.radians(lat0)) * EARTH_RADIUS_KM
+    return np.column_stack([x, y])
+
+
+# Bagi dua secara rekursif: titik dipotong tegak lurus sumbu utama sebarannya
+# (PCA berbobot) pada kuantil muatan k1/k, sampai tiap bagian tinggal satu zona
+def bisect_zones(xy, weights, k):
+    labels = np.zeros(len(xy), dtype=np.int64)
+    stack = [(np.arange(len(xy)), k, 0)]
+    while stack:
+        idx, count, base = stack.pop()
+        if count == 1 or len(idx) <= 1:
+            labels[idx] = base
+            continue
+        pts, w = xy[idx], weights[idx]
+        mean = (pts * w[:, None]).sum(axis=0) / w.sum()
+        centred = pts - mean
+        axis = np.linalg.eigh((centred.T * w) @ centred)[1][:, -1]
+        order = np.argsort(centred @ axis, kind="stable")
+        first = count // 2
+        cumulative = np.cumsum(w[order])
+        cut = int(np.searchsorted(cumulative, cumulative[-1] * first / count))
+        cut = min(max(cut, 1), len(idx) - 1)
+        stack.append((idx[order[:cut]], first, base))
+        stack.append((idx[order[cut:]], count - first, base + first))
+    return labels
+
+
+def weighted_centers(xy, weights, labels, k, previous=None):
+    centers = np.zeros((k, 2)) if previous is None else previous.copy()
+    totals = np.bincount(labels, weights=weights, minlength=k)
+    filled = totals > 0
+    for axis in range(2):
+        sums = np.bincount(labels, weights=weights * xy[:, axis], minlength=k)
+        centers[filled, axis] = sums[filled] / totals[filled]
+    return centers
+
+
+# Zona yang muatannya di atas `limit` melepas TPS ke zona tetangga yang masih
+# di bawah `limit`, mulai dari TPS yang paling murah dipindahkan (tambahan jarak
+# kuadrat ke pusat terkecil)
+def shed_overload(weights, labels, load, d2, near, limit):
+    for a in np.flatnonzero(load > limit):
+        members = np.flatnonzero(labels == a)
+        cost = d2[members[:, None], near[members]] - d2[members, a][:, None]
+        for flat in np.argsort(cost, axis=None, kind="stable"):
+            if load[a] <= limit:
+                break
+            i, b = members[flat // near.shape[1]], near[members[flat // near.shape[1]], flat % near.shape[1]]
+            if labels[i] != a or b == a or load[b] + weights[i] > limit:
+                continue
+            labels[i] = b
+            load[a] -= weights[i]
+            load[b] += weights[i]
+
+
+# Langkah k-means berbatas muatan: TPS pindah ke salah satu pusat zona yang
+# lebih dekat (mulai dari penghematan terbesar) hanya bila muatan kedua zona
+# tetap di dalam [lo, hi]. Batas dirapatkan ke target +/- slack setiap kali
+# zona yang kelebihan muatan berhasil melepas TPS ke tetangganya.
+def refine_zones(xy, weights, labels, k, slack=BALANCE_SLACK, iterations=ZONE_ITERATIONS,
+                 candidates=ZONE_CANDIDATES):
+    labels = labels.copy()
+    load = np.bincount(labels, weights=weights, minlength=k)
+    target = weights.sum() / k
+    centers = weighted_centers(xy, weights, labels, k)
+    rows = np.arange(len(xy))
+    candidates = min(candidates, k)
+    for _ in range(iterations):
+        d2 = ((xy[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        near = np.argpartition(d2, candidates - 1, axis=1)[:, :candidates]
+        shed_overload(weights, labels, load, d2, near, target * (1 + slack))
+        lo = min(target * (1 - slack), load.min())
+        hi = max(target * (1 + slack), load.max())
+        gain = d2[rows, labels][:, None] - np.take_along_axis(d2, near, axis=1)
+        best_gain = gain.max(axis=1)
+        moved = 0
+        for i in np.argsort(-best_gain, kind="stable"):
+            if best_gain[i] <= 0:
+                break
+            a, w = labels[i], weights[i]
+            for j in np.argsort(-gain[i], kind="stable"):
+                b = near[i, j]
+                if gain[i, j] <= 0:
+                    break
+                if load[a] - w >= lo and load[b] + w <= hi:
+                    labels[i] = b
+                    load[a] -= w
+                    load[b] += w
+                    moved += 1
+                    break
+        centers = weighted_centers(xy, weights, labels, k, centers)
+        if not moved:
+            break
+    return labels
+
+
+# Label zona 0..k-1 untuk titik `xy` (km), seimbang menurut `weights`
+def balanced_zones(xy, weights, k, slack=BALANCE_SLACK, iterations=ZONE_ITERATIONS):
+    n = len(xy)
+    k = max(1, min(k, n))
+    if k == 1 or n == 0:
+        return np.zeros(n, dtype=np.int64)
+    weights = np.nan_to_num(np.asarray(weights, dtype=np.float64), nan=0.0).clip(min=0.0)
+    if weights.sum() <= 0:
+        weights = np.ones(n)
+    # Bobot kecil agar TPS bermuatan nol tetap ikut dihitung dalam pusat zona
+    weights = weights + weights.sum() / n * 1e-3
+    return refine_zones(xy, weights, bisect_zones(xy, weights, k), k, slack=slack, iterations=iterations)
+
+
+# Nama truk pemilik zona tiap TPS (Series sejajar tps_df). Zona diberi truk
+# berurutan menurut sudut pusatnya dari TPA, jadi penomorannya stabil.
+def assign_zones(tps_df, tpa_df, truck_map, region_column="nearest_tpa", load_column="volume_saat_ini",
+                 spare="Cadangan"):
+    zones = pd.Series(spare, index=tps_df.index, dtype=object)
+    tpa_xy = tpa_df.set_index("nama")[["latitude", "longitude"]]
+    for region, part in tps_df.groupby(region_column, sort=False):
+        trucks = truck_map.get(region)
+        if not trucks or region not in tpa_xy.index:
+            continue
+        lat0, lon0 = tpa_xy.loc[region]
+        xy = project_km(part["latitude"], part["longitude"], lat0, lon0)
+        labels = balanced_zones(xy, part[load_column].to_numpy(float), len(trucks))
+        k = int(labels.max()) + 1 if len(labels) else 0
+        centers = weighted_centers(xy, np.ones(len(xy)), labels, k)
+        rank = np.argsort(np.argsort(np.arctan2(centers[:, 1], centers[:, 0]), kind="stable"))
+        zones.loc[part.index] = np.asarray(trucks, dtype=object)[rank[labels]]
+    return zones
+
+
+# Satu baris per truk: wilayah, jumlah TPS dan muatan zonanya, serta radius zona
+# (jarak TPS terjauh dari pusat zona)
+def zone_summary(tps_df, zones, truck_map, load_column="volume_saat_ini"):
+    rows = []
+    for tpa, trucks in truck_map.items():
+        for truck in trucks:
+            part = tps_df[zones == truck]
+            radius = 0.0
+            if len(part):
+                xy = project_km(part["latitude"], part["longitude"], part["latitude"].mean(), part["longitude"].mean())
+                radius = float(np.sqrt((xy ** 2).sum(axis=1)).max())
+            rows.append({
+                "Truk": truck,
+                "Wilayah (TPA)": tpa,
+                "Jumlah TPS": len(part),
+                "Muatan (m³)": round(float(part[load_column].sum()), 1),
+                "Radius zona (km)": round(radius, 2),
+            })
+    return pd.DataFrame(rows)